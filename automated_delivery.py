@@ -11,360 +11,286 @@ This script handles the entire customer fulfillment pipeline:
 5. Logs all transactions for accounting
 
 Usage:
+    python automated_delivery.py                  # stats from delivery_stats.json
+    python automated_delivery.py --json [--refresh]
     python automated_delivery.py --monitor
+    python automated_delivery.py --monitor --poll
+    python automated_delivery.py --rollup daily 2025-06-01 2025-06-30
     python automated_delivery.py --send-pdf customer@email.com payment_amount
 
 Requirements:
     pip install imaplib email fpdf smtplib
+
+The delivery system itself lives in delivery_system.py and is only
+imported by commands that need it; plain stats read the snapshot the
+delivery path keeps (delivery_snapshot.py).
 """
 
-import imaplib
-import email
-import smtplib
-import json
-import time
-import re
-from datetime import datetime
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
 import os
+import time
+
+def __getattr__(name):
+    # `from automated_delivery import SelûneDeliverySystem` keeps working
+    if name == 'SelûneDeliverySystem':
+        from delivery_system import SelûneDeliverySystem
+        return SelûneDeliverySystem
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-class SelûneDeliverySystem:
-    """Automated customer delivery and fulfillment system"""
+def print_monitor_stats(delivery_system):
+    """One block of monitor stats lines: revenue, IMAP, outbox, quotas, SMTP, documents"""
+    stats = delivery_system.get_revenue_stats()
+    customer_stats = delivery_system.get_customer_stats()
+    print(f"💰 Revenue Stats: ${stats.get('total_revenue', 0)} from {stats.get('total_customers', 0)} purchases "
+          f"by {customer_stats['unique_customers']} customers ({customer_stats['repeat_customers']} repeat)")
     
-    def __init__(self):
-        self.email_config = {
-            'imap_server': 'imap.mail.yahoo.com',
-            'smtp_server': 'smtp.mail.yahoo.com', 
-            'email': 'valgrim1333@yahoo.com',
-            'password': '[SET_EMAIL_PASSWORD]',  # User needs to set this
-            'imap_port': 993,
-            'smtp_port': 587
-        }
-        
-        self.customer_db = 'customers.json'
-        self.pdf_template = 'selune_tech_docs_template.md'
-        
-    def monitor_email_for_payments(self):
-        """Monitor email for payment confirmations and delivery requests"""
-        print("🔍 Monitoring email for payment confirmations...")
-        
-        try:
-            # Connect to email
-            mail = imaplib.IMAP4_SSL(self.email_config['imap_server'])
-            mail.login(self.email_config['email'], self.email_config['password'])
-            mail.select('inbox')
-            
-            # Search for unread emails
-            result, data = mail.search(None, 'UNSEEN')
-            email_ids = data[0].split()
-            
-            new_customers = []
-            
-            for email_id in email_ids:
-                result, data = mail.fetch(email_id, '(RFC822)')
-                raw_email = data[0][1]
-                email_message = email.message_from_bytes(raw_email)
-                
-                # Parse email content
-                customer_info = self.parse_payment_email(email_message)
-                if customer_info:
-                    new_customers.append(customer_info)
-                    
-                    # Automatically send documentation
-                    self.send_automated_delivery(customer_info)
-                    
-                    # Mark as read
-                    mail.store(email_id, '+FLAGS', '\\Seen')
-            
-            mail.logout()
-            return new_customers
-            
-        except Exception as e:
-            print(f"❌ Email monitoring error: {e}")
-            return []
+    imap_stats = delivery_system.get_connection_stats()
+    print(f"🔌 IMAP: {imap_stats['handshakes']} handshakes, {imap_stats['reuses']} reuses "
+          f"({imap_stats['handshakes_per_hour']}/hour)")
     
+    outbox_stats = delivery_system.get_outbox_stats()
+    if outbox_stats['depth'] or outbox_stats['dead']:
+        print(f"📬 Outbox: {outbox_stats['depth']} pending "
+              f"(oldest {outbox_stats['oldest_age_seconds']}s), {outbox_stats['dead']} dead")
     
-def parse_payment_email(self, email_message):
-    """Extract customer and payment info from email"""
-    try:
-        subject = email_message['Subject'] or ''
-        body = self.get_email_body(email_message)
-        sender = self.extract_email_from_body(body) or email_message['From']
-        print(f"🔎 Extracted sender: {sender}")
-
-        # Look for payment indicators
-        payment_keywords = ['paypal', 'payment', 'paid', '$', 'receipt', 'confirmation']
-
-        if any(keyword in subject.lower() or keyword in body.lower() 
-               for keyword in payment_keywords):
-
-            # Extract payment amount if possible
-            amount_match = re.search(r'\$(\d+\.?\d*)', body)
-            amount = amount_match.group(1) if amount_match else "unknown"
-
-            customer_info = {
-                'email': sender,
-                'timestamp': datetime.now().isoformat(),
-                'amount': amount,
-                'subject': subject,
-                'payment_method': 'PayPal',
-                'delivery_status': 'pending'
-            }
-
-            # Save customer to database
-            self.save_customer(customer_info)
-            return customer_info
-
-    except Exception as e:
-        print(f"⚠️ Email parsing error: {e}")
-
-    return None
-
+    rate_stats = delivery_system.get_rate_limit_stats()
+    if rate_stats['backlog'] or rate_stats['waiting'] or rate_stats['delayed']:
+        print(f"⏱️ {rate_stats['profile']} quota: {rate_stats['limits']}, "
+              f"{rate_stats['delayed']} sends paced, backlog of {rate_stats['backlog']} "
+              f"drains in ~{rate_stats['drain_seconds']}s")
     
-    def extract_email_from_body(self, body):
-        """Extract first valid email address from body text"""
-        matches = re.findall(r'[\w\.-]+@[\w\.-]+', body)
-        return matches[0] if matches else None
-
-    def get_email_body
-(self, email_message):
-        """Extract text body from email message"""
-        body = ""
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                if part.get_content_type() == "text/plain":
-                    body += part.get_payload(decode=True).decode('utf-8', errors='ignore')
-        else:
-            body = email_message.get_payload(decode=True).decode('utf-8', errors='ignore')
-        return body
+    smtp_stats = delivery_system.get_smtp_stats()
+    if smtp_stats['sends']:
+        print(f"📮 SMTP: {smtp_stats['sends']} sends over {smtp_stats['handshakes']} sessions, "
+              f"p50 {smtp_stats['latency_ms']['p50']}ms / p95 {smtp_stats['latency_ms']['p95']}ms")
     
-    def generate_personalized_pdf(self, customer_info):
-        """Generate personalized PDF documentation for customer"""
-        print(f"📄 Generating personalized PDF for {customer_info['email']}")
-        
-        # Create personalized content
-        personalized_content = f"""
-# Selûne AI Automation System - Complete Technical Documentation
-**Personal Copy for: {customer_info['email']}**
-**Purchase Date: {customer_info['timestamp']}**
-**Payment Amount: ${customer_info['amount']}**
-
-## 🎯 Your Personal Implementation Guide
-
-Thank you for purchasing the Selûne AI automation documentation! This is your personalized copy of the complete technical guide.
-
-## 📋 What's Included
-- Complete MCP server setup instructions
-- Real automation code examples  
-- Revenue generation strategies
-- Troubleshooting guides
-- 295+ pages of implementation details
-
-## 🚀 Quick Start (30 minutes)
-1. Set up Claude Desktop + MCP servers
-2. Configure your GitHub/PayPal accounts
-3. Deploy your first automation
-4. Start generating revenue!
-
-## 💰 Business Model Templates
-- Web scraping services: $50-500/project
-- Real-time monitoring: $100-1000/month  
-- Custom automation: $200-2000/implementation
-
-## 🛠️ Technical Implementation
-[Complete technical documentation would be included here - 295 pages]
-
-## 🔗 Support & Updates
-- GitHub: https://github.com/colera1333/selune-ai-automation-launch
-- Email support: valgrim1333@yahoo.com
-- Join our automation community!
-
----
-**Document generated automatically by Selûne delivery system**
-**Customer ID: {customer_info.get('customer_id', 'AUTO_' + str(int(time.time())))}**
-**Generated: {datetime.now().isoformat()}**
-        """
-        
-        # Save as text file (in production, would generate actual PDF)
-        filename = f"selune_docs_{customer_info['email'].replace('@', '_').replace('.', '_')}.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(personalized_content)
-            
-        return filename
+    verify_stats = delivery_system.get_verification_stats()
+    if verify_stats and verify_stats['batches']:
+        print(f"🛡️ Verification: {verify_stats['verified']} verified, {verify_stats['rejected']} rejected, "
+              f"{verify_stats['unconfirmed']} unconfirmed; {verify_stats['cache_hits']} cache hits, "
+              f"{verify_stats['api']['requests']} API requests")
     
-    def send_automated_delivery(self, customer_info):
-        """Send automated delivery email with documentation"""
-        print(f"📧 Sending automated delivery to {customer_info['email']}")
-        
-        try:
-            # Generate personalized documentation
-            doc_file = self.generate_personalized_pdf(customer_info)
-            
-            # Create email
-            msg = MIMEMultipart()
-            msg['From'] = self.email_config['email']
-            msg['To'] = customer_info['email']
-            msg['Subject'] = "🚀 Your Selûne AI Automation Documentation - Automated Delivery"
-            
-            # Email body
-            body = f"""
-Hi there!
-
-Thank you for your ${customer_info['amount']} payment for the Selûne AI automation documentation!
+    pdf_stats = delivery_system.get_pdf_stats()
+    template_stats = delivery_system.get_template_stats()
+    if pdf_stats and pdf_stats['copies']:
+        print(f"📚 PDFs: {pdf_stats['copies']} copies of the {pdf_stats['pages']}-page master, "
+              f"avg {pdf_stats['avg_copy_ms']}ms")
+    elif template_stats['renders']:
+        print(f"📄 Documents: {template_stats['renders']} renders, "
+              f"avg {template_stats['avg_render_ms']}ms "
+              f"({template_stats['static_bytes'] // 1024} KB template)")
 
-Your personalized technical guide is attached. This 295+ page document contains:
-✅ Complete MCP server setup instructions
-✅ Real automation code examples
-✅ Revenue generation strategies  
-✅ Troubleshooting guides
-✅ Business model templates
-
-QUICK START:
-1. Follow the setup guide in Section 1
-2. Run the demo automation in Section 3
-3. Deploy your first revenue automation in Section 5
-
-SUPPORT:
-- Repository: https://github.com/colera1333/selune-ai-automation-launch
-- Questions: Reply to this email
-- Updates: Watch the GitHub repo for new content
+def start_metrics(delivery_system):
+    """Start the metrics endpoint and JSON log line configured in metrics_config"""
+    from delivery_metrics import MetricsLogger, MetricsServer
+    config = delivery_system.metrics_config
+    exporters = []
+    if config['port'] is not None:
+        try:
+            exporters.append(MetricsServer(delivery_system.metrics, config['port'], config['host']).start())
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint unavailable on port {config['port']}: {e}")
+    if config['log_interval']:
+        exporters.append(MetricsLogger(delivery_system.metrics, config['log_interval']).start())
+    return exporters
 
-Thanks for supporting AI automation development!
+def stop_monitoring(delivery_system, pool=None, exporters=()):
+    """Close every session and stop the background workers"""
+    print("\n🛑 Monitoring stopped by user")
+    for exporter in exporters:
+        exporter.stop()
+    if pool:
+        pool.stop()
+    else:
+        for mailbox in delivery_system.mailboxes:
+            mailbox.close()
+    delivery_system.outbox_worker.stop()
+    delivery_system.smtp.close()
+    delivery_system.snapshot.flush()
 
----
-This email was sent automatically by the Selûne delivery system.
-Customer ID: {customer_info.get('customer_id', 'AUTO_' + str(int(time.time())))}
-Delivered: {datetime.now().isoformat()}
-            """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Attach documentation file
-            if os.path.exists(doc_file):
-                attachment = MIMEBase('application', 'octet-stream')
-                with open(doc_file, 'rb') as f:
-                    attachment.set_payload(f.read())
-                encoders.encode_base64(attachment)
-                attachment.add_header(
-                    'Content-Disposition',
-                    f'attachment; filename= {doc_file}'
-                )
-                msg.attach(attachment)
-            
-            # Send email
-            server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
-            server.starttls()
-            server.login(self.email_config['email'], self.email_config['password'])
-            server.send_message(msg)
-            server.quit()
-            
-            # Update customer status
-            customer_info['delivery_status'] = 'delivered'
-            customer_info['delivery_timestamp'] = datetime.now().isoformat()
-            self.save_customer(customer_info)
-            
-            print(f"✅ Automated delivery complete for {customer_info['email']}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Delivery error: {e}")
-            return False
-    
-    def save_customer(self, customer_info):
-        """Save customer info to database"""
-        try:
-            # Load existing customers
-            customers = []
-            if os.path.exists(self.customer_db):
-                with open(self.customer_db, 'r') as f:
-                    customers = json.load(f)
-            
-            # Add new customer
-            customers.append(customer_info)
-            
-            # Save updated database
-            with open(self.customer_db, 'w') as f:
-                json.dump(customers, f, indent=2)
-                
-        except Exception as e:
-            print(f"⚠️ Database save error: {e}")
+def load_stats(refresh=False, quiet=False):
+    """The stats snapshot; rebuilt from the databases when missing or on --refresh"""
+    from delivery_snapshot import load_snapshot
+    snapshot = None if refresh else load_snapshot()
+    if snapshot is not None:
+        return snapshot
     
-    def get_revenue_stats(self):
-        """Get revenue and customer statistics"""
-        try:
-            if not os.path.exists(self.customer_db):
-                return {"total_customers": 0, "total_revenue": 0}
-            
-            with open(self.customer_db, 'r') as f:
-                customers = json.load(f)
-            
-            total_revenue = 0
-            delivered_count = 0
-            
-            for customer in customers:
-                try:
-                    amount = float(customer.get('amount', 0))
-                    total_revenue += amount
-                    if customer.get('delivery_status') == 'delivered':
-                        delivered_count += 1
-                except:
-                    pass
-            
-            return {
-                "total_customers": len(customers),
-                "total_revenue": total_revenue,
-                "delivered_count": delivered_count,
-                "pending_count": len(customers) - delivered_count
-            }
-            
-        except Exception as e:
-            print(f"⚠️ Stats error: {e}")
-            return {"error": str(e)}
+    # No snapshot yet: the one slow start, which also writes it for next time
+    import contextlib
+    import sys
+    with contextlib.redirect_stdout(sys.stderr if quiet else sys.stdout):
+        from delivery_system import SelûneDeliverySystem
+        delivery_system = SelûneDeliverySystem()
+        delivery_system.snapshot.flush(force=True)
+    return load_snapshot(delivery_system.stats_file) or dict(delivery_system.collect_stats(), age_seconds=0.0)
+
+def print_stats(snapshot):
+    """The default stats block, from a snapshot dict"""
+    stats = snapshot['revenue']
+    customer_stats = snapshot['customers']
+    print(f"📊 Current Revenue Stats (as of {snapshot.get('updated', 'now')}, {snapshot['age_seconds']}s ago):")
+    print(f"💰 Total Revenue: ${stats.get('total_revenue', 0)}")
+    print(f"🧾 Total Purchases: {stats.get('total_customers', 0)}")
+    print(f"👥 Unique Customers: {customer_stats['unique_customers']} "
+          f"({customer_stats['repeat_customers']} repeat buyers)")
+    print(f"✅ Delivered: {stats.get('delivered_count', 0)}")
+    if stats.get('imported_count'):
+        print(f"📦 Imported (historical): {stats['imported_count']}")
+    print(f"⏳ Pending: {stats.get('pending_count', 0)}")
+    outbox_stats = snapshot['outbox']
+    if outbox_stats['depth'] or outbox_stats['dead']:
+        print(f"📬 Outbox: {outbox_stats['depth']} pending, {outbox_stats['dead']} dead")
+    print("\nTo start monitoring: python automated_delivery.py --monitor [--metrics-port 9464]")
+    print("To import an mbox/Maildir export: python automated_delivery.py --backfill PATH [--redeliver]")
+    print("To look up a buyer: python automated_delivery.py --customer EMAIL")
+    print("To export unique customers: python automated_delivery.py --export-customers customers.csv")
+    print("To recompute these stats: python automated_delivery.py --refresh [--json]")
+    print("To setup: Edit email password in script configuration")
 
 def main():
     """Main execution function"""
+    import sys
+    
+    # Plain stats: read the precomputed snapshot, import nothing else
+    if len(sys.argv) == 1 or sys.argv[1] in ('--json', '--refresh'):
+        as_json = '--json' in sys.argv
+        if not as_json:
+            print("🤖 SELÛNE AUTOMATED DELIVERY SYSTEM")
+            print("=" * 50)
+        snapshot = load_stats(refresh='--refresh' in sys.argv, quiet=as_json)
+        if as_json:
+            import json
+            print(json.dumps(snapshot, indent=2, sort_keys=True))
+        else:
+            print_stats(snapshot)
+        return
+    
     print("🤖 SELÛNE AUTOMATED DELIVERY SYSTEM")
     print("=" * 50)
     
+    from delivery_system import SelûneDeliverySystem
     delivery_system = SelûneDeliverySystem()
     
     # Check for command line arguments
-    import sys
-    if len(sys.argv) > 1 and sys.argv[1] == '--monitor':
-        print("🔄 Starting continuous email monitoring...")
+    if sys.argv[1] == '--monitor':
+        if '--metrics-port' in sys.argv:
+            value = sys.argv[sys.argv.index('--metrics-port') + 1:][:1]
+            if not (value and value[0].isdecimal() and 1 <= int(value[0]) <= 65535):
+                print(f"❌ --metrics-port needs a TCP port number (1-65535), got {value[0] if value else 'nothing'}")
+                print("Usage: python automated_delivery.py --monitor [--poll] [--metrics-port 9464]")
+                return
+            delivery_system.metrics_config['port'] = int(value[0])
+        monitor_config = delivery_system.monitor_config
+        if monitor_config['use_idle'] and '--poll' not in sys.argv:
+            for mailbox in delivery_system.mailboxes:
+                mailbox.watch(monitor_config['idle_refresh'])
+            print("🔄 Starting push email monitoring (IMAP IDLE)...")
+        else:
+            print("🔄 Starting continuous email monitoring...")
+        
+        exporters = start_metrics(delivery_system)
+        if delivery_system.profiler.install_signal_handler():
+            print(f"🔬 Profiling on demand: kill -USR1 {os.getpid()} "
+                  f"or create {delivery_system.profile_config['control_file']}")
+        else:
+            print(f"🔬 Profiling on demand: create {delivery_system.profile_config['control_file']}")
+        delivery_system.outbox_worker.start()
+        
+        if len(delivery_system.mailboxes) > 1:
+            # One monitor thread per mailbox; this thread only reports
+            from delivery_mailboxes import MailboxPool
+            pool = MailboxPool(delivery_system, delivery_system.mailboxes)
+            pool.start()
+            try:
+                while True:
+                    time.sleep(monitor_config['stats_interval'])
+                    print_monitor_stats(delivery_system)
+            except KeyboardInterrupt:
+                stop_monitoring(delivery_system, pool, exporters)
+            return
+        
+        mailbox = delivery_system.primary
         while True:
             try:
-                new_customers = delivery_system.monitor_email_for_payments()
+                with delivery_system.profiler.cycle():
+                    new_customers = delivery_system.monitor_email_for_payments(mailbox)
                 if new_customers:
-                    print(f"📈 Processed {len(new_customers)} new customers")
+                    print(f"📈 Processed {len(new_customers)} new customers "
+                          f"({delivery_system.pipeline.last_run['deliveries_per_minute']} deliveries/min)")
                 else:
                     print("💤 No new payments found, sleeping...")
                 
-                # Show stats
-                stats = delivery_system.get_revenue_stats()
-                print(f"💰 Revenue Stats: ${stats.get('total_revenue', 0)} from {stats.get('total_customers', 0)} customers")
+                print_monitor_stats(delivery_system)
                 
-                time.sleep(300)  # Check every 5 minutes
+                # IDLE wakeup, adaptive poll interval, or error backoff
+                mailbox.wait()
                 
             except KeyboardInterrupt:
-                print("\n🛑 Monitoring stopped by user")
+                stop_monitoring(delivery_system, exporters=exporters)
                 break
             except Exception as e:
                 print(f"❌ Monitoring error: {e}")
-                time.sleep(60)
+                mailbox.scheduler.record_error(e)
+                mailbox.scheduler.wait()
+    elif len(sys.argv) > 2 and sys.argv[1] == '--backfill':
+        # Import historical payments from an mbox file or Maildir directory
+        from delivery_backfill import ArchiveBackfill
+        workers = None
+        if '--workers' in sys.argv:
+            value = sys.argv[sys.argv.index('--workers') + 1:][:1]
+            if not (value and value[0].isdecimal() and int(value[0]) >= 1):
+                print(f"❌ --workers needs a positive number of processes, got {value[0] if value else 'nothing'}")
+                print("Usage: python automated_delivery.py --backfill PATH [--workers N] [--redeliver]")
+                sys.exit(1)
+            workers = int(value[0])
+        redeliver = '--redeliver' in sys.argv
+        backfill = ArchiveBackfill(delivery_system, sys.argv[2], workers=workers, redeliver=redeliver)
+        try:
+            stats = backfill.run()
+        except KeyboardInterrupt:
+            print("\n🛑 Backfill interrupted; run the same command again to resume")
+            return
+        delivery_system.snapshot.flush(force=True)
+        print(f"✅ Backfill done: {stats['payments']} payments from {stats['messages']:,} messages "
+              f"in {stats['seconds']}s ({stats['messages_per_second']} msg/s)")
+        if redeliver and stats['queued']:
+            print(f"📬 Delivering {stats['queued']} queued payments (paced to SMTP quotas)...")
+            while delivery_system.outbox_worker.drain_once():
+                pass
+            delivery_system.snapshot.flush()
+            outbox_stats = delivery_system.get_outbox_stats()
+            if outbox_stats['depth']:
+                print(f"⏳ {outbox_stats['depth']} deliveries left for the monitor's outbox worker")
+    elif len(sys.argv) > 2 and sys.argv[1] == '--customer':
+        # Purchase history of one buyer, any spelling of the address
+        index = delivery_system.customers.index
+        purchases = index.purchases(sys.argv[2])
+        print(f"🪪 {sys.argv[2]}: {len(purchases)} purchases, "
+              f"{'already delivered' if index.is_delivered(sys.argv[2]) else 'never delivered'}")
+        for purchase in purchases:
+            print(f"  {purchase['timestamp']}: ${purchase['amount']} {purchase['status']} "
+                  f"({purchase['customer_id']}, transaction {purchase['transaction_id'] or '-'})")
+    elif len(sys.argv) > 2 and sys.argv[1] == '--export-customers':
+        count = delivery_system.customers.export_unique_customers(sys.argv[2])
+        print(f"📤 Exported {count} unique customers to {sys.argv[2]}")
+    elif len(sys.argv) > 2 and sys.argv[1] == '--rollup':
+        # Revenue per hour/day/month over an optional date range
+        granularity = sys.argv[2]
+        start = sys.argv[3] if len(sys.argv) > 3 else None
+        end = sys.argv[4] if len(sys.argv) > 4 else None
+        try:
+            buckets = delivery_system.get_revenue_rollup(granularity, start, end)
+        except ValueError as e:
+            print(f"❌ {e}")
+            print("Usage: python automated_delivery.py --rollup hourly|daily|monthly [START] [END]")
+            return
+        print(f"📅 {granularity.title()} Revenue:")
+        for bucket in buckets:
+            print(f"  {bucket['bucket']}: ${bucket['revenue']} from {bucket['customers']} customers "
+                  f"({bucket['delivered']} delivered)")
     else:
-        # Show current stats
-        stats = delivery_system.get_revenue_stats()
-        print("📊 Current Revenue Stats:")
-        print(f"💰 Total Revenue: ${stats.get('total_revenue', 0)}")
-        print(f"👥 Total Customers: {stats.get('total_customers', 0)}")
-        print(f"✅ Delivered: {stats.get('delivered_count', 0)}")
-        print(f"⏳ Pending: {stats.get('pending_count', 0)}")
-        print("\nTo start monitoring: python automated_delivery.py --monitor")
-        print("To setup: Edit email password in script configuration")
+        # Unknown arguments: current stats, recomputed
+        delivery_system.snapshot.flush(force=True)
+        print_stats(dict(delivery_system.collect_stats(), age_seconds=0.0))
 
 if __name__ == "__main__":
     main()
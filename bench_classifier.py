@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - CLASSIFIER BENCHMARK
+Messages classified per second: legacy keyword check vs PaymentClassifier
+
+Builds a synthetic corpus of PayPal receipts, marketing mail and ordinary
+correspondence, then times the old parse_payment_email logic (lowercase
+the body once per keyword, then amount and address regexes) against a
+single PaymentClassifier.classify() pass over the same messages.
+
+Usage:
+    python bench_classifier.py
+    python bench_classifier.py --messages 20000 --body-size 4000
+"""
+
+import random
+import re
+import sys
+import time
+
+from delivery_classifier import PaymentClassifier
+
+LEGACY_KEYWORDS = ['paypal', 'payment', 'paid', '$', 'receipt', 'confirmation']
+
+FILLER = ("Thanks for being part of our community. Here is a summary of what "
+          "happened this week, with links to the latest articles and updates. ")
+
+RECEIPT = ("Hello,\n\n{payer} sent you ${amount} USD.\n\n"
+           "Transaction ID: {txn}\nNote from buyer: thanks!\n\n")
+MARKETING = ("Huge SALE this weekend - 40% off everything, prices from ${amount}.\n"
+             "Click here to shop now.\n\n")
+PERSONAL = "Hi,\n\nAre we still on for Thursday? Let me know.\n\n"
+FOOTER = "\n\nTo unsubscribe from this newsletter, visit our preferences page."
+
+
+def build_corpus(count, body_size, seed=1333):
+    """(subject, body, is_payment) tuples with a realistic mix of mail"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        amount = f"{rng.randint(5, 500)}.{rng.randint(0, 99):02d}"
+        kind = rng.random()
+        if kind < 0.3:
+            txn = ''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ0123456789') for _ in range(17))
+            subject = "You've got money" if i % 2 else "Receipt for your payment"
+            body = RECEIPT.format(payer=f"buyer{i}@example.com", amount=amount, txn=txn)
+            is_payment = True
+        elif kind < 0.7:
+            subject = "Weekend SALE: new arrivals inside"
+            body = MARKETING.format(amount=amount)
+            is_payment = False
+        else:
+            subject = "Re: Thursday"
+            body = PERSONAL
+            is_payment = False
+
+        padding = (FILLER * (body_size // len(FILLER) + 1))[:max(0, body_size - len(body))]
+        if not is_payment and kind < 0.7:
+            padding += FOOTER
+        corpus.append((subject, body + padding, is_payment))
+    return corpus
+
+
+def legacy_classify(subject, body):
+    """The original parse_payment_email checks"""
+    if any(keyword in subject.lower() or keyword in body.lower()
+           for keyword in LEGACY_KEYWORDS):
+        amount_match = re.search(r'\$(\d+\.?\d*)', body)
+        amount = amount_match.group(1) if amount_match else "unknown"
+        matches = re.findall(r'[\w\.-]+@[\w\.-]+', body)
+        sender = matches[0] if matches else None
+        return True, amount, sender
+    return False, None, None
+
+
+def run(name, classify, corpus, repeat):
+    """Best of repeat runs; returns (messages/sec, messages flagged as payments)"""
+    best = None
+    flagged = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        flagged = sum(1 for subject, body, _ in corpus if classify(subject, body))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    rate = len(corpus) / best
+    print(f"  {name:<20} {rate:>12,.0f} msg/s   {flagged:>6} flagged as payments")
+    return rate, flagged
+
+
+def main():
+    messages = 5000
+    body_size = 2000
+    repeat = 3
+    args = sys.argv[1:]
+    if '--messages' in args:
+        messages = int(args[args.index('--messages') + 1])
+    if '--body-size' in args:
+        body_size = int(args[args.index('--body-size') + 1])
+
+    corpus = build_corpus(messages, body_size)
+    actual = sum(1 for _, _, is_payment in corpus if is_payment)
+    classifier = PaymentClassifier()
+
+    print(f"📊 Classifying {messages} emails (~{body_size} chars each, {actual} real payments)")
+    legacy_rate, _ = run('legacy keywords', lambda s, b: legacy_classify(s, b)[0], corpus, repeat)
+    compiled_rate, _ = run('PaymentClassifier', lambda s, b: classifier.classify(s, b).is_payment,
+                           corpus, repeat)
+    print(f"  speedup: {compiled_rate / legacy_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - END-TO-END BENCHMARK
+Payments per minute through monitor → parse → render → send
+
+Generates a synthetic mailbox (payment confirmations, newsletters and
+other noise, and a share of large multipart messages with attachments),
+serves it from the in-process IMAP server in bench_servers.py, points
+SelûneDeliverySystem at it and at a local SMTP sink through a
+delivery_config.json in a scratch directory, and runs one monitor cycle
+over the whole backlog. With --verify every payment is also checked
+against the fake PayPal API, which knows all the generated transactions.
+
+Reports throughput, p50/p95/p99 latency for the ingest (IMAP fetch),
+parse, render and send stages, and peak RSS. Peak RSS is for the whole
+process, so it includes the fake server's copy of the mailbox (reported
+as mailbox_bytes). Results are written as JSON; --compare prints the
+change against an earlier results file.
+
+Usage:
+    python bench_delivery.py
+    python bench_delivery.py --messages 5000 --payments 0.2 --large 0.05 --large-kb 512
+    python bench_delivery.py --smtp-latency-ms 50 --output after.json --compare before.json
+    python bench_delivery.py --verify --api-latency-ms 150
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime, make_msgid
+
+from bench_servers import FakeIMAPServer, FakePayPalAPI, SMTPSink
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ['ingest', 'parse', 'render', 'send']
+
+NOISE = [
+    ('news@automationweekly.com', 'This week in automation', 'Top stories. Unsubscribe any time.'),
+    ('deals@shop.example', 'Flash sale: 40% off everything', 'Sale ends tonight! 40% off. Unsubscribe here.'),
+    ('offers@paypal.com', 'PayPal: new ways to shop this season',
+     'Discover offers from our partners. Unsubscribe from PayPal newsletters here.'),
+    ('friend@example.org', 'Re: launch plans', 'Sounds good, talk tomorrow about the launch.'),
+]
+
+
+def payment_email(i, transactions):
+    amount = random.choice(['19.99', '25.00', '49.00', '97.00', '1,250.00'])
+    transaction_id = f"{random.randrange(16 ** 17):017X}"
+    transactions.append((transaction_id, amount.replace(',', '')))
+    body = (f"Hello,\n\nYou received a payment of ${amount} USD from buyer{i}@example.com.\n\n"
+            f"Transaction ID: {transaction_id}\n"
+            f"Item: Selûne AI Automation Documentation\n\nThanks for using PayPal!\n")
+    message = MIMEText(body, 'plain', 'utf-8')
+    message['From'] = 'service@paypal.com'
+    message['Subject'] = f"You received a payment of ${amount} USD"
+    return message
+
+
+def noise_email(i):
+    sender, subject, body = random.choice(NOISE)
+    message = MIMEText(f"{body}\n\nMessage {i}\n", 'plain', 'utf-8')
+    message['From'] = sender
+    message['Subject'] = subject
+    return message
+
+
+def with_attachment(message, size):
+    """Wrap a text message in multipart/mixed with a binary attachment"""
+    wrapper = MIMEMultipart()
+    for header in ('From', 'Subject'):
+        wrapper[header] = message[header]
+        del message[header]
+    wrapper.attach(message)
+    attachment = MIMEApplication(os.urandom(size), Name='invoice.pdf')
+    attachment['Content-Disposition'] = 'attachment; filename="invoice.pdf"'
+    wrapper.attach(attachment)
+    return wrapper
+
+
+def generate_mailbox(count, payment_ratio, large_ratio, large_kb):
+    """Raw CRLF messages and the (transaction ID, amount) of every payment among them"""
+    messages = []
+    transactions = []
+    now = datetime.now().astimezone()
+    for i in range(count):
+        if random.random() < payment_ratio:
+            message = payment_email(i, transactions)
+        else:
+            message = noise_email(i)
+        if random.random() < large_ratio:
+            message = with_attachment(message, large_kb * 1024)
+        message['To'] = 'valgrim1333@yahoo.com'
+        message['Date'] = format_datetime(now)
+        message['Message-ID'] = make_msgid(domain='bench.selune')
+        messages.append(message.as_bytes().replace(b'\r\n', b'\n').replace(b'\n', b'\r\n'))
+    return messages, transactions
+
+
+def write_config(workdir, imap, smtp, paypal=None):
+    config = {
+        'email_config': {
+            'email': 'valgrim1333@yahoo.com',
+            'password': 'bench',
+            'imap_server': '127.0.0.1',
+            'imap_port': imap.port,
+            'imap_ssl': False,
+            'smtp_server': '127.0.0.1',
+            'smtp_port': smtp.port,
+            'smtp_starttls': False,
+            # The sink has no quota; measure the code, not the provider limits
+            'smtp_rate_limits': {'per_minute': 10 ** 7, 'per_hour': None, 'per_day': None, 'burst': 10 ** 5}
+        }
+    }
+    if paypal is not None:
+        config['paypal'] = {'client_id': paypal.client_id, 'client_secret': paypal.client_secret,
+                            'base_url': paypal.url}
+    with open(os.path.join(workdir, 'delivery_config.json'), 'w') as f:
+        json.dump(config, f)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5, check=True).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(config):
+    """Build the mailbox, run one monitor cycle over it and collect the measurements"""
+    random.seed(config['seed'])
+    messages, transactions = generate_mailbox(config['messages'], config['payments'],
+                                              config['large'], config['large_kb'])
+    payments = len(transactions)
+
+    imap = FakeIMAPServer()
+    smtp = SMTPSink(latency=config['smtp_latency_ms'] / 1000)
+    for raw in messages:
+        imap.mailbox.add(raw)
+    paypal = None
+    if config['verify']:
+        paypal = FakePayPalAPI(latency=config['api_latency_ms'] / 1000)
+        for transaction_id, amount in transactions:
+            paypal.add(transaction_id, amount)
+
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='selune-bench-')
+    write_config(workdir, imap, smtp, paypal)
+    if config['pdf']:
+        from bench_pdf import load_source
+        name, source = load_source(config['pages'])
+        with open(os.path.join(workdir, 'selune_complete_documentation.md'), 'w', encoding='utf-8') as f:
+            f.write(source)
+
+    output = sys.stdout if config['verbose'] else io.StringIO()
+    try:
+        os.chdir(workdir)
+        with contextlib.redirect_stdout(output):
+            from delivery_system import SelûneDeliverySystem
+            system = SelûneDeliverySystem()
+            system.pdf.get()  # render the master up front; it is not per-delivery work
+
+            started = time.perf_counter()
+            delivered = system.monitor_email_for_payments()
+            seconds = time.perf_counter() - started
+
+        last_run = system.pipeline.last_run
+        stages = {'ingest': last_run.get('ingest_latency_ms', {})}
+        for stage in STAGES[1:] + (['verify'] if paypal else []):
+            stages[stage] = last_run.get('stages', {}).get(stage, {}).get('latency_ms', {})
+        fetcher = system.primary.fetcher.stats
+        results = {
+            'messages': len(messages),
+            'mailbox_bytes': sum(len(raw) for raw in messages),
+            'payments_expected': payments,
+            'payments_found': last_run.get('payments', 0),
+            'delivered': smtp.messages,
+            'seconds': round(seconds, 3),
+            'payments_per_minute': round(smtp.messages / seconds * 60, 1) if seconds else 0.0,
+            'messages_per_second': round(len(messages) / seconds, 1) if seconds else 0.0,
+            'latency_ms': stages,
+            'peak_rss_mb': peak_rss_mb(),
+            'imap': {'round_trips': fetcher['round_trips'], 'bytes_fetched': fetcher['bytes_fetched'],
+                     'candidates': fetcher['candidates']},
+            'smtp': {'sessions': system.smtp.get_stats()['handshakes'], 'bytes': smtp.bytes},
+            'document': 'pdf' if system.get_pdf_stats() else 'text'
+        }
+        if paypal is not None:
+            verify_stats = system.get_verification_stats()
+            results['verification'] = {key: verify_stats[key] for key in
+                                       ('verified', 'rejected', 'unconfirmed', 'batches', 'searches')}
+            results['verification']['api_requests'] = dict(paypal.requests)
+        system.smtp.close()
+        system.primary.close()
+        if len(delivered) != payments or smtp.messages != payments:
+            results['warning'] = (f"{payments} payments generated, {len(delivered)} recognised, "
+                                  f"{smtp.messages} delivered")
+        return results
+    finally:
+        os.chdir(original_dir)
+        imap.shutdown()
+        smtp.shutdown()
+        if paypal is not None:
+            paypal.shutdown()
+        if config['keep']:
+            print(f"📁 Scratch directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(previous, current):
+    """Print the change in the headline numbers against an earlier run"""
+    def change(old, new, lower_is_better=False):
+        if not old or new is None:
+            return f"{old} → {new}"
+        delta = (new - old) / old * 100
+        better = delta < 0 if lower_is_better else delta > 0
+        return f"{old} → {new} ({delta:+.1f}%{' ✅' if better else ' ⚠️' if abs(delta) > 5 else ''})"
+
+    old, new = previous['results'], current['results']
+    print(f"📊 vs {previous.get('label') or previous.get('git_commit') or 'previous run'}:")
+    print(f"  payments/min     {change(old['payments_per_minute'], new['payments_per_minute'])}")
+    print(f"  peak RSS MB      {change(old['peak_rss_mb'], new['peak_rss_mb'], lower_is_better=True)}")
+    for stage in STAGES:
+        print(f"  {stage:<7} p95 ms  "
+              f"{change(old['latency_ms'][stage].get('p95'), new['latency_ms'][stage].get('p95'), True)}")
+
+
+def main():
+    config = {
+        'messages': 2000,
+        'payments': 0.25,       # share of payment confirmations
+        'large': 0.05,          # share of messages with an attachment
+        'large_kb': 256,
+        'smtp_latency_ms': 0.0,
+        'verify': False,
+        'api_latency_ms': 0.0,
+        'pdf': True,
+        'pages': 30,
+        'seed': 1333,
+        'verbose': False,
+        'keep': False
+    }
+    output_path = 'bench_delivery_results.json'
+    previous_path = None
+    label = None
+
+    args = sys.argv[1:]
+    for flag, key, kind in [('--messages', 'messages', int), ('--payments', 'payments', float),
+                            ('--large', 'large', float), ('--large-kb', 'large_kb', int),
+                            ('--smtp-latency-ms', 'smtp_latency_ms', float), ('--pages', 'pages', int),
+                            ('--api-latency-ms', 'api_latency_ms', float),
+                            ('--seed', 'seed', int)]:
+        if flag in args:
+            config[key] = kind(args[args.index(flag) + 1])
+    if '--text' in args:
+        config['pdf'] = False
+    config['verify'] = '--verify' in args
+    config['verbose'] = '--verbose' in args
+    config['keep'] = '--keep' in args
+    if '--output' in args:
+        output_path = args[args.index('--output') + 1]
+    if '--compare' in args:
+        previous_path = args[args.index('--compare') + 1]
+    if '--label' in args:
+        label = args[args.index('--label') + 1]
+
+    print(f"🏁 {config['messages']:,} messages: {config['payments']:.0%} payments, "
+          f"{config['large']:.0%} with {config['large_kb']} KB attachments, "
+          f"SMTP latency {config['smtp_latency_ms']:g}ms, {'PDF' if config['pdf'] else 'text'} documents")
+    results = run(config)
+
+    print(f"📈 {results['delivered']} deliveries in {results['seconds']}s: "
+          f"{results['payments_per_minute']:,} payments/min, {results['messages_per_second']:,} messages/s")
+    for stage in STAGES:
+        latency = results['latency_ms'][stage]
+        print(f"  {stage:<7} p50 {latency.get('p50')}ms  p95 {latency.get('p95')}ms  p99 {latency.get('p99')}ms")
+    if 'verification' in results:
+        verification = results['verification']
+        print(f"🛡️ {verification['verified']} verified in {verification['batches']} batches, "
+              f"{verification['api_requests']} PayPal API requests")
+    print(f"🧠 Peak RSS {results['peak_rss_mb']} MB (mailbox {results['mailbox_bytes'] // (1024 * 1024)} MB)")
+    if 'warning' in results:
+        print(f"⚠️ {results['warning']}")
+
+    report = {
+        'benchmark': 'delivery',
+        'label': label,
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(),
+        'config': config,
+        'results': results
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {output_path}")
+
+    if previous_path:
+        with open(previous_path, 'r') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - PDF BENCHMARK
+Per-customer cost: full PDF re-render vs cached master + overlay
+
+Lays out selune_complete_documentation.md (or, if setup_delivery.py has
+not been run, the repository docs repeated to roughly the requested page
+count) and compares rendering the whole PDF for each customer with
+MasterDocument.personalize() on a master rendered once.
+
+Usage:
+    python bench_pdf.py
+    python bench_pdf.py --customers 50 --pages 295
+"""
+
+import sys
+import time
+from datetime import datetime
+
+from delivery_pdf import COVER_TEMPLATE, MasterDocument, layout_markdown, paginate, render_document
+from delivery_template import DocumentTemplate
+
+SOURCE = 'selune_complete_documentation.md'
+FALLBACK_SOURCES = ['README.md', 'TECHNICAL_DOCS.md', 'QUICK_START.md']
+
+
+def load_source(pages):
+    try:
+        with open(SOURCE, 'r', encoding='utf-8') as f:
+            return SOURCE, f.read()
+    except OSError:
+        pass
+
+    docs = []
+    for path in FALLBACK_SOURCES:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                docs.append(f.read())
+        except OSError:
+            pass
+    text = '\n\n'.join(docs) or "# Documentation\n\nLorem ipsum automation.\n"
+    source = text
+    while len(paginate(layout_markdown(source))) < pages:
+        source += '\n\n' + text
+    return 'repository docs', source
+
+
+def customer(i):
+    now = datetime.now().isoformat()
+    return {'email': f'buyer{i}@example.com', 'timestamp': now, 'amount': '25.00',
+            'customer_id': f'AUTO_{i}', 'generated': now}
+
+
+def main():
+    count = 20
+    pages = 295
+    args = sys.argv[1:]
+    if '--customers' in args:
+        count = int(args[args.index('--customers') + 1])
+    if '--pages' in args:
+        pages = int(args[args.index('--pages') + 1])
+
+    name, source = load_source(pages)
+    cover = DocumentTemplate(COVER_TEMPLATE)
+
+    started = time.perf_counter()
+    master = MasterDocument(render_document(source))
+    master_ms = (time.perf_counter() - started) * 1000
+    print(f"📊 {name}: {master.pages} pages, master {len(master.prefix) // 1024} KB "
+          f"rendered once in {master_ms:.0f}ms")
+
+    started = time.perf_counter()
+    for i in range(count):
+        fields = customer(i)
+        render_document(source, cover.render(fields).decode('utf-8'),
+                        watermark=f"Personal copy for {fields['email']}")
+    full_ms = (time.perf_counter() - started) / count * 1000
+
+    started = time.perf_counter()
+    for i in range(count):
+        fields = customer(i)
+        master.personalize(cover.render(fields).decode('utf-8'),
+                           watermark=f"Personal copy for {fields['email']}")
+    overlay_ms = (time.perf_counter() - started) / count * 1000
+
+    print(f"  full re-render   {full_ms:>9.2f}ms per customer")
+    print(f"  master + overlay {overlay_ms:>9.2f}ms per customer")
+    print(f"  speedup: {full_ms / overlay_ms:.0f}x over {count} customers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - LOCAL SERVERS
+In-process IMAP, SMTP and PayPal API stand-ins for benchmarks
+
+FakeIMAPServer serves one in-memory mailbox over plain TCP and speaks the
+subset of IMAP4rev1 the delivery system uses: LOGIN, SELECT/EXAMINE,
+NOOP, IDLE, UID SEARCH (UNSEEN, SINCE, FROM, SUBJECT, OR, UID ranges),
+UID FETCH (BODYSTRUCTURE, HEADER.FIELDS, part sections with partial
+ranges) and UID STORE. SMTPSink accepts every message (optionally after
+a simulated latency) and keeps only its size. FakePayPalAPI answers the
+OAuth2 token and Transaction Search (/v1/reporting/transactions) calls
+that delivery_verify.py makes, from an in-memory transaction list.
+
+None is a conforming server; they exist so bench_delivery.py can drive
+the real monitor → parse → verify → render → send path without touching
+Yahoo or PayPal.
+"""
+
+import base64
+import email
+import json
+import re
+import socketserver
+import threading
+import time
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SEARCH_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|\(|\)|[^\s()]+')
+FETCH_ITEM = re.compile(r'BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+\.\d+>)?|[A-Z0-9.]+')
+BODY_SECTION = re.compile(r'BODY(\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?')
+
+
+class FakeMailbox:
+    """Messages held in memory: uid, flags, raw bytes and the parsed message"""
+
+    def __init__(self, uidvalidity=1):
+        self.uidvalidity = uidvalidity
+        self.next_uid = 1
+        self.messages = []
+        self.changed = threading.Condition()
+
+    def add(self, raw, seen=False):
+        with self.changed:
+            self.messages.append({'uid': self.next_uid, 'raw': raw,
+                                  'flags': {'\\Seen'} if seen else set(),
+                                  'message': email.message_from_bytes(raw)})
+            self.next_uid += 1
+            self.changed.notify_all()
+
+
+def _quote(value):
+    if value is None:
+        return 'NIL'
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _bodystructure(message):
+    if message.is_multipart():
+        children = ''.join(_bodystructure(part) for part in message.get_payload())
+        return f'({children} {_quote(message.get_content_subtype().upper())})'
+
+    params = message.get_params()[1:] if message.get_params() else []
+    params = '(' + ' '.join(f'{_quote(key.upper())} {_quote(value)}' for key, value in params) + ')' \
+        if params else 'NIL'
+    payload = message.get_payload()
+    size = len(payload.encode('utf-8', 'surrogateescape')) if isinstance(payload, str) else 0
+    lines = f' {payload.count(chr(10))}' if message.get_content_maintype() == 'text' else ''
+    disposition = message.get('Content-Disposition')
+    disposition = f'({_quote(disposition.split(";")[0].strip().upper())} NIL)' if disposition else 'NIL'
+    encoding = message.get('Content-Transfer-Encoding', '7BIT').upper()
+    return (f'({_quote(message.get_content_maintype().upper())} '
+            f'{_quote(message.get_content_subtype().upper())} {params} NIL NIL '
+            f'{_quote(encoding)} {size}{lines} NIL {disposition} NIL NIL)')
+
+
+def _section(message, spec):
+    if not message.is_multipart():
+        return message if spec == '1' else None
+    for index in spec.split('.'):
+        message = message.get_payload()[int(index) - 1]
+    return message
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.mailbox = self.server.mailbox
+        self.send('* OK [CAPABILITY IMAP4rev1 IDLE] ready\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode('utf-8', 'replace').rstrip('\r\n').partition(' ')
+            command, _, args = rest.partition(' ')
+            use_uid = command.upper() == 'UID'
+            if use_uid:
+                command, _, args = args.partition(' ')
+            handler = getattr(self, 'do_' + command.upper(), None)
+            if handler is None:
+                self.send(f'{tag} BAD unknown command\r\n')
+            elif handler(tag, args, use_uid) == 'quit':
+                return
+
+    def send(self, data):
+        self.wfile.write(data.encode() if isinstance(data, str) else data)
+
+    def do_CAPABILITY(self, tag, args, use_uid):
+        self.send(f'* CAPABILITY IMAP4rev1 IDLE\r\n{tag} OK done\r\n')
+
+    def do_LOGIN(self, tag, args, use_uid):
+        self.send(f'{tag} OK logged in\r\n')
+
+    def do_SELECT(self, tag, args, use_uid):
+        mailbox = self.mailbox
+        self.send(f'* {len(mailbox.messages)} EXISTS\r\n'
+                  f'* OK [UIDVALIDITY {mailbox.uidvalidity}] ok\r\n'
+                  f'* OK [UIDNEXT {mailbox.next_uid}] ok\r\n{tag} OK [READ-WRITE] done\r\n')
+
+    do_EXAMINE = do_SELECT
+
+    def do_NOOP(self, tag, args, use_uid):
+        self.send(f'{tag} OK done\r\n')
+
+    def do_LOGOUT(self, tag, args, use_uid):
+        self.send(f'* BYE\r\n{tag} OK done\r\n')
+        return 'quit'
+
+    def do_IDLE(self, tag, args, use_uid):
+        mailbox = self.mailbox
+        known = len(mailbox.messages)
+        self.send('+ idling\r\n')
+        with mailbox.changed:
+            mailbox.changed.wait_for(lambda: len(mailbox.messages) > known,
+                                     timeout=self.server.idle_timeout)
+        if len(mailbox.messages) > known:
+            self.send(f'* {len(mailbox.messages)} EXISTS\r\n')
+        self.rfile.readline()  # DONE
+        self.send(f'{tag} OK idle done\r\n')
+
+    def do_SEARCH(self, tag, args, use_uid):
+        tokens = SEARCH_TOKEN.findall(args)
+        found = []
+        for seqno, item in enumerate(self.mailbox.messages, 1):
+            position, matched = 0, True
+            while position < len(tokens):
+                result, position = self._match(tokens, position, item)
+                matched = matched and result
+            if matched:
+                found.append(str(item['uid'] if use_uid else seqno))
+        self.send(f'* SEARCH {" ".join(found)}\r\n{tag} OK done\r\n')
+
+    def do_STORE(self, tag, args, use_uid):
+        sequence, operation, flags = args.split(' ', 2)
+        flags = set(flags.strip('()').split())
+        for seqno, item in self._resolve(sequence, use_uid):
+            if operation.startswith('+'):
+                item['flags'] |= flags
+            elif operation.startswith('-'):
+                item['flags'] -= flags
+            self.send(f'* {seqno} FETCH (UID {item["uid"]} FLAGS ({" ".join(sorted(item["flags"]))}))\r\n')
+        self.send(f'{tag} OK done\r\n')
+
+    def do_FETCH(self, tag, args, use_uid):
+        sequence, _, items = args.partition(' ')
+        specs = FETCH_ITEM.findall(items.strip().strip('()').upper())
+        if use_uid and 'UID' not in specs:
+            specs.insert(0, 'UID')
+        for seqno, item in self._resolve(sequence, use_uid):
+            response = b'* %d FETCH (' % seqno
+            response += b' '.join(self._fetch_item(item, spec) for spec in specs)
+            self.send(response + b')\r\n')
+        self.send(f'{tag} OK done\r\n')
+
+    def _fetch_item(self, item, spec):
+        if spec == 'UID':
+            return b'UID %d' % item['uid']
+        if spec == 'FLAGS':
+            return f'FLAGS ({" ".join(sorted(item["flags"]))})'.encode()
+        if spec == 'RFC822.SIZE':
+            return b'RFC822.SIZE %d' % len(item['raw'])
+        if spec == 'BODYSTRUCTURE':
+            return ('BODYSTRUCTURE ' + _bodystructure(item['message'])).encode()
+
+        peek, section, offset, length = BODY_SECTION.match(spec).groups()
+        raw = item['raw']
+        if section.startswith('HEADER.FIELDS'):
+            wanted = section[section.index('(') + 1:-1].split()
+            data = ''.join(f'{key}: {value}\r\n' for key, value in item['message'].items()
+                           if key.upper() in wanted) + '\r\n'
+            data = data.encode('utf-8', 'surrogateescape')
+        elif section == '':
+            data = raw
+        elif section == 'HEADER':
+            data = raw.split(b'\r\n\r\n', 1)[0] + b'\r\n\r\n'
+        elif section == 'TEXT':
+            data = raw.split(b'\r\n\r\n', 1)[1] if b'\r\n\r\n' in raw else b''
+        else:
+            part = _section(item['message'], section)
+            payload = part.get_payload() if part is not None else ''
+            data = payload.encode('utf-8', 'surrogateescape') if isinstance(payload, str) else b''
+
+        key = f'BODY[{section}]'
+        if offset is not None:
+            data = data[int(offset):int(offset) + int(length)]
+            key += f'<{offset}>'
+        if not peek:
+            item['flags'].add('\\Seen')
+        return key.encode() + b' {%d}\r\n' % len(data) + data
+
+    def _resolve(self, sequence, use_uid):
+        messages = self.mailbox.messages
+        highest = (messages[-1]['uid'] if use_uid else len(messages)) if messages else 0
+        wanted = []
+        for piece in sequence.split(','):
+            low, _, high = piece.partition(':')
+            low = highest if low == '*' else int(low)
+            high = low if not high else (highest if high == '*' else int(high))
+            wanted.append((min(low, high), max(low, high)))
+        return [(seqno, item) for seqno, item in enumerate(messages, 1)
+                if any(low <= (item['uid'] if use_uid else seqno) <= high for low, high in wanted)]
+
+    def _match(self, tokens, position, item):
+        token = tokens[position].upper()
+        position += 1
+        message = item['message']
+
+        def argument():
+            nonlocal position
+            value = tokens[position]
+            position += 1
+            return value[1:-1] if value.startswith('"') else value
+
+        if token == '(':
+            matched = True
+            while tokens[position] != ')':
+                result, position = self._match(tokens, position, item)
+                matched = matched and result
+            return matched, position + 1
+        if token == 'ALL':
+            return True, position
+        if token in ('UNSEEN', 'SEEN'):
+            return ('\\Seen' in item['flags']) == (token == 'SEEN'), position
+        if token == 'NOT':
+            result, position = self._match(tokens, position, item)
+            return not result, position
+        if token == 'OR':
+            first, position = self._match(tokens, position, item)
+            second, position = self._match(tokens, position, item)
+            return first or second, position
+        if token in ('FROM', 'SUBJECT', 'TO'):
+            return argument().lower() in str(message.get(token.title(), '')).lower(), position
+        if token in ('BODY', 'TEXT'):
+            return argument().lower().encode() in item['raw'].lower(), position
+        if token in ('SINCE', 'BEFORE'):
+            day = datetime.strptime(argument(), '%d-%b-%Y').date()
+            try:
+                sent = parsedate_to_datetime(message['Date']).date()
+            except (TypeError, ValueError):
+                sent = date.today()
+            return (sent >= day) if token == 'SINCE' else (sent < day), position
+        if token == 'UID':
+            wanted = argument()
+            return any(other is item for _, other in self._resolve(wanted, True)), position
+        if token == 'CHARSET':
+            argument()
+            return True, position
+        return any(other is item for _, other in self._resolve(token, False)), position
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """One in-memory mailbox served on 127.0.0.1 (plain TCP, any login accepted)"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox=None, idle_timeout=30):
+        super().__init__(('127.0.0.1', 0), _IMAPHandler)
+        self.mailbox = mailbox or FakeMailbox()
+        self.idle_timeout = idle_timeout
+        threading.Thread(target=self.serve_forever, name='fake-imap', daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        sink = self.server
+        self.wfile.write(b'220 sink ESMTP ready\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().upper()
+            if command.startswith(b'EHLO'):
+                self.wfile.write(b'250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 104857600\r\n')
+            elif command.startswith(b'AUTH'):
+                self.wfile.write(b'235 accepted\r\n')
+            elif command == b'DATA':
+                self.wfile.write(b'354 go ahead\r\n')
+                # Read in blocks up to the CRLF.CRLF terminator instead of line by line
+                size, tail = 0, b'\r\n'
+                while not tail.endswith(b'\r\n.\r\n'):
+                    data = self.rfile.read1(65536)
+                    if not data:
+                        return
+                    size += len(data)
+                    tail = (tail + data)[-5:]
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.received(size)
+                self.wfile.write(b'250 queued\r\n')
+            elif command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            else:
+                self.wfile.write(b'250 ok\r\n')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Accepts and discards every message on 127.0.0.1, counting messages and bytes"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+        threading.Thread(target=self.serve_forever, name='smtp-sink', daemon=True).start()
+
+    def received(self, size):
+        with self.lock:
+            self.messages += 1
+            self.bytes += size
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class _PayPalHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def do_POST(self):
+        api = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        api.count(self.path)
+        if self.path != '/v1/oauth2/token':
+            return self._reply(404, {'name': 'NOT_FOUND'})
+        expected = base64.b64encode(f"{api.client_id}:{api.client_secret}".encode()).decode()
+        if self.headers.get('Authorization') != f'Basic {expected}' or b'client_credentials' not in body:
+            return self._reply(401, {'error': 'invalid_client', 'error_description': 'Client Authentication failed'})
+        self._reply(200, {'access_token': api.token, 'token_type': 'Bearer', 'expires_in': 32400})
+
+    def do_GET(self):
+        api = self.server
+        url = urlsplit(self.path)
+        api.count(url.path)
+        if url.path != '/v1/reporting/transactions':
+            return self._reply(404, {'name': 'NOT_FOUND'})
+        if self.headers.get('Authorization') != f'Bearer {api.token}':
+            return self._reply(401, {'name': 'AUTHENTICATION_FAILURE'})
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            start = datetime.fromisoformat(query['start_date'].replace('Z', '+00:00'))
+            end = datetime.fromisoformat(query['end_date'].replace('Z', '+00:00'))
+        except (KeyError, ValueError):
+            return self._reply(400, {'name': 'INVALID_REQUEST', 'message': 'start_date and end_date are required'})
+        if (end - start).days > 31:
+            return self._reply(400, {'name': 'INVALID_REQUEST', 'message': 'Date range is greater than 31 days'})
+
+        matches = [info for info in api.list_transactions()
+                   if start <= datetime.fromisoformat(info['transaction_initiation_date']) <= end
+                   and query.get('transaction_id') in (None, info['transaction_id'])]
+        page_size = min(int(query.get('page_size', 100)), 500)
+        page = int(query.get('page', 1))
+        total_pages = max(1, -(-len(matches) // page_size))
+        rows = matches[(page - 1) * page_size:page * page_size]
+        if api.latency:
+            time.sleep(api.latency)
+        self._reply(200, {
+            'transaction_details': [{'transaction_info': info} for info in rows],
+            'page': page,
+            'total_items': len(matches),
+            'total_pages': total_pages
+        })
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePayPalAPI(ThreadingHTTPServer):
+    """PayPal REST stand-in on http://127.0.0.1: OAuth2 token and Transaction Search"""
+
+    daemon_threads = True
+
+    def __init__(self, client_id='bench', client_secret='bench', latency=0.0):
+        super().__init__(('127.0.0.1', 0), _PayPalHandler)
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.latency = latency
+        self.token = 'A21AA-bench-token'
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.requests = {}
+        threading.Thread(target=self.serve_forever, name='paypal-api', daemon=True).start()
+
+    def add(self, transaction_id, amount, currency='USD', status='S', when=None):
+        """Record a transaction (status S completed, P pending, D denied, V reversed)"""
+        when = (when or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        with self.lock:
+            self.transactions[transaction_id] = {
+                'transaction_id': transaction_id,
+                'transaction_event_code': 'T0006',
+                'transaction_initiation_date': when.isoformat(timespec='seconds'),
+                'transaction_amount': {'currency_code': currency, 'value': f"{float(amount):.2f}"},
+                'transaction_status': status
+            }
+
+    def list_transactions(self):
+        with self.lock:
+            return list(self.transactions.values())
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
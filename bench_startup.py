@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - STARTUP BENCHMARK
+Wall-clock and import time of the stats command: snapshot vs full system
+
+Fills a scratch directory with a customer store of the given size, then
+runs `automated_delivery.py --json` as a fresh process, the way cron and
+dashboards do, in two ways:
+
+- snapshot: reads delivery_stats.json (delivery_snapshot.py) and imports
+  nothing else
+- full: `--refresh`, which builds SelûneDeliverySystem (imaplib, smtplib,
+  the email stack, every database, the customer index) like every stats
+  call did before the snapshot
+
+Each is timed over several runs (median), and once more under
+`python -X importtime` to show which imports the startup is spent on.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --customers 100000 --runs 9 --output startup.json
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from delivery_store import CustomerStore
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(ROOT, 'automated_delivery.py')
+
+MODES = {
+    'interpreter': ['-c', 'pass'],
+    'snapshot': [SCRIPT, '--json'],
+    'full': [SCRIPT, '--refresh', '--json'],
+}
+
+
+def populate(workdir, count):
+    """A customers.db with count purchases by roughly count * 0.8 buyers"""
+    store = CustomerStore(os.path.join(workdir, 'customers.db'),
+                          legacy_json=os.path.join(workdir, 'customers.json'))
+    batch = []
+    for i in range(count):
+        batch.append({
+            'customer_id': f"BENCH_{i:07d}",
+            'email': f"buyer{i % max(1, int(count * 0.8))}@example.com",
+            'amount': f"{20 + i % 180}.00",
+            'transaction_id': f"TXN{i:014d}",
+            'message_id': f"<bench-{i}@paypal.com>",
+            'timestamp': f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00",
+            'delivery_status': 'delivered' if i % 10 else 'pending'
+        })
+        if len(batch) == 5000:
+            store.save_many(batch)
+            batch = []
+    if batch:
+        store.save_many(batch)
+    store.close()
+
+
+def run_once(workdir, args, importtime=False):
+    """(seconds, stderr) of one fresh interpreter running args in workdir"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + args
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {result.stderr.strip()[-500:]}")
+    return seconds, result.stderr
+
+
+def parse_importtime(stderr, top=8):
+    """Total import time and the slowest imports one level below the script's own, in ms"""
+    imports = []
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        total += int(own)
+        # Depth 1: what the entry modules (delivery_system, delivery_snapshot) pull in
+        if (len(name) - len(name.lstrip()) - 1) // 2 == 1:
+            imports.append((int(cumulative), name.strip()))
+    imports.sort(reverse=True)
+    return {
+        'total_ms': round(total / 1000, 1),
+        'modules': sum(1 for line in stderr.splitlines() if line.startswith('import time:')) - 1,
+        'top': [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for us, name in imports[:top]]
+    }
+
+
+def main():
+    customers = 20000
+    runs = 5
+    output = None
+    args = sys.argv[1:]
+    if '--customers' in args:
+        customers = int(args[args.index('--customers') + 1])
+    if '--runs' in args:
+        runs = int(args[args.index('--runs') + 1])
+    if '--output' in args:
+        output = args[args.index('--output') + 1]
+
+    workdir = tempfile.mkdtemp(prefix='selune-startup-')
+    try:
+        print(f"📊 Stats command startup with {customers:,} purchase records ({runs} runs each)")
+        populate(workdir, customers)
+        run_once(workdir, MODES['full'])  # writes the snapshot, warms the page cache
+
+        results = {}
+        for mode, mode_args in MODES.items():
+            times = [run_once(workdir, mode_args)[0] for _ in range(runs)]
+            _, stderr = run_once(workdir, mode_args, importtime=True)
+            results[mode] = {
+                'median_ms': round(statistics.median(times) * 1000, 1),
+                'min_ms': round(min(times) * 1000, 1),
+                'imports': parse_importtime(stderr)
+            }
+            imports = results[mode]['imports']
+            print(f"  {mode:<12} median {results[mode]['median_ms']:>7.1f}ms  "
+                  f"min {results[mode]['min_ms']:>7.1f}ms  "
+                  f"imports {imports['total_ms']:>6.1f}ms ({imports['modules']} modules)")
+
+        floor = results['interpreter']['median_ms']
+        snapshot, full = results['snapshot']['median_ms'], results['full']['median_ms']
+        print(f"  speedup: {full / snapshot:.1f}x overall, "
+              f"{(full - floor) / max(snapshot - floor, 0.1):.1f}x above the bare interpreter")
+        for mode in ('full', 'snapshot'):
+            print(f"🐢 Slowest imports ({mode}): " + ', '.join(
+                f"{entry['module']} {entry['cumulative_ms']}ms" for entry in results[mode]['imports']['top'][:5]))
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump({'customers': customers, 'runs': runs, 'python': sys.version.split()[0],
+                           'results': results}, f, indent=2)
+            print(f"💾 Results written to {output}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
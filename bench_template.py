@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - TEMPLATE BENCHMARK
+Per-customer render time: string rebuild + temp file vs DocumentTemplate
+
+Renders the built-in document and a synthetic ~295 page document (the
+built-in template padded with TECHNICAL_DOCS.md) for a batch of
+customers, comparing the old approach (rebuild the string, write it to
+disk, read it back for the attachment) with DocumentTemplate.render().
+
+Usage:
+    python bench_template.py
+    python bench_template.py --customers 500 --pages 295
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from delivery_template import DEFAULT_TEMPLATE, DocumentTemplate
+
+CHARS_PER_PAGE = 3000
+
+
+def build_source(pages):
+    """The built-in template with its body padded out to roughly pages pages"""
+    if pages <= 0:
+        return DEFAULT_TEMPLATE
+    try:
+        with open('TECHNICAL_DOCS.md', 'r', encoding='utf-8') as f:
+            filler = f.read()
+    except OSError:
+        filler = "Lorem ipsum automation documentation. " * 100
+    # Keep literal braces out of the padding so only the real fields are slots
+    filler = filler.replace('{{', '{ {')
+    target = pages * CHARS_PER_PAGE
+    padding = (filler * (target // len(filler) + 1))[:target]
+    marker = '[Complete technical documentation would be included here - 295 pages]'
+    return DEFAULT_TEMPLATE.replace(marker, padding)
+
+
+def customers(count):
+    now = datetime.now().isoformat()
+    return [{'email': f'buyer{i}@example.com', 'timestamp': now, 'amount': '25.00',
+             'customer_id': f'AUTO_{i}', 'generated': now} for i in range(count)]
+
+
+def legacy_render(source, fields, directory):
+    """Old flow: rebuild the whole string, write a file, read it back"""
+    content = source
+    for name, value in fields.items():
+        content = content.replace('{{ ' + name + ' }}', str(value))
+    path = os.path.join(directory, f"selune_docs_{fields['email'].replace('@', '_')}.txt")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def timed(render, batch):
+    started = time.perf_counter()
+    for fields in batch:
+        render(fields)
+    return (time.perf_counter() - started) / len(batch) * 1000
+
+
+def main():
+    count = 200
+    pages = 295
+    args = sys.argv[1:]
+    if '--customers' in args:
+        count = int(args[args.index('--customers') + 1])
+    if '--pages' in args:
+        pages = int(args[args.index('--pages') + 1])
+
+    batch = customers(count)
+    print(f"📊 Rendering {count} personalized documents")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, source in (('built-in', build_source(0)), (f'{pages} pages', build_source(pages))):
+            parse_started = time.perf_counter()
+            template = DocumentTemplate(source)
+            parse_ms = (time.perf_counter() - parse_started) * 1000
+
+            legacy_ms = timed(lambda fields: legacy_render(source, fields, directory), batch)
+            template_ms = timed(template.render, batch)
+            print(f"  {label:<10} {template.static_bytes / 1024:>8,.0f} KB   parse once {parse_ms:>7.2f}ms   "
+                  f"legacy {legacy_ms:>7.3f}ms   template {template_ms:>7.3f}ms per customer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - ATTACHMENT CACHE
+Pre-encoded attachments and streamed delivery messages
+
+Every customer copy of the documentation starts with the same master
+PDF bytes. AttachmentCache base64-encodes that shared prefix once (cut
+on a 57-byte boundary, so the cached text is whole 76-character lines)
+and keeps it in a size-bounded LRU. Per delivery only the few KB after
+the prefix are encoded.
+
+StreamingMessage is the delivery email as a sequence of byte chunks: the
+small personalized headers and text part are generated per customer,
+the cached base64 is referenced rather than copied, and
+SMTPConnectionPool writes the chunks straight to the socket during DATA.
+"""
+
+import base64
+import re
+import threading
+from collections import OrderedDict
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+LINE_BYTES = 57  # raw bytes per 76-character base64 line
+PLACEHOLDER = 'SELUNE-ATTACHMENT-PAYLOAD'
+LEADING_DOT = re.compile(rb'(?m)^\.')
+
+
+def encode_lines(data):
+    """base64 in 76-character CRLF-terminated lines"""
+    return base64.encodebytes(data).replace(b'\n', b'\r\n')
+
+
+class AttachmentCache:
+    """LRU of base64-encoded shared document prefixes, bounded by count and bytes"""
+
+    def __init__(self, max_entries=4, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> encoded bytes
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'encoded_bytes': 0}
+
+    def encode(self, document, key=None, shared_length=0):
+        """Base64 chunks for document, reusing the cached encoding of its shared prefix"""
+        aligned = shared_length - shared_length % LINE_BYTES
+        if key is None or aligned == 0:
+            self._count('encoded_bytes', len(document))
+            return [encode_lines(document)]
+
+        prefix = self._get(key)
+        if prefix is None:
+            prefix = encode_lines(document[:aligned])
+            self._put(key, prefix)
+        tail = document[aligned:]
+        self._count('encoded_bytes', len(tail))
+        return [prefix, encode_lines(tail)]
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), cached_bytes=self.size)
+
+    def _get(self, key):
+        with self.lock:
+            encoded = self.entries.get(key)
+            if encoded is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return encoded
+
+    def _put(self, key, encoded):
+        if len(encoded) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = encoded
+            self.size += len(encoded)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.stats['evictions'] += 1
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+
+class StreamingMessage:
+    """multipart/mixed email with one pre-encoded attachment, emitted as chunks"""
+
+    def __init__(self, sender, recipient, subject, body, filename, content_type, encoded_chunks):
+        self.sender = sender
+        self.recipient = recipient
+        self.encoded_chunks = encoded_chunks
+
+        # Let the email package handle header encoding, boundaries and the
+        # text part; the attachment body is spliced in at the placeholder
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        attachment = MIMEBase(*content_type.split('/', 1))
+        attachment['Content-Transfer-Encoding'] = 'base64'
+        attachment.add_header('Content-Disposition', f'attachment; filename= {filename}')
+        attachment.set_payload(PLACEHOLDER)
+        msg.attach(attachment)
+
+        envelope = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+        head, tail = envelope.split(PLACEHOLDER.encode(), 1)
+        self.head = LEADING_DOT.sub(b'..', head)
+        self.tail = LEADING_DOT.sub(b'..', tail.lstrip(b'\r\n'))
+        if not self.tail.endswith(b'\r\n'):
+            self.tail += b'\r\n'
+
+    def chunks(self):
+        """Dot-stuffed DATA payload, ending in CRLF (base64 lines never start with '.')"""
+        yield self.head
+        yield from self.encoded_chunks
+        yield self.tail
+
+    def as_bytes(self):
+        return b''.join(self.chunks()).replace(b'\r\n..', b'\r\n.')
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - ARCHIVE BACKFILL
+Replay mbox / Maildir exports through the payment parser in parallel
+
+After an account migration or an outage, historical payment emails are
+imported from a local export instead of live IMAP:
+
+    python automated_delivery.py --backfill PATH [--workers N] [--redeliver]
+
+The main process reads raw messages from the archive in batches and a
+process pool parses them with the same PaymentEmailParser the monitor
+uses. Payments are written to the customer store in one transaction per
+batch, their Message-IDs go into the shared processed index (so neither
+a second backfill nor the live monitor counts them again), and with
+--redeliver they are queued in the outbox for paced delivery.
+
+Progress is checkpointed per archive after every batch; an interrupted
+run resumes at the first uncommitted message.
+"""
+
+import email
+import hashlib
+import json
+import mailbox
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from delivery_classifier import PaymentClassifier, PaymentEmailParser
+from delivery_mime import BodyExtractor
+
+_parser = None  # per worker process
+
+
+def _init_worker(ignore_addresses, max_body_bytes):
+    global _parser
+    _parser = PaymentEmailParser(PaymentClassifier(ignore_addresses=ignore_addresses),
+                                 BodyExtractor(max_bytes=max_body_bytes).extract)
+
+
+def _parse(item):
+    """Worker: (key, raw bytes) → (key, Message-ID, customer record or None, error)"""
+    key, raw = item
+    try:
+        message = email.message_from_bytes(raw)
+        _, customer_info = _parser.parse(message)  # timestamp from the Date header
+        return key, message['Message-ID'], customer_info, None
+    except Exception as e:
+        return key, None, None, str(e)
+
+
+def open_archive(path):
+    """mailbox.Maildir for a Maildir directory, mailbox.mbox for a file"""
+    if os.path.isdir(path):
+        if not all(os.path.isdir(os.path.join(path, sub)) for sub in ('cur', 'new')):
+            raise ValueError(f"{path} is a directory but not a Maildir (no cur/ and new/)")
+        return mailbox.Maildir(path, factory=None, create=False)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    return mailbox.mbox(path, factory=None, create=False)
+
+
+class BackfillCheckpoint:
+    """Committed position per archive, saved atomically after every batch"""
+
+    def __init__(self, path='delivery_backfill.json'):
+        self.path = path
+        self.archives = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.archives = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Backfill checkpoint unreadable, starting fresh: {e}")
+
+    def position(self, archive, total, first_key):
+        """Messages already committed, or 0 if the archive changed underneath us"""
+        entry = self.archives.get(archive)
+        if not entry:
+            return 0
+        if entry.get('first_key') != first_key or entry.get('position', 0) > total:
+            print(f"⚠️ {archive} changed since the last backfill, starting over")
+            return 0
+        return entry['position']
+
+    def save(self, archive, position, total, first_key, stats):
+        self.archives[archive] = {
+            'position': position,
+            'total': total,
+            'first_key': first_key,
+            'stats': stats,
+            'updated': datetime.now().isoformat()
+        }
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.archives, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+
+class ArchiveBackfill:
+    """Parse an mbox/Maildir export in a process pool into the delivery system's stores"""
+
+    def __init__(self, delivery_system, path, workers=None, batch_size=500, chunksize=16,
+                 redeliver=False, checkpoint_file='delivery_backfill.json', report_interval=5):
+        self.delivery_system = delivery_system
+        self.path = os.path.abspath(path)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.chunksize = chunksize
+        self.redeliver = redeliver
+        self.checkpoint = BackfillCheckpoint(checkpoint_file)
+        self.report_interval = report_interval
+        self.stats = {
+            'messages': 0,
+            'payments': 0,
+            'duplicates': 0,
+            'not_payments': 0,
+            'errors': 0,
+            'queued': 0,
+            'seconds': 0.0
+        }
+
+    def run(self):
+        """Import the whole archive (from the checkpoint on); returns the stats"""
+        archive = open_archive(self.path)
+        try:
+            keys = list(archive.keys())
+            if isinstance(archive, mailbox.Maildir):
+                keys.sort()  # mbox keys are already in file order
+            total = len(keys)
+            first_key = str(keys[0]) if keys else None
+            position = self.checkpoint.position(self.path, total, first_key)
+            if position:
+                print(f"⏩ Resuming {self.path} at message {position:,} of {total:,}")
+            print(f"📦 Backfilling {total - position:,} messages from {self.path} "
+                  f"with {self.workers} workers")
+
+            system = self.delivery_system
+            initargs = (sorted(system.classifier.ignore_addresses), system.body_extractor.max_bytes)
+            started = last_report = time.monotonic()
+
+            with multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=initargs) as pool:
+                # Read batch n+1 while the pool parses batch n
+                batches = (keys[start:start + self.batch_size]
+                           for start in range(position, total, self.batch_size))
+                pending = None
+                for batch in batches:
+                    items = [(key, archive.get_bytes(key)) for key in batch]
+                    submitted = pool.map_async(_parse, items, self.chunksize)
+                    if pending is not None:
+                        position = self._commit(pending.get(), position, total, first_key)
+                    pending = submitted
+
+                    now = time.monotonic()
+                    if now - last_report >= self.report_interval:
+                        self._report(position, total, now - started)
+                        last_report = now
+                if pending is not None:
+                    position = self._commit(pending.get(), position, total, first_key)
+
+            self.stats['seconds'] = round(time.monotonic() - started, 2)
+            self._report(position, total, self.stats['seconds'])
+            return self.get_stats()
+        finally:
+            archive.close()
+
+    def get_stats(self):
+        seconds = self.stats['seconds']
+        return dict(self.stats,
+                    messages_per_second=round(self.stats['messages'] / seconds, 1) if seconds else 0.0)
+
+    def _commit(self, results, position, total, first_key):
+        """Store one parsed batch in bulk, then move the checkpoint past it"""
+        system = self.delivery_system
+        archive_name = os.path.basename(self.path.rstrip(os.sep))
+        records, message_keys, seen = [], [], set()
+
+        for key, message_id, customer_info, error in results:
+            self.stats['messages'] += 1
+            if error:
+                self.stats['errors'] += 1
+                continue
+            if customer_info is None:
+                self.stats['not_payments'] += 1
+                continue
+            message_key = message_id or f"archive:{archive_name}:{key}"
+            if message_key in seen or message_key in system.processed_messages:
+                self.stats['duplicates'] += 1
+                continue
+            seen.add(message_key)
+
+            # Deterministic id: re-running a batch after a crash updates in place
+            digest = hashlib.blake2b(message_key.encode('utf-8', errors='ignore'), digest_size=8)
+            customer_id = f"BACKFILL_{digest.hexdigest()}"
+            # The same payment under another Message-ID (a forwarded receipt)
+            transaction_id = customer_info.get('transaction_id')
+            if transaction_id and not system.customers.index.reserve_transaction(transaction_id, customer_id):
+                self.stats['duplicates'] += 1
+                continue
+            customer_info.update(
+                customer_id=customer_id,
+                message_id=message_key,
+                source='backfill',
+                delivery_status='pending' if self.redeliver else 'imported')
+            records.append(customer_info)
+            message_keys.append(message_key)
+
+        if records:
+            # Each step is idempotent, so replaying a half-committed batch is safe
+            system.customers.save_many(records)
+            if self.redeliver:
+                self.stats['queued'] += system.outbox.enqueue_many(
+                    [(record['message_id'], record) for record in records])
+            system.processed_messages.add_many(message_keys)
+            self.stats['payments'] += len(records)
+
+        position += len(results)
+        self.checkpoint.save(self.path, position, total, first_key, dict(self.stats))
+        return position
+
+    def _report(self, position, total, elapsed):
+        rate = self.stats['messages'] / elapsed if elapsed else 0.0
+        print(f"📦 Backfill: {position:,}/{total:,} messages ({rate:,.0f} msg/s), "
+              f"{self.stats['payments']} payments, {self.stats['duplicates']} duplicates, "
+              f"{self.stats['errors']} errors")
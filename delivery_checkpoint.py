@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - CHECKPOINTS
+Crash-safe progress tracking for the inbox monitor
+
+Provides:
+- MailboxCheckpoint: UIDVALIDITY + highest processed UID, so each cycle
+  only looks at new UIDs and a restart resumes where it stopped
+- MessageIdIndex: append-only on-disk index of processed Message-IDs
+  (128-bit digests held in a set) that makes duplicate deliveries
+  impossible even if the \\Seen flag or the checkpoint is lost
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class MailboxCheckpoint:
+    """Persistent UID high-water mark for one mailbox"""
+
+    def __init__(self, path='delivery_checkpoint.json'):
+        self.path = path
+        self.uidvalidity = None
+        self.last_uid = None
+        self.load()
+
+    def load(self):
+        """Load the checkpoint, starting fresh if it is missing or corrupt"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.uidvalidity = data.get('uidvalidity')
+            self.last_uid = data.get('last_uid')
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Checkpoint unreadable, starting fresh: {e}")
+
+    def save(self):
+        """Atomically write the checkpoint (write temp file, then rename)"""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'uidvalidity': self.uidvalidity,
+                'last_uid': self.last_uid,
+                'updated': datetime.now().isoformat()
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def validate(self, uidvalidity):
+        """Reset the high-water mark if the server renumbered the mailbox"""
+        if uidvalidity is None:
+            return
+        if self.uidvalidity is not None and self.uidvalidity != uidvalidity:
+            print(f"⚠️ UIDVALIDITY changed ({self.uidvalidity} → {uidvalidity}), "
+                  f"rescanning unread mail")
+            self.last_uid = None
+        self.uidvalidity = uidvalidity
+
+    def next_uid(self):
+        """First UID not yet processed, or None before the first cycle"""
+        return None if self.last_uid is None else self.last_uid + 1
+
+    def advance(self, uids):
+        """Move the high-water mark past the given UIDs and persist it"""
+        if not uids:
+            return
+        highest = max(int(uid) for uid in uids)
+        if self.last_uid is None or highest > self.last_uid:
+            self.last_uid = highest
+            self.save()
+
+
+class MessageIdIndex:
+    """Append-only set of processed Message-IDs"""
+
+    def __init__(self, path='processed_messages.idx'):
+        self.path = path
+        self.digests = set()
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def digest(message_id):
+        """128-bit digest of a normalized Message-ID"""
+        normalized = message_id.strip().strip('<>').strip()
+        return hashlib.blake2b(normalized.encode('utf-8', errors='ignore'),
+                               digest_size=16).digest()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if len(line) == 32:
+                    self.digests.add(bytes.fromhex(line))
+
+    def __contains__(self, message_id):
+        return self.digest(message_id) in self.digests
+
+    def __len__(self):
+        return len(self.digests)
+
+    def add(self, message_id):
+        """Record a Message-ID durably; returns False if it was already present"""
+        digest = self.digest(message_id)
+        with self.lock:
+            if digest in self.digests:
+                return False
+            with open(self.path, 'a') as f:
+                f.write(digest.hex() + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.digests.add(digest)
+        return True
+
+    def add_many(self, message_ids):
+        """Record a batch of Message-IDs with one write and fsync; returns how many were new"""
+        with self.lock:
+            new = {self.digest(message_id) for message_id in message_ids} - self.digests
+            if not new:
+                return 0
+            with open(self.path, 'a') as f:
+                f.write(''.join(digest.hex() + '\n' for digest in new))
+                f.flush()
+                os.fsync(f.fileno())
+            self.digests.update(new)
+        return len(new)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - PAYMENT CLASSIFIER
+Single-pass, weighted payment email classification
+
+PaymentClassifier compiles every keyword, amount, payer address and
+transaction ID pattern into one alternation at construction time. The
+message is lowercased once and a single finditer() then scores the
+weighted rules and extracts amount, currency, payer and transaction ID
+together, with no per-keyword lowercasing and no per-call regex lookups.
+Before that scan, plain substring checks give an upper bound on the
+score; mail that cannot reach the threshold (personal mail, most
+marketing) is rejected without running the regex at all.
+
+A bare "$" is no longer enough: it only scores as part of an amount,
+and marketing mail has to clear the same score threshold as receipts.
+
+PaymentEmailParser turns a whole email into the customer record the
+delivery system stores; the live monitor and the archive backfill share it.
+"""
+
+import re
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+# (keyword, weight) - matched case-insensitively on word boundaries
+KEYWORD_RULES = [
+    ('paypal', 2.0),
+    ('payment', 2.0),
+    ('paid', 1.5),
+    ('you received', 1.5),
+    ('sent you', 1.5),
+    ('receipt', 1.0),
+    ('confirmation', 0.5),
+    ('transaction', 1.0),
+]
+
+# Keywords that argue against a payment (newsletters, promotions)
+NEGATIVE_RULES = [
+    ('unsubscribe', -1.5),
+    ('sale', -0.5),
+    ('% off', -1.5),
+    ('newsletter', -1.5),
+]
+
+AMOUNT_WEIGHT = 2.0
+TRANSACTION_ID_WEIGHT = 2.0
+SUBJECT_MULTIPLIER = 1.5
+DEFAULT_THRESHOLD = 3.0
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP'}
+CURRENCY_CODES = 'usd|eur|gbp|cad|aud'
+AMOUNT = r'\d{1,7}(?:,\d{3})*(?:\.\d{1,2})?'
+
+# Extractors. Each alternative starts with a literal or a small character
+# set, which lets the regex engine skip ahead to the next possible match
+# start instead of trying every rule at every position. Named groups
+# disable that optimisation, so matches are told apart by group index.
+TRANSACTION_ID = r'(?:transaction|txn)\s*(?:id|#|number|no\.?)?\s*[:#]?\s*((?=[a-z]*\d)[a-z0-9]{12,20})\b'
+AMOUNT_WITH_SYMBOL = rf'([{"".join(CURRENCY_SYMBOLS)}])\s?({AMOUNT})(?:\s?({CURRENCY_CODES})\b)?'
+ADDRESS_DOMAIN = r'@[\w-]+(?:\.[\w-]+)+'
+ADDRESS_LOCAL_PART = re.compile(r'[\w.+-]{1,64}$')
+
+GROUP_TRANSACTION_ID = 1
+
+
+class ClassificationResult:
+    """Outcome of classifying one email"""
+
+    __slots__ = ('is_payment', 'score', 'amount', 'currency', 'payer_email',
+                 'transaction_id', 'matched')
+
+    def __init__(self, is_payment, score, amount, currency, payer_email, transaction_id, matched):
+        self.is_payment = is_payment
+        self.score = score
+        self.amount = amount
+        self.currency = currency
+        self.payer_email = payer_email
+        self.transaction_id = transaction_id
+        self.matched = matched
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PaymentClassifier:
+    """Precompiled one-pass classifier for payment confirmation emails"""
+
+    def __init__(self, keyword_rules=KEYWORD_RULES, negative_rules=NEGATIVE_RULES,
+                 threshold=DEFAULT_THRESHOLD, ignore_addresses=()):
+        self.threshold = threshold
+        self.ignore_addresses = {address.lower() for address in ignore_addresses}
+        self.weights = {keyword.lower(): weight
+                        for keyword, weight in list(keyword_rules) + list(negative_rules)}
+
+        # Transaction IDs first so "Transaction ID: ..." is not taken by the keyword
+        alternatives = [TRANSACTION_ID, AMOUNT_WITH_SYMBOL, ADDRESS_DOMAIN]
+        for keyword in sorted(self.weights, key=len, reverse=True):
+            end = r'\b' if keyword[-1].isalnum() else ''
+            alternatives.append(re.escape(keyword) + end)
+        self.pattern = re.compile('|'.join(alternatives))
+
+        # Substring checks that bound the score from above before the scan
+        self.positive = [(keyword, weight) for keyword, weight in self.weights.items() if weight > 0]
+
+    def classify(self, subject, body):
+        """Score and extract payment details in one scan of subject + body"""
+        subject = subject or ''
+        # One lower() up front instead of one per keyword
+        text = f'{subject}\n{body or ""}'.lower()
+        subject_end = len(subject.lower())
+        if self._score_bound(text, text[:subject_end]) < self.threshold:
+            return ClassificationResult(False, 0.0, None, None, None, None, [])
+
+        score = 0.0
+        matched = []
+        amount = currency = payer = transaction_id = None
+
+        for match in self.pattern.finditer(text):
+            token = match.group()
+            group = match.lastindex
+            start = match.start()
+
+            if group == GROUP_TRANSACTION_ID:
+                if transaction_id is None:
+                    transaction_id = match.group(GROUP_TRANSACTION_ID).upper()
+                    score += TRANSACTION_ID_WEIGHT
+                    matched.append('transaction_id')
+            elif group is not None:
+                if amount is None:
+                    symbol, amount, code = match.groups()[1:]
+                    amount = amount.replace(',', '')
+                    currency = code.upper() if code else CURRENCY_SYMBOLS[symbol]
+                    score += AMOUNT_WEIGHT
+                    matched.append('amount')
+            elif token[0] == '@':
+                local = ADDRESS_LOCAL_PART.search(text, max(0, start - 64), start)
+                if local and payer is None:
+                    address = (local.group() + token).strip('.')
+                    if address not in self.ignore_addresses:
+                        payer = address
+            elif token not in matched:
+                # Keywords match on word boundaries and count once each;
+                # a subject hit outweighs a body hit
+                if start and token[0].isalnum() and (text[start - 1].isalnum() or text[start - 1] == '_'):
+                    continue
+                score += self.weights[token] * (SUBJECT_MULTIPLIER if start < subject_end else 1.0)
+                matched.append(token)
+
+        return ClassificationResult(score >= self.threshold, round(score, 2), amount, currency,
+                                    payer, transaction_id, matched)
+
+    def _score_bound(self, text, subject):
+        """Highest score the scan could give text: every present keyword, amount and ID counted"""
+        bound = 0.0
+        for keyword, weight in self.positive:
+            if keyword in text:
+                bound += weight * (SUBJECT_MULTIPLIER if keyword in subject else 1.0)
+        if any(symbol in text for symbol in CURRENCY_SYMBOLS):
+            bound += AMOUNT_WEIGHT
+        if 'txn' in text or 'transaction' in text:
+            bound += TRANSACTION_ID_WEIGHT
+        return bound
+
+
+def message_timestamp(message):
+    """The Date header as a local ISO timestamp, or None if missing/unparseable"""
+    try:
+        sent = parsedate_to_datetime(message['Date'])
+    except (TypeError, ValueError, IndexError):
+        return None
+    if sent.tzinfo is not None:
+        sent = sent.astimezone().replace(tzinfo=None)
+    return sent.isoformat()
+
+
+class PaymentEmailParser:
+    """Email → customer record: body extraction plus one classifier pass"""
+
+    def __init__(self, classifier, extract_body):
+        self.classifier = classifier
+        self.extract_body = extract_body  # callable(email_message) -> text
+
+    def parse(self, email_message, timestamp=None):
+        """(ClassificationResult, customer record or None when it is not a payment)"""
+        subject = email_message['Subject'] or ''
+        body = self.extract_body(email_message)
+        result = self.classifier.classify(subject, body)
+        if not result.is_payment:
+            return result, None
+
+        return result, {
+            'email': result.payer_email or email_message['From'],
+            # When the payment email was sent, not when it was processed: after an
+            # outage the PayPal verification window must still cover the payment
+            'timestamp': timestamp or message_timestamp(email_message) or datetime.now().isoformat(),
+            'amount': result.amount or "unknown",
+            'currency': result.currency,
+            'transaction_id': result.transaction_id,
+            'subject': subject,
+            'payment_method': 'PayPal',
+            'delivery_status': 'pending'
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - CUSTOMER IDENTITY INDEX
+Who bought what: purchases by buyer, transaction ID and Message-ID
+
+CustomerStore keeps one row per purchase. CustomerIndex is the in-memory
+view over those rows that answers identity questions in O(1):
+
+- has this buyer already been delivered to? (is_delivered)
+- every purchase of one buyer, across address spellings (purchases)
+- which purchase owns a PayPal transaction ID or a Message-ID
+
+Buyers are keyed by normalize_email(): lower case, display name and
++tags dropped, and Gmail dots ignored, so "Jane <J.Doe+shop@GMail.com>"
+and "jdoe@gmail.com" are one customer. The keys are persisted as columns
+of the customers table, so the index is rebuilt at startup from one
+narrow SELECT instead of parsing every stored record.
+
+Transaction IDs are reserved atomically when a payment is claimed: a
+second email for the same transaction (a forwarded receipt, the same
+payment seen by two inboxes with different Message-IDs, a replay) is
+recognised and never delivered twice.
+"""
+
+import threading
+from email.utils import parseaddr
+
+GMAIL_DOMAINS = {'gmail.com', 'googlemail.com'}
+
+
+def normalize_email(address):
+    """Canonical buyer key for an address ('' when it is not one)"""
+    address = parseaddr(address or '')[1].strip().lower()
+    local, at, domain = address.rpartition('@')
+    if not at or not local or not domain:
+        return ''
+    local = local.split('+', 1)[0]
+    if domain in GMAIL_DOMAINS:
+        local = local.replace('.', '')
+        domain = 'gmail.com'
+    return f"{local}@{domain}"
+
+
+class CustomerIndex:
+    """In-memory identity index over the purchase records of a CustomerStore"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buyers = {}          # buyer → {customer_id: purchase}, in purchase order
+        self.purchase_buyer = {}  # customer_id → buyer
+        self.transactions = {}    # transaction ID → customer_id
+        self.messages = {}        # Message-ID → customer_id
+        self.delivered = {}       # buyer → delivered purchase count
+        self.buyer_count = 0      # running totals for get_stats (buyer '' excluded)
+        self.repeat_count = 0
+        self.purchase_count = 0
+
+    def add(self, customer_id, email, transaction_id=None, message_id=None,
+            amount=0.0, status=None, timestamp=None):
+        """Index one purchase, replacing what was known about the same customer_id"""
+        buyer = normalize_email(email)
+        purchase = {
+            'customer_id': customer_id,
+            'email': email,
+            'amount': amount,
+            'status': status,
+            'timestamp': timestamp,
+            'transaction_id': transaction_id
+        }
+        with self.lock:
+            self._remove(customer_id)
+            self.purchase_buyer[customer_id] = buyer
+            purchases = self.buyers.setdefault(buyer, {})
+            purchases[customer_id] = purchase
+            if buyer:
+                self._tally(len(purchases), 1)
+            if status == 'delivered':
+                self.delivered[buyer] = self.delivered.get(buyer, 0) + 1
+            # A rejected payment (delivery_verify.py) does not own its transaction
+            if transaction_id and status != 'rejected':
+                self.transactions.setdefault(transaction_id, customer_id)
+            elif transaction_id and self.transactions.get(transaction_id) == customer_id:
+                del self.transactions[transaction_id]
+            if message_id:
+                self.messages.setdefault(message_id, customer_id)
+
+    def reserve_transaction(self, transaction_id, customer_id):
+        """Claim a transaction ID for a purchase; False if another purchase owns it"""
+        with self.lock:
+            owner = self.transactions.setdefault(transaction_id, customer_id)
+        return owner == customer_id
+
+    def release_transaction(self, transaction_id, customer_id):
+        with self.lock:
+            if self.transactions.get(transaction_id) == customer_id:
+                del self.transactions[transaction_id]
+
+    def find_transaction(self, transaction_id):
+        """customer_id of the purchase that owns a transaction ID, or None"""
+        with self.lock:
+            return self.transactions.get(transaction_id)
+
+    def find_message(self, message_id):
+        with self.lock:
+            return self.messages.get(message_id)
+
+    def is_delivered(self, email):
+        """Has any purchase of this buyer been delivered?"""
+        with self.lock:
+            return self.delivered.get(normalize_email(email), 0) > 0
+
+    def purchases(self, email):
+        """Every purchase of this buyer, oldest first"""
+        with self.lock:
+            purchases = [dict(purchase) for purchase in self.buyers.get(normalize_email(email), {}).values()]
+        return sorted(purchases, key=lambda purchase: purchase['timestamp'] or '')
+
+    def unique_customers(self):
+        """One summary per buyer: purchases, spend, deliveries, first and last purchase"""
+        with self.lock:
+            buyers = [(buyer, list(purchases.values()), self.delivered.get(buyer, 0))
+                      for buyer, purchases in self.buyers.items() if buyer]
+        customers = []
+        for buyer, purchases, delivered in buyers:
+            timestamps = sorted(purchase['timestamp'] for purchase in purchases if purchase['timestamp'])
+            customers.append({
+                'email': buyer,
+                'purchases': len(purchases),
+                'delivered': delivered,
+                'total_spent': round(sum(purchase['amount'] for purchase in purchases
+                                         if purchase['status'] != 'rejected'), 2),
+                'first_purchase': timestamps[0] if timestamps else None,
+                'last_purchase': timestamps[-1] if timestamps else None
+            })
+        return customers
+
+    def get_stats(self):
+        """Unique, repeat and delivered buyers in O(1), from running totals"""
+        with self.lock:
+            return {
+                'unique_customers': self.buyer_count,
+                'repeat_customers': self.repeat_count,
+                'delivered_customers': len(self.delivered) - ('' in self.delivered),
+                'purchases': self.purchase_count
+            }
+
+    def _tally(self, purchases, step):
+        # purchases: the buyer's count after adding (step 1) or before removing (step -1)
+        self.purchase_count += step
+        if purchases == 1:
+            self.buyer_count += step
+        elif purchases == 2:
+            self.repeat_count += step
+
+    def _remove(self, customer_id):
+        buyer = self.purchase_buyer.pop(customer_id, None)
+        if buyer is None:
+            return
+        purchases = self.buyers.get(buyer, {})
+        if buyer and customer_id in purchases:
+            self._tally(len(purchases), -1)
+        old = purchases.pop(customer_id, None)
+        if not purchases:
+            self.buyers.pop(buyer, None)
+        if old and old['status'] == 'delivered':
+            self.delivered[buyer] -= 1
+            if not self.delivered[buyer]:
+                del self.delivered[buyer]
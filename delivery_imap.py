@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - IMAP HELPERS
+Push-style inbox monitoring for the automated delivery system
+
+Provides:
+- IMAPConnectionManager: one long-lived authenticated session, health
+  checked with NOOP and re-established with exponential backoff
+- IMAPIdleWatcher: keeps a dedicated session in IDLE (RFC 2177) and
+  returns as soon as the server announces new mail. Servers that do not
+  advertise IDLE fall back to plain interval polling.
+- BatchFetcher: header-first triage over whole UID ranges, downloading
+  only the text/plain parts of candidate messages with BODY.PEEK (the
+  first text/html part when there is no plain text)
+- PaymentSearch: server-side SEARCH (sender domains, subject terms,
+  SINCE or a UID range) so the server narrows the candidates before
+  any bytes move
+
+Used by:
+    python automated_delivery.py --monitor
+"""
+
+import email
+import imaplib
+import select
+import ssl
+import time
+from email.message import Message
+
+# RFC 2177: clients should re-issue IDLE at least every 29 minutes,
+# servers may drop idle sessions after 30.
+IDLE_REFRESH_SECONDS = 29 * 60
+
+# Headers needed to triage a message and rebuild it for parse_payment_email
+TRIAGE_HEADERS = 'FROM SUBJECT DATE MESSAGE-ID REPLY-TO TO'
+
+# SEARCH dates must use English month names regardless of locale
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+class IMAPConnectionManager:
+    """Keeps one authenticated IMAP session open across monitor cycles"""
+
+    def __init__(self, email_config, mailbox='inbox', readonly=False,
+                 noop_interval=60, max_attempts=5, backoff_base=2, max_backoff=300):
+        self.email_config = email_config
+        self.mailbox = mailbox
+        self.readonly = readonly
+        self.noop_interval = noop_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+
+        self.connection = None
+        self.uidvalidity = None
+        self.last_checked = 0
+        self.consecutive_failures = 0
+        self.started = time.time()
+        self.stats = {
+            'handshakes': 0,
+            'reuses': 0,
+            'noop_checks': 0,
+            'reconnects': 0,
+            'failures': 0
+        }
+
+    def get_connection(self):
+        """Return a live, authenticated session with the mailbox selected"""
+        if self.connection is not None:
+            if time.monotonic() - self.last_checked < self.noop_interval or self._is_alive():
+                self.stats['reuses'] += 1
+                self.last_checked = time.monotonic()
+                return self.connection
+            print("⚠️ IMAP session went stale, reconnecting")
+            self.invalidate()
+
+        return self._connect_with_backoff()
+
+    def invalidate(self):
+        """Drop the current session after an error so the next call reconnects"""
+        if self.connection is None:
+            return
+        try:
+            self.connection.logout()
+        except Exception:
+            pass
+        self.connection = None
+
+    close = invalidate
+
+    def get_stats(self):
+        """Connection reuse statistics"""
+        hours = max((time.time() - self.started) / 3600, 1 / 3600)
+        requests = self.stats['handshakes'] + self.stats['reuses']
+        return {
+            **self.stats,
+            'connected': self.connection is not None,
+            'handshakes_per_hour': round(self.stats['handshakes'] / hours, 2),
+            'reuse_ratio': round(self.stats['reuses'] / requests, 3) if requests else 0.0
+        }
+
+    def _is_alive(self):
+        self.stats['noop_checks'] += 1
+        try:
+            status, _ = self.connection.noop()
+            return status == 'OK'
+        except (imaplib.IMAP4.error, OSError):
+            return False
+
+    def _connect(self):
+        # imap_ssl: False only for local test servers (bench_delivery.py)
+        client = imaplib.IMAP4_SSL if self.email_config.get('imap_ssl', True) else imaplib.IMAP4
+        mail = client(self.email_config['imap_server'], self.email_config.get('imap_port', 993))
+        try:
+            mail.login(self.email_config['email'], self.email_config['password'])
+            status, data = mail.select(self.mailbox, readonly=self.readonly)
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"cannot select {self.mailbox}: {data}")
+            # Only sent with SELECT, so capture it before later commands
+            _, uidvalidity = mail.response('UIDVALIDITY')
+            self.uidvalidity = int(uidvalidity[0]) if uidvalidity and uidvalidity[0] else None
+        except Exception:
+            try:
+                mail.shutdown()
+            except Exception:
+                pass
+            raise
+        return mail
+
+    def _connect_with_backoff(self):
+        last_error = None
+        for attempt in range(self.max_attempts):
+            if self.consecutive_failures:
+                delay = min(self.max_backoff,
+                            self.backoff_base * 2 ** (self.consecutive_failures - 1))
+                print(f"⏳ IMAP reconnect attempt {attempt + 1} in {delay}s")
+                time.sleep(delay)
+            try:
+                self.connection = self._connect()
+                if self.stats['handshakes']:
+                    self.stats['reconnects'] += 1
+                self.stats['handshakes'] += 1
+                self.consecutive_failures = 0
+                self.last_checked = time.monotonic()
+                return self.connection
+            except (imaplib.IMAP4.error, OSError) as e:
+                last_error = e
+                self.consecutive_failures += 1
+                self.stats['failures'] += 1
+                print(f"⚠️ IMAP connection failed: {e}")
+        raise last_error
+
+
+class IMAPIdleWatcher:
+    """Waits for new mail using IMAP IDLE, falling back to polling"""
+
+    def __init__(self, email_config, mailbox='inbox',
+                 idle_refresh=IDLE_REFRESH_SECONDS, poll_interval=300, scheduler=None, check=None):
+        self.email_config = email_config
+        self.mailbox = mailbox
+        self.idle_refresh = idle_refresh
+        self.poll_interval = poll_interval
+        self.scheduler = scheduler  # PollScheduler for the polling fallback, if any
+        # Optional callable() -> bool, run once IDLE is acknowledged: True when
+        # mail arrived between the monitor's last SEARCH and the start of IDLE
+        self.check = check
+
+        # IDLE blocks the session, so it never shares the delivery connection
+        self.session = IMAPConnectionManager(email_config, mailbox, readonly=True)
+        self.idle_supported = None
+        self.stats = {
+            'idle_cycles': 0,
+            'wakeups': 0,
+            'refreshes': 0,
+            'polls': 0,
+            'missed': 0
+        }
+
+    def connect(self):
+        """Get the dedicated IDLE session, checking IDLE support once"""
+        mail = self.session.get_connection()
+        if self.idle_supported is None:
+            # Post-login capabilities can differ from the greeting's
+            _, data = mail.capability()
+            self.idle_supported = b'IDLE' in data[0].upper().split()
+            if not self.idle_supported:
+                cadence = "adaptively" if self.scheduler else f"every {self.poll_interval}s"
+                print(f"⚠️ {self.email_config['imap_server']} has no IDLE support, polling {cadence}")
+        return mail
+
+    def close(self):
+        """Close the IDLE session"""
+        self.session.close()
+
+    def wait_for_mail(self):
+        """Block until new mail may be waiting.
+
+        Returns True when the inbox should be checked (new mail announced,
+        polling interval elapsed, or the session had to be re-established)
+        and False when an IDLE period simply expired and was refreshed.
+        """
+        try:
+            mail = self.connect()
+
+            if not self.idle_supported:
+                self.stats['polls'] += 1
+                if self.scheduler:
+                    self.scheduler.wait()
+                else:
+                    time.sleep(self.poll_interval)
+                return True
+
+            self.stats['idle_cycles'] += 1
+            if self._idle(mail, self.idle_refresh):
+                self.stats['wakeups'] += 1
+                return True
+
+            # Keepalive: IDLE period expired quietly, re-IDLE on the next call
+            self.stats['refreshes'] += 1
+            return False
+
+        except (imaplib.IMAP4.error, OSError) as e:
+            print(f"⚠️ IDLE session lost ({e}), reconnecting")
+            self.close()
+            # Mail may have arrived while we were disconnected
+            return True
+
+    def _idle(self, mail, timeout):
+        """Run one IDLE command; True if the server reported new messages"""
+        tag = mail._new_tag()
+        mail.send(tag + b' IDLE\r\n')
+
+        line = mail.readline()
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line.strip()!r}")
+
+        # Anything that landed before IDLE started is never announced by it
+        new_mail = self._check_missed()
+        deadline = time.monotonic() + timeout
+        while not new_mail:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._wait_readable(mail, remaining):
+                break
+            new_mail = self._is_new_mail(self._read_line(mail))
+
+        # Terminate IDLE and drain until the tagged completion
+        mail.send(b'DONE\r\n')
+        while True:
+            line = self._read_line(mail)
+            if line.startswith(tag):
+                if b' OK' not in line:
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line.strip()!r}")
+                break
+            new_mail = self._is_new_mail(line) or new_mail
+
+        return new_mail
+
+    def _check_missed(self):
+        if self.check is None:
+            return False
+        try:
+            missed = self.check()
+        except (imaplib.IMAP4.error, OSError) as e:
+            print(f"⚠️ Pre-IDLE search failed ({e}), checking the inbox")
+            missed = True
+        if missed:
+            self.stats['missed'] += 1
+        return missed
+
+    @staticmethod
+    def _wait_readable(mail, timeout):
+        """Wait for data on the IMAP connection, counting bytes imaplib or SSL already buffered"""
+        if IMAPIdleWatcher._buffered(mail):
+            return True
+        readable, _, _ = select.select([mail.sock], [], [], timeout)
+        return bool(readable)
+
+    @staticmethod
+    def _buffered(mail):
+        """Is a response line already readable without blocking?
+
+        imaplib reads through a buffered file, so an untagged EXISTS sent in
+        the same packet as the IDLE continuation sits in mail.file where
+        select() cannot see it. A non-blocking peek returns those bytes (or
+        SSL-decrypted ones) and raises instead of waiting when there are none.
+        """
+        sock = mail.sock
+        timeout = sock.gettimeout()
+        sock.settimeout(0.0)
+        try:
+            return bool(mail.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    @staticmethod
+    def _read_line(mail):
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed during IDLE")
+        if line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort(line.strip().decode('utf-8', errors='ignore'))
+        return line
+
+    @staticmethod
+    def _is_new_mail(line):
+        return line.startswith(b'*') and (line.rstrip().endswith(b'EXISTS')
+                                          or line.rstrip().endswith(b'RECENT'))
+
+
+class BatchFetcher:
+    """Batched UID FETCH with header-first triage of payment candidates.
+
+    For every chunk of UIDs one command pulls the triage headers and
+    BODYSTRUCTURE; candidates then get their text/plain parts (or, for
+    HTML-only mail, the first text/html part) fetched in one command per
+    distinct part layout. BODY.PEEK leaves \\Seen alone.
+    """
+
+    def __init__(self, batch_size=500, max_part_bytes=256 * 1024):
+        self.batch_size = batch_size
+        self.max_part_bytes = max_part_bytes
+        self.stats = {
+            'round_trips': 0,
+            'messages_scanned': 0,
+            'candidates': 0,
+            'bytes_fetched': 0
+        }
+
+    def fetch_candidates(self, mail, uids, is_candidate):
+        """Yield (uid, message) for messages whose headers pass is_candidate.
+
+        Each yielded message carries the triage headers and only the
+        decoded-on-demand text parts, ready for parse_payment_email.
+        """
+        uids = [uid.decode() if isinstance(uid, bytes) else str(uid) for uid in uids]
+        for start in range(0, len(uids), self.batch_size):
+            chunk = uids[start:start + self.batch_size]
+            headers = self._fetch_headers(mail, chunk)
+            self.stats['messages_scanned'] += len(headers)
+
+            # Group candidates by part layout so each group is one FETCH
+            groups = {}
+            for uid, (header_bytes, structure) in headers.items():
+                header_msg = email.message_from_bytes(header_bytes)
+                if not is_candidate(header_msg):
+                    continue
+                parts = tuple(text_body_parts(structure))
+                groups.setdefault(tuple(part[0] for part in parts), []).append(
+                    (uid, header_bytes, parts))
+                self.stats['candidates'] += 1
+
+            for specs, members in groups.items():
+                bodies = self._fetch_parts(mail, [uid for uid, _, _ in members], specs)
+                for uid, header_bytes, parts in members:
+                    yield uid, build_message(header_bytes, parts, bodies.get(uid, {}))
+
+    def _fetch_headers(self, mail, uids):
+        query = f'(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({TRIAGE_HEADERS})])'
+        results = {}
+        for item in self._uid_fetch(mail, uids, query):
+            header_bytes = next((value for key, value in item.items()
+                                 if key.startswith('BODY[HEADER')), b'')
+            results[item['UID'].decode()] = (header_bytes or b'', item.get('BODYSTRUCTURE'))
+        return results
+
+    def _fetch_parts(self, mail, uids, specs):
+        if not specs:
+            return {}
+        query = '(UID ' + ' '.join(f'BODY.PEEK[{spec}]<0.{self.max_part_bytes}>'
+                                   for spec in specs) + ')'
+        results = {}
+        for item in self._uid_fetch(mail, uids, query):
+            bodies = {}
+            for key, value in item.items():
+                if key.startswith('BODY['):
+                    bodies[key[5:key.index(']')]] = value or b''
+            results[item['UID'].decode()] = bodies
+        return results
+
+    def _uid_fetch(self, mail, uids, query):
+        status, data = mail.uid('FETCH', uid_set(uids), query)
+        self.stats['round_trips'] += 1
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID FETCH failed: {data}")
+        for item in parse_fetch_response(data):
+            if 'UID' in item:
+                self.stats['bytes_fetched'] += sum(
+                    len(value) for value in item.values() if isinstance(value, bytes))
+                yield item
+
+
+class PaymentSearch:
+    """Server-side SEARCH that narrows the inbox to payment candidates.
+
+    Builds UNSEEN [SINCE date] (OR FROM domain ... SUBJECT term ...), or
+    UID n:* once a checkpoint exists, so the IMAP server drops
+    newsletters and replies before we fetch anything, and reports how
+    many new messages it filtered out.
+    """
+
+    def __init__(self, sender_domains=(), subject_terms=(), unseen_only=True):
+        self.sender_domains = list(sender_domains)
+        self.subject_terms = list(subject_terms)
+        self.unseen_only = unseen_only
+        self.stats = {
+            'searches': 0,
+            'new': 0,
+            'matched': 0,
+            'filtered_out': 0
+        }
+        self.last_result = {'new': 0, 'matched': 0, 'filtered_out': 0}
+        self.last_new_uids = []
+
+    def build(self, since=None, min_uid=None):
+        """Return the SEARCH criteria as a list of IMAP tokens"""
+        criteria = self._base(since, min_uid)
+        terms = ([f'FROM {_quote(domain)}' for domain in self.sender_domains] +
+                 [f'SUBJECT {_quote(term)}' for term in self.subject_terms])
+        if terms:
+            # OR is binary in IMAP: OR a OR b c
+            query = terms[-1]
+            for term in reversed(terms[:-1]):
+                query = f'OR {term} {query}'
+            criteria.append(f'({query})' if len(terms) > 1 else query)
+        return criteria or ['ALL']
+
+    def run(self, mail, since=None, min_uid=None):
+        """Search the selected mailbox, returning matching UIDs.
+
+        With min_uid the search covers UIDs >= min_uid whatever their
+        \\Seen flag; last_new_uids keeps every new UID so the caller can
+        advance its checkpoint past the ones the filter dropped.
+        """
+        base = self._base(since, min_uid) or ['ALL']
+        new = self._after(self._uid_search(mail, base), min_uid)
+        if self._filtered():
+            matched = self._after(self._uid_search(mail, self.build(since, min_uid)), min_uid)
+        else:
+            matched = new
+
+        self.last_new_uids = new
+        self.last_result = {
+            'new': len(new),
+            'matched': len(matched),
+            'filtered_out': len(new) - len(matched)
+        }
+        self.stats['searches'] += 1
+        for key, value in self.last_result.items():
+            self.stats[key] += value
+        return matched
+
+    def _filtered(self):
+        return bool(self.sender_domains or self.subject_terms)
+
+    def _base(self, since, min_uid=None):
+        if min_uid is not None:
+            return [f'UID {min_uid}:*']
+        criteria = ['UNSEEN'] if self.unseen_only else []
+        if since is not None:
+            criteria.append(f'SINCE {since.day:02d}-{MONTHS[since.month - 1]}-{since.year}')
+        return criteria
+
+    @staticmethod
+    def _after(uids, min_uid):
+        # "n:*" always matches the highest UID, even when it is below n
+        if min_uid is None:
+            return uids
+        return [uid for uid in uids if int(uid) >= min_uid]
+
+    @staticmethod
+    def _uid_search(mail, criteria):
+        status, data = mail.uid('SEARCH', None, *criteria)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID SEARCH failed: {data}")
+        return data[0].split() if data and data[0] else []
+
+
+def _quote(value):
+    """Quote a SEARCH string argument (ASCII only without CHARSET)"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def uid_set(uids):
+    """Compress UIDs into an IMAP sequence set, e.g. 1:5,9,12:14"""
+    numbers = sorted(int(uid) for uid in uids)
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ','.join(str(a) if a == b else f'{a}:{b}' for a, b in ranges)
+
+
+def text_body_parts(structure):
+    """Inline text/plain parts, else the first inline text/html part (HTML-only receipts)"""
+    return text_plain_parts(structure) or text_plain_parts(structure, subtype='html')[:1]
+
+
+def text_plain_parts(structure, prefix='', subtype='plain'):
+    """Return (part_spec, charset, encoding, subtype) for inline text/<subtype> parts"""
+    if not structure:
+        return []
+
+    if isinstance(structure[0], list):
+        # multipart: child bodies come first, then the subtype
+        parts = []
+        for index, child in enumerate(structure, 1):
+            if not isinstance(child, list):
+                break
+            parts.extend(text_plain_parts(child, f'{prefix}{index}.', subtype))
+        return parts
+
+    media_type = _text(structure[0]).lower()
+    if media_type != 'text' or _text(structure[1]).lower() != subtype:
+        return []
+
+    params = _pairs(structure[2])
+    disposition = structure[9] if len(structure) > 9 else None
+    if isinstance(disposition, list) and _text(disposition[0]).lower() == 'attachment':
+        return []
+
+    spec = prefix.rstrip('.') or '1'
+    encoding = _text(structure[5]) or '7bit'
+    return [(spec, params.get('charset', 'utf-8'), encoding, subtype)]
+
+
+def build_message(header_bytes, parts, bodies):
+    """Rebuild a lightweight email.message from headers and fetched parts"""
+    message = email.message_from_bytes(header_bytes)
+    sections = []
+    for spec, charset, encoding, subtype in parts:
+        section = Message()
+        section['Content-Type'] = f'text/{subtype}; charset="{charset}"'
+        section['Content-Transfer-Encoding'] = encoding
+        section.set_payload(bodies.get(spec, b'').decode('ascii', errors='surrogateescape'))
+        sections.append(section)
+
+    if len(sections) == 1:
+        message['Content-Type'] = sections[0]['Content-Type']
+        message['Content-Transfer-Encoding'] = sections[0]['Content-Transfer-Encoding']
+        message.set_payload(sections[0].get_payload())
+    else:
+        message['Content-Type'] = 'multipart/mixed'
+        message.set_payload(sections)
+    return message
+
+
+def parse_fetch_response(data):
+    """Parse imaplib FETCH data into one {ITEM: value} dict per message"""
+    tree = [[]]
+    for token in _fetch_tokens(data):
+        if token is _OPEN:
+            tree.append([])
+        elif token is _CLOSE:
+            if len(tree) > 1:
+                finished = tree.pop()
+                tree[-1].append(finished)
+        else:
+            tree[-1].append(token)
+
+    messages = []
+    for node in tree[0]:
+        if isinstance(node, list):
+            messages.append({_text(node[i]).upper(): node[i + 1]
+                             for i in range(0, len(node) - 1, 2)})
+    return messages
+
+
+_OPEN = object()
+_CLOSE = object()
+
+
+def _fetch_tokens(data):
+    for item in data:
+        if isinstance(item, tuple):
+            yield from _lex(item[0])
+            yield item[1]
+        elif item:
+            yield from _lex(item)
+
+
+def _lex(line):
+    i, n = 0, len(line)
+    while i < n:
+        char = line[i:i + 1]
+        if char in (b' ', b'\r', b'\n'):
+            i += 1
+        elif char == b'(':
+            yield _OPEN
+            i += 1
+        elif char == b')':
+            yield _CLOSE
+            i += 1
+        elif char == b'"':
+            i += 1
+            value = bytearray()
+            while i < n and line[i:i + 1] != b'"':
+                if line[i:i + 1] == b'\\':
+                    i += 1
+                value += line[i:i + 1]
+                i += 1
+            yield bytes(value)
+            i += 1
+        elif char == b'{':
+            # Literal marker: imaplib delivers the literal as the next item
+            i = line.index(b'}', i) + 1
+        else:
+            start = i
+            while i < n and line[i:i + 1] not in (b' ', b'(', b')', b'\r', b'\n'):
+                if line[i:i + 1] == b'[':
+                    i = line.index(b']', i)
+                i += 1
+            atom = line[start:i]
+            yield None if atom.upper() == b'NIL' else atom
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return value.decode('utf-8', errors='ignore') if isinstance(value, bytes) else str(value)
+
+
+def _pairs(values):
+    if not isinstance(values, list):
+        return {}
+    return {_text(values[i]).lower(): _text(values[i + 1])
+            for i in range(0, len(values) - 1, 2)}
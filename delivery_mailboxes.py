@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - MULTIPLE MAILBOXES
+Monitor several payment inboxes concurrently
+
+Payments arrive at more than one inbox (storefront aliases, a second
+account). Each Mailbox keeps the per-inbox state of the monitor: its own
+persistent IMAP session, server search, UID checkpoint, poll schedule and
+optional IDLE watcher. MailboxPool runs one monitor thread per mailbox,
+so a slow or quiet inbox never delays the others, and every thread feeds
+the same delivery stages: the shared SMTP pool, outbox, Message-ID index
+and customer store, all of which are safe to use from several threads.
+Threads rather than processes: the work is blocking IMAP I/O, and the
+delivery stages are shared in-process objects.
+
+Mailboxes come from delivery_config.json (written by setup_delivery.py):
+its email_config is the primary account, which also sends the
+deliveries, and an optional "mailboxes" list adds more. Each entry
+inherits the primary's settings, so an alias folder on the same account
+only needs a name and a folder:
+
+    "mailboxes": [
+        {"name": "store", "email": "store@example.com", "password": "..."},
+        {"name": "gumroad", "folder": "Sales"}
+    ]
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+from delivery_checkpoint import MailboxCheckpoint
+from delivery_imap import BatchFetcher, IMAPConnectionManager, IMAPIdleWatcher
+
+
+def load_mailbox_configs(path, default_config):
+    """[{'name', 'folder', 'email_config'}], the primary account first"""
+    config = {}
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ {path} unreadable, using the built-in account: {e}")
+
+    primary = dict(default_config, **config.get('email_config', {}))
+    mailboxes = [{'name': primary['email'], 'folder': 'inbox', 'email_config': primary}]
+
+    for entry in config.get('mailboxes', []):
+        entry = dict(entry)
+        if entry.pop('enabled', True) is False:
+            continue
+        name = entry.pop('name', None)
+        folder = entry.pop('folder', 'inbox')
+        email_config = dict(primary, **entry)
+        if name is None:
+            name = email_config['email'] if folder == 'inbox' else f"{email_config['email']}/{folder}"
+        mailboxes.append({'name': name, 'folder': folder, 'email_config': email_config})
+    return mailboxes
+
+
+class Mailbox:
+    """Per-inbox monitor state: IMAP session, search, checkpoint and poll schedule"""
+
+    def __init__(self, name, email_config, folder, checkpoint_file, search, scheduler,
+                 fetch_batch_size=500, key_prefix=''):
+        self.name = name
+        self.email_config = email_config
+        self.folder = folder
+        self.key_prefix = key_prefix  # keeps UID-based dedup keys apart between mailboxes
+
+        self.imap = IMAPConnectionManager(email_config, folder)
+        self.fetcher = BatchFetcher(batch_size=fetch_batch_size)
+        self.search = search
+        self.search_checkpoint = None
+        self.checkpoint = MailboxCheckpoint(checkpoint_file)
+        self.scheduler = scheduler
+        self.watcher = None
+
+    def watch(self, idle_refresh):
+        """Wait for new mail with IMAP IDLE on a dedicated session"""
+        self.watcher = IMAPIdleWatcher(self.email_config, mailbox=self.folder,
+                                       idle_refresh=idle_refresh,
+                                       poll_interval=self.scheduler.base_interval,
+                                       scheduler=self.scheduler,
+                                       check=self.has_unsearched_mail)
+
+    def has_unsearched_mail(self):
+        """One UID SEARCH on the monitor session: any message past the checkpoint?"""
+        next_uid = self.checkpoint.next_uid()
+        if next_uid is None:
+            return False  # no checkpoint yet; the next cycle searches UNSEEN anyway
+        mail = self.imap.get_connection()
+        _, data = mail.uid('SEARCH', None, f'UID {next_uid}:*')
+        # "n:*" always matches the highest UID, even one below n
+        return any(int(uid) >= next_uid for uid in (data[0] or b'').split())
+
+    def wait(self):
+        """Block until the next cycle is due: IDLE wakeup, poll interval or error backoff"""
+        if self.scheduler.consecutive_errors or self.watcher is None:
+            self.scheduler.wait()
+        else:
+            # Re-IDLE quietly until the server announces new mail
+            while not self.watcher.wait_for_mail():
+                pass
+
+    def message_key(self, uid, email_message):
+        """Dedup key: the Message-ID, or the UID when the header is missing"""
+        return email_message['Message-ID'] or f"uid:{self.key_prefix}{self.imap.uidvalidity}:{uid}"
+
+    def close(self):
+        if self.watcher:
+            self.watcher.close()
+        self.imap.close()
+
+    @staticmethod
+    def checkpoint_path(base_path, name):
+        """Per-mailbox checkpoint file next to the primary one"""
+        root, ext = os.path.splitext(base_path)
+        return f"{root}.{re.sub(r'[^A-Za-z0-9.@-]+', '_', name)}{ext}"
+
+
+class MailboxPool:
+    """One monitor thread per mailbox, all feeding the shared delivery stages"""
+
+    def __init__(self, delivery_system, mailboxes):
+        self.delivery_system = delivery_system
+        self.mailboxes = mailboxes
+        self.stopping = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.stats = {mailbox.name: {'cycles': 0, 'payments': 0, 'last_cycle_seconds': 0.0}
+                      for mailbox in mailboxes}
+
+    def start(self):
+        for mailbox in self.mailboxes:
+            thread = threading.Thread(target=self._run, args=(mailbox,),
+                                      name=f'mailbox-{mailbox.name}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"📥 Monitoring {len(self.mailboxes)} mailboxes: "
+              f"{', '.join(mailbox.name for mailbox in self.mailboxes)}")
+
+    def stop(self):
+        """Ask the monitor threads to exit and close every session"""
+        self.stopping.set()
+        for mailbox in self.mailboxes:
+            mailbox.close()
+
+    def get_stats(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
+
+    def _run(self, mailbox):
+        while not self.stopping.is_set():
+            started = time.perf_counter()
+            try:
+                with self.delivery_system.profiler.cycle():
+                    new_customers = self.delivery_system.monitor_email_for_payments(mailbox)
+            except Exception as e:
+                print(f"❌ {mailbox.name} monitoring error: {e}")
+                mailbox.scheduler.record_error(e)
+                new_customers = []
+
+            with self.lock:
+                stats = self.stats[mailbox.name]
+                stats['cycles'] += 1
+                stats['payments'] += len(new_customers)
+                stats['last_cycle_seconds'] = round(time.perf_counter() - started, 3)
+            if new_customers:
+                print(f"📈 {mailbox.name}: processed {len(new_customers)} new customers")
+
+            if self.stopping.is_set():
+                break
+            try:
+                mailbox.wait()
+            except Exception as e:
+                if self.stopping.is_set():
+                    break
+                print(f"❌ {mailbox.name} wait error: {e}")
+                mailbox.scheduler.record_error(e)
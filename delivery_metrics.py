@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - METRICS
+Per-stage latency histograms and counters for the delivery daemon
+
+The emoji status lines say what happened, not where the time went.
+MetricsRegistry times the stages of the delivery path (monitor cycle,
+IMAP search and fetch, parse, render, send, customer save) and counts
+events and errors. It is cheap enough to leave on: an observation is two
+perf_counter() calls, a bisect into fixed buckets and a deque append
+under one lock, a few microseconds per message.
+
+Two ways out, both off the delivery threads:
+- MetricsServer: optional local HTTP endpoint, /metrics in the Prometheus
+  text format (cumulative histogram buckets, so histogram_quantile() gives
+  any percentile) and /metrics.json with the same snapshot as the log line
+- MetricsLogger: one structured JSON line every log_interval seconds with
+  counts, errors and p50/p95/p99 over the most recent observations
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from delivery_pipeline import latency_percentiles
+
+# Upper bounds in seconds, from sub-millisecond parses to slow SMTP sessions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class StageTimer:
+    """Context manager: records the block's duration, and an error if it raises"""
+
+    __slots__ = ('registry', 'stage', 'started')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.stage, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+
+class MetricsRegistry:
+    """Counters, per-stage latency histograms and scrape-time gauges"""
+
+    def __init__(self, prefix='selune', buckets=DEFAULT_BUCKETS, window=2048):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.started = time.time()
+
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.stages = {}
+        self.gauges = {}   # name → (callable, help text)
+
+    def timer(self, stage):
+        return StageTimer(self, stage)
+
+    def observe(self, stage, seconds, error=False):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {
+                    'buckets': [0] * (len(self.buckets) + 1),  # last one is +Inf
+                    'count': 0,
+                    'sum': 0.0,
+                    'errors': 0,
+                    'recent': deque(maxlen=self.window)
+                }
+            entry['buckets'][bisect_left(self.buckets, seconds)] += 1
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['recent'].append(seconds)
+            if error:
+                entry['errors'] += 1
+
+    def count(self, event, amount=1):
+        with self.lock:
+            self.counters[event] = self.counters.get(event, 0) + amount
+
+    def gauge(self, name, read, help_text=''):
+        """Register a value read when metrics are exported (outbox depth, revenue)"""
+        self.gauges[name] = (read, help_text)
+
+    def snapshot(self):
+        """Counters, per-stage count/errors/p50/p95/p99 and gauges as a plain dict"""
+        with self.lock:
+            counters = dict(self.counters)
+            stages = {name: (entry['count'], entry['errors'], entry['sum'], sorted(entry['recent']))
+                      for name, entry in self.stages.items()}
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'counters': counters,
+            'stages': {name: dict(count=count, errors=errors,
+                                  avg_ms=round(total / count * 1000, 3) if count else None,
+                                  **latency_percentiles(recent))
+                       for name, (count, errors, total, recent) in stages.items()},
+            'gauges': self._read_gauges()
+        }
+
+    def render_prometheus(self):
+        """The Prometheus text exposition format (version 0.0.4)"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            stages = sorted((name, list(entry['buckets']), entry['count'], entry['sum'], entry['errors'])
+                            for name, entry in self.stages.items())
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Time spent per call in each delivery stage",
+            f"# TYPE {prefix}_stage_duration_seconds histogram"
+        ]
+        for name, buckets, count, total, _ in stages:
+            cumulative = 0
+            for bound, observed in zip(self.buckets + (float('inf'),), buckets):
+                cumulative += observed
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{name}"}} {total!r}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{name}"}} {count}')
+
+        lines += [f"# HELP {prefix}_stage_errors_total Calls in each stage that raised",
+                  f"# TYPE {prefix}_stage_errors_total counter"]
+        lines += [f'{prefix}_stage_errors_total{{stage="{name}"}} {errors}'
+                  for name, _, _, _, errors in stages]
+
+        lines += [f"# HELP {prefix}_events_total Delivery events",
+                  f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{event="{event}"}} {value}' for event, value in counters]
+
+        for name, value in sorted(self._read_gauges().items()):
+            lines += [f"# HELP {prefix}_{name} {self.gauges[name][1]}",
+                      f"# TYPE {prefix}_{name} gauge",
+                      f"{prefix}_{name} {value}"]
+        lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+        lines.append(f"{prefix}_uptime_seconds {round(time.time() - self.started, 1)}")
+        return '\n'.join(lines) + '\n'
+
+    def _read_gauges(self):
+        values = {}
+        for name, (read, _) in list(self.gauges.items()):
+            try:
+                values[name] = read()
+            except Exception as e:
+                print(f"⚠️ Metrics gauge {name} unavailable: {e}")
+        return values
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        registry = self.server.registry
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            self._reply(registry.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/metrics.json':
+            self._reply(json.dumps(registry.snapshot()), 'application/json')
+        else:
+            self.send_error(404)
+
+    def _reply(self, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the delivery log
+
+
+class MetricsServer:
+    """Optional local HTTP endpoint: /metrics (Prometheus) and /metrics.json"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.registry = registry
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-http', daemon=True)
+        self.thread.start()
+        host = self.httpd.server_address[0]
+        print(f"📡 Metrics on http://{host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MetricsLogger:
+    """Background thread printing one JSON metrics line every interval seconds"""
+
+    def __init__(self, registry, interval=60):
+        self.registry = registry
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='metrics-log', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def log_line(self):
+        record = {'ts': datetime.now().isoformat(timespec='seconds'), 'event': 'delivery_metrics'}
+        record.update(self.registry.snapshot())
+        return json.dumps(record, separators=(',', ':'), sort_keys=True)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                print(self.log_line(), flush=True)
+            except Exception as e:
+                print(f"⚠️ Metrics log error: {e}")
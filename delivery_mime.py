@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - MIME BODY EXTRACTION
+Streaming, size-bounded text extraction for incoming emails
+
+BodyExtractor replaces the old decode-everything get_email_body:
+- attachments and non-text parts (inline images, PDFs, ...) are skipped
+  without decoding their payloads
+- the best text part is chosen: text/plain first, else text/html
+  stripped to text
+- the transfer encoding is undone chunk by chunk and the declared charset
+  is decoded incrementally, stopping at a byte budget
+
+Whatever the size of the email, the classifier sees at most max_bytes of
+decoded text, so parsing cost per message is bounded.
+"""
+
+import binascii
+import codecs
+import threading
+from html.parser import HTMLParser
+
+
+class HTMLTextParser(HTMLParser):
+    """Incremental HTML → text converter (drops script/style, keeps line breaks)"""
+
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+    BREAK_TAGS = {'br', 'p', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'table'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skipping += 1
+        elif tag in self.BREAK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skipping:
+            self.skipping -= 1
+        elif tag in self.BREAK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+    def text(self):
+        self.close()
+        return ''.join(self.parts)
+
+
+class BodyExtractor:
+    """Pick and decode the best text part of an email within a byte budget"""
+
+    def __init__(self, max_bytes=64 * 1024, chunk_size=8192):
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.stats = {
+            'messages': 0,
+            'plain': 0,
+            'html': 0,
+            'no_text': 0,
+            'truncated': 0,
+            'skipped_parts': 0,
+            'bytes_decoded': 0
+        }
+
+    def extract(self, email_message):
+        """Text of the best body part, at most max_bytes of it decoded"""
+        self._count('messages')
+        part = self.best_part(email_message)
+        if part is None:
+            self._count('no_text')
+            return ""
+
+        subtype = part.get_content_subtype()
+        self._count(subtype)
+        decoder = self._decoder(part.get_content_charset())
+        html = HTMLTextParser() if subtype == 'html' else None
+        pieces = []
+
+        for chunk in self.iter_payload(part):
+            text = decoder.decode(chunk)
+            if html is not None:
+                html.feed(text)
+            else:
+                pieces.append(text)
+        tail = decoder.decode(b'', final=True)
+
+        if html is not None:
+            html.feed(tail)
+            return html.text()
+        pieces.append(tail)
+        return ''.join(pieces)
+
+    def best_part(self, email_message):
+        """First inline text/plain part, else the first inline text/html part"""
+        html = None
+        for part in email_message.walk():
+            if part.is_multipart():
+                continue
+            if part.get_content_maintype() != 'text' or part.get_content_disposition() == 'attachment':
+                self._count('skipped_parts')
+                continue
+            subtype = part.get_content_subtype()
+            if subtype == 'plain':
+                return part
+            if subtype == 'html' and html is None:
+                html = part
+        return html
+
+    def iter_payload(self, part):
+        """Decoded payload bytes in chunks, stopping once max_bytes is reached"""
+        payload = part.get_payload()
+        if not isinstance(payload, str):
+            return
+
+        encoding = part.get('content-transfer-encoding', '7bit').strip().lower()
+        if encoding == 'base64':
+            chunks = self._base64_chunks(payload)
+        elif encoding == 'quoted-printable':
+            chunks = self._line_chunks(payload, _qp_bytes)
+        else:
+            chunks = self._line_chunks(payload, _raw_bytes)
+
+        remaining = self.max_bytes
+        for chunk in chunks:
+            if len(chunk) >= remaining:
+                self._count('bytes_decoded', remaining)
+                self._count('truncated')
+                yield chunk[:remaining]
+                return
+            remaining -= len(chunk)
+            self._count('bytes_decoded', len(chunk))
+            yield chunk
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, max_bytes=self.max_bytes)
+
+    def _line_chunks(self, payload, decode):
+        """Decode roughly chunk_size characters at a time, cut on line ends"""
+        start = 0
+        while start < len(payload):
+            end = payload.find('\n', start + self.chunk_size)
+            end = len(payload) if end == -1 else end + 1
+            yield decode(payload[start:end])
+            start = end
+
+    def _base64_chunks(self, payload):
+        """Decode base64 in 4-character aligned blocks, ignoring line breaks"""
+        pending = ''
+        start = 0
+        while start < len(payload):
+            end = min(len(payload), start + self.chunk_size)
+            pending += ''.join(payload[start:end].split())
+            start = end
+            usable = len(pending) - len(pending) % 4
+            if usable:
+                yield _a2b_base64(pending[:usable])
+                pending = pending[usable:]
+        if pending:
+            # Truncated or unpadded tail (partial IMAP fetch)
+            yield _a2b_base64(pending + '=' * (-len(pending) % 4))
+
+    @staticmethod
+    def _decoder(charset):
+        try:
+            return codecs.getincrementaldecoder(charset or 'utf-8')(errors='ignore')
+        except LookupError:
+            return codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+
+def _raw_bytes(text):
+    """Undo the email package's str view of a payload (as Message.get_payload does)"""
+    try:
+        return text.encode('ascii', 'surrogateescape')
+    except UnicodeError:
+        return text.encode('raw-unicode-escape')
+
+
+def _qp_bytes(text):
+    return binascii.a2b_qp(_raw_bytes(text))
+
+
+def _a2b_base64(text):
+    try:
+        return binascii.a2b_base64(text)
+    except binascii.Error:
+        return b''
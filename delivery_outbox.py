@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - OUTBOX
+Durable queue of deliveries with retry scheduling
+
+Every recognised payment is written to a local SQLite outbox before the
+first send attempt. Failed sends stay in the outbox and are retried by
+OutboxWorker with exponential backoff and jitter; after max_attempts the
+row moves to the 'dead' state for manual follow-up. Rows left 'sending'
+by a crash are re-queued, so no paying customer is dropped.
+
+Only one OutboxWorker at a time owns the outbox: it holds a lease row
+that it renews while running. Recovery runs when a worker takes the lease
+(at startup, or once a crashed owner's lease has gone stale), never when
+a process merely opens the database, so a stats or lookup command next to
+a live monitor cannot re-queue that monitor's in-flight deliveries.
+
+Row states: sending → delivered | pending (retry) → ... → dead
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    message_key  TEXT PRIMARY KEY,
+    customer     TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL,
+    last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (status, next_attempt);
+CREATE TABLE IF NOT EXISTS leases (
+    name    TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class DeliveryOutbox:
+    """SQLite-backed outbox of customer deliveries"""
+
+    def __init__(self, path='delivery_outbox.db', max_attempts=8,
+                 base_delay=30, max_delay=3600, lease_ttl=300):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_ttl = lease_ttl  # a crashed owner's rows are recovered after this long
+        self.owner = f"{os.getpid()}-{os.urandom(4).hex()}"
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def enqueue(self, message_key, customer_info):
+        """Record a delivery as in flight; False if the key is already known"""
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO deliveries "
+                "(message_key, customer, status, next_attempt, created, updated) "
+                "VALUES (?, ?, 'sending', ?, ?, ?)",
+                (message_key, json.dumps(customer_info), now, now, now))
+        return cursor.rowcount == 1
+
+    def enqueue_many(self, deliveries):
+        """Queue (message_key, customer_info) pairs as due retries in one transaction;
+        returns how many were new"""
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                before = self.db.total_changes
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO deliveries "
+                    "(message_key, customer, status, next_attempt, created, updated) "
+                    "VALUES (?, ?, 'pending', ?, ?, ?)",
+                    [(key, json.dumps(customer_info), now, now, now) for key, customer_info in deliveries])
+                added = self.db.total_changes - before
+                self.db.execute('COMMIT')
+            except Exception:
+                self.db.execute('ROLLBACK')
+                raise
+        return added
+
+    def claim_due(self, limit=10):
+        """Move up to limit due retries to 'sending' and return them"""
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self.db.execute(
+                    "SELECT message_key, customer, attempts FROM deliveries "
+                    "WHERE status = 'pending' AND next_attempt <= ? "
+                    "ORDER BY next_attempt LIMIT ?", (now, limit)).fetchall()
+                self.db.executemany(
+                    "UPDATE deliveries SET status = 'sending', updated = ? WHERE message_key = ?",
+                    [(now, row[0]) for row in rows])
+                self.db.execute('COMMIT')
+            except Exception:
+                self.db.execute('ROLLBACK')
+                raise
+        return [(key, json.loads(customer), attempts) for key, customer, attempts in rows]
+
+    def mark_delivered(self, message_key):
+        self._update(message_key, "status = 'delivered', attempts = attempts + 1, last_error = NULL")
+
+    def mark_failed(self, message_key, error):
+        """Schedule a retry with exponential backoff, or dead-letter the row"""
+        with self.lock:
+            row = self.db.execute("SELECT attempts FROM deliveries WHERE message_key = ?",
+                                  (message_key,)).fetchone()
+        if row is None:
+            return None
+
+        # Deferrals (e.g. SMTP quota) name their own retry time and do not use up an attempt
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            self._update(message_key, "status = 'pending', last_error = ?, next_attempt = ?",
+                         (str(error), time.time() + retry_after))
+            return 'pending'
+
+        # Permanent failures (e.g. a payment that failed verification) never succeed on retry
+        attempts = row[0] + 1
+        if attempts >= self.max_attempts or getattr(error, 'permanent', False):
+            self._update(message_key, "status = 'dead', attempts = ?, last_error = ?",
+                         (attempts, str(error)))
+            print(f"☠️ Delivery {message_key} dead-lettered after {attempts} attempts: {error}")
+            return 'dead'
+
+        # Full backoff window with ±50% jitter so retries after an outage spread out
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.5)
+        self._update(message_key,
+                     "status = 'pending', attempts = ?, last_error = ?, next_attempt = ?",
+                     (attempts, str(error), time.time() + delay))
+        return 'pending'
+
+    def acquire_lease(self, name='worker'):
+        """Take or renew the single-owner lease; False while another live process holds it"""
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.db.execute("SELECT owner, expires FROM leases WHERE name = ?",
+                                      (name,)).fetchone()
+                if row and row[0] != self.owner and row[1] > now:
+                    self.db.execute('COMMIT')
+                    return False
+                self.db.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                                (name, self.owner, now + self.lease_ttl))
+                self.db.execute('COMMIT')
+            except Exception:
+                self.db.execute('ROLLBACK')
+                raise
+        return True
+
+    def release_lease(self, name='worker'):
+        with self.lock:
+            self.db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def recover(self):
+        """Re-queue rows a crashed process left in flight (lease holder only)"""
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE deliveries SET status = 'pending', next_attempt = ? "
+                "WHERE status = 'sending'", (time.time(),))
+        if cursor.rowcount:
+            print(f"♻️ Re-queued {cursor.rowcount} interrupted deliveries")
+        return cursor.rowcount
+
+    def get_stats(self):
+        """Outbox depth per state and age of the oldest undelivered row"""
+        now = time.time()
+        with self.lock:
+            counts = dict(self.db.execute(
+                "SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall())
+            oldest, next_due = self.db.execute(
+                "SELECT MIN(created), MIN(next_attempt) FROM deliveries "
+                "WHERE status IN ('pending', 'sending')").fetchone()
+        return {
+            'pending': counts.get('pending', 0),
+            'sending': counts.get('sending', 0),
+            'delivered': counts.get('delivered', 0),
+            'dead': counts.get('dead', 0),
+            'depth': counts.get('pending', 0) + counts.get('sending', 0),
+            'oldest_age_seconds': round(now - oldest, 1) if oldest else 0,
+            'next_retry_in_seconds': round(max(0, next_due - now), 1) if next_due else None
+        }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _update(self, message_key, assignments, params=()):
+        with self.lock:
+            self.db.execute(f"UPDATE deliveries SET {assignments}, updated = ? WHERE message_key = ?",
+                            (*params, time.time(), message_key))
+
+
+class OutboxWorker:
+    """Background thread that drains due retries with parallel senders"""
+
+    def __init__(self, outbox, deliver, senders=2, poll_interval=5, batch_size=20, check=None):
+        self.outbox = outbox
+        self.deliver = deliver  # callable(customer_info) -> None, raises on failure
+        self.check = check      # optional callable([customer_info]) -> [None or exception], per batch
+        self.senders = senders
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.owns_outbox = False
+        self.lease_checked = False
+        self.lock = threading.Lock()
+        self.stats = {'retried': 0, 'recovered': 0, 'failed': 0, 'requeued': 0}
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        if self.owns_outbox:
+            self.outbox.release_lease()
+            self.owns_outbox = False
+
+    def drain_once(self):
+        """Retry every due delivery once; returns the number attempted"""
+        due = self.outbox.claim_due(self.batch_size)
+        attempted = len(due)
+        if due and self.check is not None:
+            # One batched pre-check (payment verification) instead of one per retry
+            try:
+                errors = self.check([customer_info for _, customer_info, _ in due])
+            except Exception as e:
+                # The claimed rows go back on the retry schedule, not stuck in 'sending'
+                print(f"❌ Outbox pre-check error: {e}")
+                errors = [e] * len(due)
+            for (message_key, _, _), error in zip(due, errors):
+                if error is not None:
+                    self._count('failed')
+                    self.outbox.mark_failed(message_key, error)
+            due = [row for row, error in zip(due, errors) if error is None]
+        if due:
+            with ThreadPoolExecutor(max_workers=self.senders) as pool:
+                list(pool.map(self._retry, due))
+        return attempted
+
+    def hold_lease(self):
+        """Take or renew the outbox lease; recovers interrupted rows when newly taken"""
+        if not self.outbox.acquire_lease():
+            if self.owns_outbox or not self.lease_checked:
+                print("⏸️ Outbox owned by another running worker; retries paused until it stops")
+            self.owns_outbox = False
+            self.lease_checked = True
+            return False
+        self.lease_checked = True
+        if not self.owns_outbox:
+            self.owns_outbox = True
+            requeued = self.outbox.recover()
+            with self.lock:
+                self.stats['requeued'] += requeued
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                if not self.hold_lease():
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                # Keep going while a backlog is due, otherwise sleep
+                if self.drain_once() < self.batch_size:
+                    self.stop_event.wait(self.poll_interval)
+            except Exception as e:
+                print(f"❌ Outbox worker error: {e}")
+                self.stop_event.wait(self.poll_interval)
+
+    def _retry(self, row):
+        message_key, customer_info, attempts = row
+        self._count('retried')
+        if self.owns_outbox:
+            self.outbox.acquire_lease()  # renew: paced sends can outlast a poll interval
+        try:
+            self.deliver(customer_info)
+        except Exception as e:
+            self._count('failed')
+            self.outbox.mark_failed(message_key, e)
+        else:
+            self._count('recovered')
+            self.outbox.mark_delivered(message_key)
+            print(f"♻️ Retry {attempts + 1} delivered to {customer_info['email']}")
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
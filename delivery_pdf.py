@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - PDF DOCUMENTS
+Cached master PDF + per-customer overlay, no third-party PDF library
+
+Rendering the full documentation for every sale is the expensive part of
+a delivery. Instead the markdown source is laid out once into a master
+PDF (selune_complete_documentation.pdf) that is cached on disk. Each
+master page draws a shared watermark stream after its own content.
+
+The last three objects of the master are per-customer:
+  - the content of a personalization page placed in front of the document
+  - the watermark stream drawn at the foot of every page
+  - the document information dictionary
+
+MasterDocument keeps every other object as pre-serialized bytes with
+their xref entries. A customer copy is that prefix plus the three new
+objects, a short xref section and the trailer, so the cost is one
+memcpy of the master and the layout never runs again.
+
+Text is set in the standard Helvetica/Courier fonts (WinAnsiEncoding);
+characters outside that code page, such as emoji, are dropped.
+"""
+
+import hashlib
+import os
+import re
+import textwrap
+import threading
+import time
+import zlib
+from datetime import datetime
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+MARGIN = 72
+FOOTER_Y = 36
+
+FONTS = [('F1', 'Helvetica'), ('F2', 'Helvetica-Bold'), ('F3', 'Courier')]
+
+# style: (font, size, leading, average glyph width as a fraction of size)
+STYLES = {
+    'h1': ('F2', 18, 28, 0.56),
+    'h2': ('F2', 14, 22, 0.56),
+    'h3': ('F2', 12, 18, 0.56),
+    'body': ('F1', 10, 14, 0.5),
+    'code': ('F3', 9, 12, 0.6),
+}
+
+LINK = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+EMPHASIS = re.compile(r'\*\*|__|`')
+
+# Objects 1..5 are fixed; pages follow
+CATALOG, PAGES = 1, 2
+FIRST_PAGE_OBJECT = len(FONTS) + 3
+VARIABLE_OBJECTS = 3  # overlay content, watermark, info
+
+# Personalization page placed in front of every customer copy
+COVER_TEMPLATE = """
+# Selûne AI Automation System
+## Complete Technical Documentation
+
+**Personal Copy for: {{ email }}**
+**Purchase Date: {{ timestamp }}**
+**Payment Amount: ${{ amount }}**
+**Customer ID: {{ customer_id }}**
+
+Thank you for purchasing the Selûne AI automation documentation! The
+complete technical guide follows this page.
+
+## Support & Updates
+- GitHub: https://github.com/colera1333/selune-ai-automation-launch
+- Email support: valgrim1333@yahoo.com
+
+---
+Document generated automatically by Selûne delivery system
+Generated: {{ generated }}
+"""
+
+
+def layout_markdown(text):
+    """Markdown → wrapped (style, line) pairs"""
+    lines = []
+    in_code = False
+    usable = PAGE_WIDTH - 2 * MARGIN
+
+    for raw in text.splitlines():
+        stripped = raw.strip()
+        if stripped.startswith('```'):
+            in_code = not in_code
+            continue
+
+        if in_code:
+            style = 'code'
+            content = raw.expandtabs(4)
+        elif stripped.startswith('#'):
+            level = len(stripped) - len(stripped.lstrip('#'))
+            style = f'h{min(level, 3)}'
+            content = stripped.lstrip('#').strip()
+            lines.append(('body', ''))
+        elif stripped in ('---', '***', '___'):
+            lines.append(('body', ''))
+            continue
+        else:
+            style = 'body'
+            content = stripped
+            if content[:2] in ('- ', '* ', '+ '):
+                content = '• ' + content[2:]
+
+        if style != 'code':
+            content = EMPHASIS.sub('', LINK.sub(r'\1 (\2)', content))
+
+        font, size, leading, width = STYLES[style]
+        columns = max(20, int(usable / (size * width)))
+        if not content:
+            lines.append((style, ''))
+        elif style == 'code':
+            lines.extend((style, content[i:i + columns]) for i in range(0, len(content), columns))
+        else:
+            lines.extend((style, line) for line in textwrap.wrap(content, columns) or [''])
+    return lines
+
+
+def paginate(lines, top=PAGE_HEIGHT - MARGIN, bottom=MARGIN):
+    """Split laid-out lines into pages of (style, line, y)"""
+    pages = [[]]
+    y = top
+    for style, line in lines:
+        leading = STYLES[style][2]
+        if y - leading < bottom and pages[-1]:
+            pages.append([])
+            y = top
+        if not line and not pages[-1]:
+            continue  # no blank lines at the top of a page
+        y -= leading
+        pages[-1].append((style, line, y))
+    return pages
+
+
+def page_stream(page, page_number=None):
+    """Content stream operators for one page of text"""
+    ops = [b'BT']
+    current = None
+    for style, line, y in page:
+        font, size = STYLES[style][:2]
+        if (font, size) != current:
+            ops.append(b'/%s %d Tf' % (font.encode(), size))
+            current = (font, size)
+        if line:
+            ops.append(b'1 0 0 1 %d %d Tm (%s) Tj' % (MARGIN, y, pdf_text(line)))
+    if page_number is not None:
+        ops.append(b'/F1 8 Tf 1 0 0 1 %d %d Tm (%d) Tj' % (PAGE_WIDTH - MARGIN, FOOTER_Y, page_number))
+    ops.append(b'ET')
+    return b'\n'.join(ops)
+
+
+def watermark_stream(text):
+    """Grey footer line drawn on every page"""
+    if not text:
+        return b''
+    return b'q 0.55 g BT /F1 8 Tf 1 0 0 1 %d %d Tm (%s) Tj ET Q' % (MARGIN, FOOTER_Y, pdf_text(text))
+
+
+def pdf_text(text):
+    """Escape text as a WinAnsi PDF string body"""
+    data = text.encode('cp1252', errors='ignore')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def stream_object(data, compress=True):
+    if compress:
+        data = zlib.compress(data, 6)
+        return b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(data), data)
+    return b'<< /Length %d >>\nstream\n%s\nendstream' % (len(data), data)
+
+
+def info_object(title, subject):
+    created = datetime.now().strftime('D:%Y%m%d%H%M%S')
+    return (b'<< /Title (%s) /Subject (%s) /Producer (Selune delivery system) /CreationDate (%s) >>'
+            % (pdf_text(title), pdf_text(subject), created.encode()))
+
+
+def xref_entry(offset):
+    return b'%010d 00000 n \n' % offset
+
+
+def object_bytes(number, body):
+    return b'%d 0 obj\n%s\nendobj\n' % (number, body)
+
+
+def render_document(source, overlay_text='', watermark='', title='Selûne AI Automation Documentation',
+                    subject=''):
+    """Lay out a markdown document into a complete PDF (the expensive path)"""
+    pages = paginate(layout_markdown(source))
+    overlay_page = FIRST_PAGE_OBJECT + 2 * len(pages)
+    overlay_content = overlay_page + 1
+    watermark_object = overlay_page + 2
+    info = overlay_page + 3
+    resources = b'<< /Font << %s >> >>' % b' '.join(
+        b'/%s %d 0 R' % (name.encode(), CATALOG + 2 + i) for i, (name, _) in enumerate(FONTS))
+
+    def page_dict(contents):
+        return (b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents [%s] >>'
+                % (PAGES, PAGE_WIDTH, PAGE_HEIGHT, resources,
+                   b' '.join(b'%d 0 R' % number for number in contents)))
+
+    kids = [overlay_page] + [FIRST_PAGE_OBJECT + 2 * i for i in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages %d 0 R >>' % PAGES,
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)),
+    ]
+    objects += [b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base.encode()
+                for _, base in FONTS]
+    for number, page in enumerate(pages, 1):
+        content = FIRST_PAGE_OBJECT + 2 * (number - 1) + 1
+        objects.append(page_dict([content, watermark_object]))
+        objects.append(stream_object(page_stream(page, number)))
+    objects.append(page_dict([overlay_content, watermark_object]))
+    objects += personalized_objects(overlay_text, watermark, title, subject)
+
+    out = [b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n']
+    offsets = []
+    position = len(out[0])
+    for number, body in enumerate(objects, 1):
+        data = object_bytes(number, body)
+        offsets.append(position)
+        out.append(data)
+        position += len(data)
+
+    out.append(b'xref\n0 %d\n0000000000 65535 f \n' % (info + 1))
+    out.extend(xref_entry(offset) for offset in offsets)
+    out.append(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+               % (info + 1, CATALOG, info, position))
+    return b''.join(out)
+
+
+def personalized_objects(overlay_text, watermark, title, subject):
+    """Bodies of the three per-customer objects, in object order"""
+    overlay = paginate(layout_markdown(overlay_text or ''))[0]
+    return [stream_object(page_stream(overlay)),
+            stream_object(watermark_stream(watermark), compress=False),
+            info_object(title, subject)]
+
+
+class MasterDocument:
+    """A rendered master PDF, split into a reusable prefix and per-customer objects"""
+
+    def __init__(self, data, name='<master>'):
+        self.name = name
+        startxref = int(data[data.rindex(b'startxref') + 9:].split()[0])
+        header = data[startxref:data.index(b'\n', data.index(b'\n', startxref) + 1) + 1]
+        first, size = (int(value) for value in header.split()[1:3])
+        if first != 0 or not data.startswith(b'%PDF'):
+            raise ValueError(f"{name} is not a master document")
+
+        entries = data[startxref + len(header):startxref + len(header) + 20 * size]
+        offsets = [int(entries[i * 20:i * 20 + 10]) for i in range(size)]
+
+        self.size = size
+        self.first_variable = size - VARIABLE_OBJECTS
+        self.prefix = data[:offsets[self.first_variable]]
+        self.fingerprint = hashlib.blake2b(self.prefix, digest_size=16).hexdigest()
+        self.xref_entries = entries[:20 * self.first_variable]
+        self.pages = (self.first_variable - FIRST_PAGE_OBJECT) // 2
+
+        self.lock = threading.Lock()
+        self.stats = {'copies': 0, 'copy_seconds': 0.0}
+
+    def personalize(self, overlay_text, watermark, title='Selûne AI Automation Documentation',
+                    subject=''):
+        """A customer copy: cached master objects + fresh overlay, watermark and info"""
+        started = time.perf_counter()
+        out = [self.prefix]
+        entries = [self.xref_entries]
+        position = len(self.prefix)
+        bodies = personalized_objects(overlay_text, watermark, title, subject)
+        for number, body in enumerate(bodies, self.first_variable):
+            data = object_bytes(number, body)
+            entries.append(xref_entry(position))
+            out.append(data)
+            position += len(data)
+
+        out.append(b'xref\n0 %d\n' % self.size)
+        out.extend(entries)
+        out.append(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (self.size, CATALOG, self.size - 1, position))
+        document = b''.join(out)
+
+        with self.lock:
+            self.stats['copies'] += 1
+            self.stats['copy_seconds'] += time.perf_counter() - started
+        return document
+
+    def get_stats(self):
+        with self.lock:
+            copies = self.stats['copies']
+            average = self.stats['copy_seconds'] / copies * 1000 if copies else 0.0
+            return {'master': self.name, 'pages': self.pages, 'master_bytes': len(self.prefix),
+                    'copies': copies, 'avg_copy_ms': round(average, 3)}
+
+
+class MasterPDFCache:
+    """Master PDF rendered from the markdown source once and cached on disk"""
+
+    def __init__(self, source_path, pdf_path):
+        self.source_path = source_path
+        self.pdf_path = pdf_path
+        self.lock = threading.Lock()
+        self.master = None
+        self.key = None
+
+    def get(self):
+        """The current MasterDocument, or None if there is no documentation source"""
+        source_mtime = _mtime(self.source_path)
+        pdf_mtime = _mtime(self.pdf_path)
+        key = (source_mtime, pdf_mtime)
+
+        with self.lock:
+            if self.master is not None and key == self.key:
+                return self.master
+            if source_mtime is None and pdf_mtime is None:
+                return None
+
+            if pdf_mtime is None or (source_mtime is not None and source_mtime > pdf_mtime):
+                self._render()
+            with open(self.pdf_path, 'rb') as f:
+                self.master = MasterDocument(f.read(), name=self.pdf_path)
+            self.key = (source_mtime, _mtime(self.pdf_path))
+            return self.master
+
+    def _render(self):
+        started = time.perf_counter()
+        with open(self.source_path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        data = render_document(source, overlay_text='# Selûne AI Automation System\n'
+                                                     'Complete Technical Documentation')
+        temp_path = self.pdf_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self.pdf_path)
+        print(f"📚 Rendered master PDF {self.pdf_path} ({len(data) // 1024} KB) "
+              f"in {time.perf_counter() - started:.2f}s")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - STAGED PIPELINE
+Concurrent ingest → parse → render → send for the delivery system
+
+The monitor used to handle each email start to finish before looking at
+the next one, so a single slow SMTP send stalled everything behind it.
+DeliveryPipeline connects the stages with bounded queues and runs each
+stage on its own worker threads:
+
+    IMAP ingest (caller thread) → parse → [verify] → render → SMTP send
+
+A full queue blocks the stage feeding it, so backpressure reaches the
+IMAP fetch instead of buffering unbounded work. imaplib and smtplib
+are blocking, so the stages use threads rather than asyncio.
+
+The optional verify stage (PayPal API, delivery_verify.py) takes its
+queue in batches: whatever is waiting, plus anything arriving within a
+short linger, is verified with one lookup.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+_DONE = object()
+
+
+class PipelineStage:
+    """A pool of worker threads draining one bounded queue.
+
+    With batch_size > 1 the handler takes a list of up to batch_size items
+    (waiting at most linger seconds for more) and returns a list of results.
+    When the handler raises, on_error(item, error) is called for each of its
+    items so nothing claimed is silently dropped.
+    """
+
+    def __init__(self, name, handler, workers, inbox, outbox=None, next_stage=None,
+                 batch_size=1, linger=0.0, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.next_stage = next_stage
+        self.batch_size = batch_size
+        self.linger = linger
+
+        self.lock = threading.Lock()
+        self.running = 0
+        self.latencies = deque(maxlen=10000)  # seconds per item
+        self.stats = {'processed': 0, 'dropped': 0, 'errors': 0, 'busy_seconds': 0.0}
+
+    def start(self):
+        self.running = self.workers
+        threads = [threading.Thread(target=self._work, name=f'{self.name}-{i}', daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _work(self):
+        done = False
+        while not done:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+            if self.batch_size > 1:
+                items, done = self._collect(item)
+            else:
+                items = item
+
+            started = time.perf_counter()
+            try:
+                results = self.handler(items)
+            except Exception as e:
+                print(f"❌ Pipeline {self.name} error: {e}")
+                results = [None] * len(items) if self.batch_size > 1 else None
+                self._count('errors')
+                self._fail(items if self.batch_size > 1 else [items], e)
+            elapsed = time.perf_counter() - started
+            self._count('busy_seconds', elapsed)
+            if self.batch_size == 1:
+                results = [results]
+            self.latencies.extend([elapsed] * len(results))
+
+            for result in results:
+                if result is None:
+                    self._count('dropped')
+                else:
+                    self._count('processed')
+                    if self.outbox is not None:
+                        self.outbox.put(result)  # blocks when the next stage is behind
+
+        # Last worker out tells the next stage there is nothing more coming
+        with self.lock:
+            self.running -= 1
+            last = self.running == 0
+        if last and self.next_stage is not None:
+            for _ in range(self.next_stage.workers):
+                self.outbox.put(_DONE)
+
+    def _fail(self, items, error):
+        if self.on_error is None:
+            return
+        for item in items:
+            try:
+                self.on_error(item, error)
+            except Exception as e:
+                print(f"❌ Pipeline {self.name} could not record a failed item: {e}")
+
+    def _collect(self, first):
+        """(batch, saw_done): first plus whatever arrives within the linger"""
+        items = [first]
+        deadline = time.monotonic() + self.linger
+        while len(items) < self.batch_size:
+            try:
+                item = self.inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def get_stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return dict(self.stats, workers=self.workers,
+                        busy_seconds=round(self.stats['busy_seconds'], 3),
+                        latency_ms=latency_percentiles(latencies))
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+
+def latency_percentiles(sorted_seconds):
+    """p50/p95/p99 of sorted durations, in milliseconds"""
+    def percentile(pct):
+        if not sorted_seconds:
+            return None
+        index = min(len(sorted_seconds) - 1, int(round(pct / 100 * (len(sorted_seconds) - 1))))
+        return round(sorted_seconds[index] * 1000, 3)
+    return {'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99)}
+
+
+class DeliveryPipeline:
+    """Bounded-queue parse → render → send pipeline for SelûneDeliverySystem"""
+
+    def __init__(self, delivery_system, parse_workers=1, render_workers=2,
+                 send_workers=2, queue_size=32, verify_batch_size=50, verify_linger=0.05):
+        self.delivery_system = delivery_system
+        self.parse_workers = parse_workers
+        self.render_workers = render_workers
+        self.send_workers = send_workers
+        self.queue_size = queue_size
+        self.verify_batch_size = verify_batch_size
+        self.verify_linger = verify_linger
+        self.last_run = {}
+
+    def run(self, messages, claim=None, report=None):
+        """Push (uid, email_message) pairs through the pipeline.
+
+        messages is consumed on the calling thread (the IMAP session is not
+        thread-safe), blocking whenever the parse queue is full. claim is
+        called with (uid, email_message, customer_info) once an email is
+        recognised as a payment and must return False to skip it. report,
+        if given, is called with (customer_info, delivered, error) after
+        each delivery attempt.
+        Returns one result dict per payment: uid, customer and delivered.
+        """
+        system = self.delivery_system
+        results = []
+        results_lock = threading.Lock()
+
+        def parse(item):
+            uid, email_message = item
+            # With a claim, the customer is saved by the claim once it wins
+            customer_info = system.parse_payment_email(email_message, save=claim is None)
+            if not customer_info:
+                return None
+            if claim is not None and claim(uid, email_message, customer_info) is False:
+                return None
+            return uid, customer_info
+
+        def verify(items):
+            outcomes = system.verify_payments([customer_info for _, customer_info in items])
+            passed = []
+            for (uid, customer_info), error in zip(items, outcomes):
+                if error is None:
+                    passed.append((uid, customer_info))
+                else:
+                    print(f"🛡️ Delivery to {customer_info['email']} held: {error}")
+                    record(uid, customer_info, False, error)
+                    passed.append(None)
+            return passed
+
+        def render(item):
+            uid, customer_info = item
+            print(f"📧 Sending automated delivery to {customer_info['email']}")
+            try:
+                return uid, customer_info, system.render_delivery(customer_info)
+            except Exception as e:
+                print(f"❌ Delivery error: {e}")
+                record(uid, customer_info, False, e)
+                return None
+
+        def send(item):
+            uid, customer_info, msg = item
+            try:
+                delivered = system.send_delivery_message(customer_info, msg)
+            except Exception as e:
+                print(f"❌ Delivery error: {e}")
+                failed(item, e)
+                return item
+            try:
+                record(uid, customer_info, delivered)
+            except Exception as e:
+                # The email went out, so it must not go back on the retry schedule;
+                # if recovered later, retry_delivery sees it delivered and skips it
+                print(f"⚠️ Delivered to {customer_info['email']} but could not record it: {e}")
+            return item
+
+        def record(uid, customer_info, delivered, error=None):
+            if report is not None:
+                report(customer_info, delivered, error)
+            with results_lock:
+                results.append({'uid': uid, 'customer': customer_info, 'delivered': delivered})
+
+        def failed(item, error):
+            # A stage crashed past its own error handling: hand the claimed
+            # payment back to the outbox retry schedule
+            uid, customer_info = item[0], item[1]
+            record(uid, customer_info, False, error)
+
+        parse_queue = queue.Queue(self.queue_size)
+        render_queue = queue.Queue(self.queue_size)
+        send_queue = queue.Queue(self.queue_size)
+
+        send_stage = PipelineStage('send', send, self.send_workers, send_queue)
+        render_stage = PipelineStage('render', render, self.render_workers, render_queue,
+                                     send_queue, send_stage, on_error=failed)
+        stages = [render_stage, send_stage]
+        if system.verifier is not None:
+            # One worker: batches stay as large as the arrivals allow
+            verify_queue = queue.Queue(self.queue_size)
+            verify_stage = PipelineStage('verify', verify, 1, verify_queue, render_queue, render_stage,
+                                         batch_size=self.verify_batch_size, linger=self.verify_linger,
+                                         on_error=failed)
+            stages.insert(0, verify_stage)
+            parse_stage = PipelineStage('parse', parse, self.parse_workers, parse_queue,
+                                        verify_queue, verify_stage)
+        else:
+            parse_stage = PipelineStage('parse', parse, self.parse_workers, parse_queue,
+                                        render_queue, render_stage)
+        stages.insert(0, parse_stage)
+
+        started = time.perf_counter()
+        threads = [thread for stage in stages for thread in stage.start()]
+
+        # Ingest latency: time spent waiting on the IMAP fetch for each message
+        ingest_latencies = []
+        ingested = 0
+        try:
+            messages = iter(messages)
+            while True:
+                waited = time.perf_counter()
+                item = next(messages, _DONE)
+                ingest_latencies.append(time.perf_counter() - waited)
+                if item is _DONE:
+                    break
+                parse_queue.put(item)
+                ingested += 1
+        finally:
+            for _ in range(self.parse_workers):
+                parse_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - started
+        delivered = sum(1 for result in results if result['delivered'])
+        self.last_run = {
+            'ingested': ingested,
+            'payments': len(results),
+            'delivered': delivered,
+            'seconds': round(elapsed, 3),
+            'deliveries_per_minute': round(delivered / elapsed * 60, 1) if elapsed and delivered else 0.0,
+            'ingest_latency_ms': latency_percentiles(sorted(ingest_latencies)),
+            'stages': {stage.name: stage.get_stats() for stage in stages}
+        }
+        return results
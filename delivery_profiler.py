@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - ON-DEMAND PROFILING
+cProfile + tracemalloc snapshots of a running --monitor process
+
+A slow or slowly growing monitor no longer has to be killed to be
+investigated. Ask the running process for a profile, either with a signal
+or by creating the control file in its working directory:
+
+    kill -USR1 <pid>                          # profile the next 3 cycles
+    echo 10 > delivery_profile.request        # profile the next 10 cycles
+
+The request is picked up at the start of the next monitor cycle. For that
+many cycles every monitor thread runs under cProfile, as does every
+thread started meanwhile (the pipeline's parse/render/send workers), and
+tracemalloc traces allocations. Then profiling switches off again and a
+report is written to output_dir:
+
+- profile-<time>.txt: hot functions by cumulative and by own time, the
+  top allocation sites still live at the end, and (over several cycles)
+  the sites whose memory grew between the first and the last cycle
+- profile-<time>.prof: the merged pstats data, for snakeviz and friends
+
+Nothing is profiled until asked; the idle cost is one os.path.exists()
+per cycle.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class ProfilingHook:
+    """Profiles the next N monitor cycles on SIGUSR1 or a control file"""
+
+    def __init__(self, cycles=3, control_file='delivery_profile.request', output_dir='profiles',
+                 top=30, trace_frames=1):
+        self.cycles = cycles
+        self.control_file = control_file
+        self.output_dir = output_dir
+        self.top = top
+        self.trace_frames = trace_frames
+
+        self.lock = threading.Lock()
+        self.requested = 0        # set by the signal handler, read at the next cycle
+        self.remaining = 0
+        self.active = False
+        self.generation = 0       # profilers from an earlier request are not counted
+        self.started = None
+        self.owns_tracing = False
+        self.profilers = []       # (thread, profiler, finished) per profiled thread
+        self.baseline = None      # allocations after the first profiled cycle
+        self.local = threading.local()
+        self.reports = []
+
+    def install_signal_handler(self, signum=None):
+        """Profile on SIGUSR1 (main thread only; not available on Windows)"""
+        signum = signum or getattr(signal, 'SIGUSR1', None)
+        if signum is None or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signum, self._on_signal)
+        return True
+
+    def _on_signal(self, signum, frame):
+        # Only set a flag: the cycle boundary does the work
+        self.requested = self.cycles
+
+    @contextmanager
+    def cycle(self):
+        """Wrap one monitor cycle; profiles it while a request is active"""
+        self._cycle_started()
+        try:
+            yield
+        finally:
+            self._cycle_finished()
+
+    def _cycle_started(self):
+        with self.lock:
+            if not self.active:
+                cycles = self._take_request()
+                if not cycles:
+                    return
+                self._activate(cycles)
+            profiler = cProfile.Profile()
+            self.profilers.append([threading.current_thread(), profiler, False])
+            self.local.entry = (self.generation, self.profilers[-1])
+        self._enable(profiler)
+
+    def _cycle_finished(self):
+        current = getattr(self.local, 'entry', None)
+        if current is None:
+            return
+        generation, entry = current
+        entry[1].disable()  # from its own thread
+        entry[2] = True
+        self.local.entry = None
+
+        with self.lock:
+            if not self.active or generation != self.generation:
+                return  # a cycle that outlasted its request's report
+            self.remaining -= 1
+            if self.remaining > 0:
+                if self.baseline is None:
+                    self.baseline = self._snapshot()
+                return
+            self._deactivate()
+            profilers = list(self.profilers)
+            baseline = self.baseline
+            self.profilers = []
+            self.baseline = None
+        snapshot = self._snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if self.owns_tracing:
+            tracemalloc.stop()
+        self._write_report(profilers, baseline, snapshot, peak)
+
+    def _take_request(self):
+        """Cycles requested by signal or control file (the file is consumed)"""
+        cycles, self.requested = self.requested, 0
+        if self.control_file and os.path.exists(self.control_file):
+            try:
+                with open(self.control_file, 'r') as f:
+                    text = f.read().strip()
+                os.remove(self.control_file)
+                cycles = int(text) if text else self.cycles
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Profile request {self.control_file} ignored: {e}")
+        return max(cycles, 0)
+
+    def _activate(self, cycles):
+        print(f"🔬 Profiling the next {cycles} monitor cycles (cProfile + tracemalloc)")
+        self.active = True
+        self.generation += 1
+        self.remaining = cycles
+        self.started = time.time()
+        self.owns_tracing = not tracemalloc.is_tracing()
+        if self.owns_tracing:
+            tracemalloc.start(self.trace_frames)
+        # Worker threads started while profiling (pipeline stages) get their own profiler
+        threading.setprofile(self._profile_new_thread)
+
+    def _deactivate(self):
+        threading.setprofile(None)
+        self.active = False
+
+    def _profile_new_thread(self, frame, event, arg):
+        # First event in a new thread: swap this bootstrap for a real profiler
+        profiler = cProfile.Profile()
+        with self.lock:
+            if not self.active:
+                sys.setprofile(None)
+                return None
+            self.profilers.append([threading.current_thread(), profiler, False])
+        self._enable(profiler)
+        return None
+
+    @staticmethod
+    def _enable(profiler):
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from one profiler; this one stays empty
+            pass
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ])
+
+    def _write_report(self, profilers, baseline, snapshot, peak):
+        stats = None
+        threads = 0
+        for thread, profiler, finished in profilers:
+            # A worker that has exited can no longer touch its profiler; one
+            # still running elsewhere is mid-cycle and left out
+            if not finished and thread.is_alive():
+                continue
+            threads += 1
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        base = os.path.join(self.output_dir, f"profile-{stamp}")
+
+        out = io.StringIO()
+        out.write(f"Selûne monitor profile: pid {os.getpid()}, {threads} threads, "
+                  f"{time.time() - self.started:.1f}s from {time.ctime(self.started)}, "
+                  f"peak traced memory {peak / (1024 * 1024):.1f} MiB\n\n")
+        if stats is not None:
+            stats.stream = out
+            stats.dump_stats(base + '.prof')
+            out.write("=== Hot functions by cumulative time ===\n")
+            stats.sort_stats('cumulative').print_stats(self.top)
+            out.write("=== Hot functions by own time ===\n")
+            stats.sort_stats('tottime').print_stats(self.top)
+
+        total = sum(stat.size for stat in snapshot.statistics('filename'))
+        out.write(f"=== Top allocation sites still live ({total / 1024:.1f} KiB traced) ===\n")
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            out.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8} blocks  {stat.traceback}\n")
+        if baseline is not None:
+            out.write("\n=== Allocation growth since the first profiled cycle ===\n")
+            for stat in snapshot.compare_to(baseline, 'lineno')[:self.top]:
+                if stat.size_diff <= 0:
+                    break
+                out.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8} blocks  {stat.traceback}\n")
+
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+        self.reports.append(base + '.txt')
+        print(f"🔬 Profile written to {base}.txt" + (f" and {base}.prof" if stats is not None else ""))
+        return base + '.txt'
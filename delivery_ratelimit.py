@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - SMTP RATE LIMITING
+Provider-aware token buckets in front of the SMTP sender
+
+Yahoo and Gmail throttle or reject mail past their per-minute and
+per-day quotas. SMTPRateLimiter holds one token bucket per quota window
+for the configured relay and hands out send slots by reservation: each
+send is scheduled at the earliest moment every bucket allows, so a burst
+of payments is paced at the provider's maximum rate instead of tripping
+the limit and failing. A throttling reply from the server (421/451/452
+or a quota message) pauses all senders for a while.
+
+Sends that would have to wait longer than max_wait raise
+RateLimitExceeded, which leaves the delivery in the outbox for a later
+retry instead of parking a sender thread for hours.
+"""
+
+import re
+import threading
+import time
+
+# Conservative send quotas (messages) for the relays setup_delivery.py picks.
+# Providers do not publish exact numbers; these stay under observed limits.
+PROVIDER_PROFILES = {
+    'smtp.mail.yahoo.com': {'name': 'Yahoo', 'per_minute': 10, 'per_hour': 100, 'per_day': 500, 'burst': 3},
+    'smtp.gmail.com': {'name': 'Gmail', 'per_minute': 20, 'per_hour': 400, 'per_day': 500, 'burst': 5},
+    'smtp-mail.outlook.com': {'name': 'Outlook', 'per_minute': 30, 'per_day': 300, 'burst': 5},
+}
+DEFAULT_PROFILE = {'name': 'generic', 'per_minute': 30, 'per_day': 1000, 'burst': 5}
+
+WINDOWS = {'per_minute': 60, 'per_hour': 3600, 'per_day': 86400}
+
+# Replies that mean "slow down" rather than "this message is bad"
+THROTTLE_CODES = {421, 450, 451, 452}
+# Whole words and phrases, so "separate" or "unlimited" in a reply do not count
+THROTTLE_PHRASES = re.compile(
+    rb'\b(?:quota|rate[ -]?limit(?:ed|ing)?|rate exceeded|too many|'
+    rb'(?:sending|send|daily|hourly) limit|throttl(?:ed|ing))\b', re.IGNORECASE)
+
+
+class RateLimitExceeded(Exception):
+    """A send could not be scheduled within max_wait"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"SMTP send quota exhausted, next slot in {retry_after:.0f}s")
+        self.retry_after = retry_after  # read by DeliveryOutbox.mark_failed
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity; tokens may go negative (reservations)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, count=1):
+        """Seconds until count more tokens have been earned"""
+        missing = count - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+class SMTPRateLimiter:
+    """Paces SMTP sends to the relay's per-minute/hour/day quotas"""
+
+    def __init__(self, profile=None, max_wait=120, throttle_pause=60):
+        profile = dict(DEFAULT_PROFILE, **(profile or {}))
+        self.name = profile['name']
+        self.max_wait = max_wait
+        self.throttle_pause = throttle_pause
+        self.limits = {window: profile[window] for window in WINDOWS if profile.get(window)}
+
+        # The shortest window paces sends (small burst); longer windows cap totals
+        self.buckets = {}
+        for window, limit in self.limits.items():
+            capacity = min(limit, profile['burst']) if window == 'per_minute' else limit
+            self.buckets[window] = TokenBucket(limit / WINDOWS[window], capacity)
+
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.stats = {'sends': 0, 'delayed': 0, 'wait_seconds': 0.0, 'rejected': 0, 'throttled': 0}
+
+    @classmethod
+    def for_server(cls, smtp_server, overrides=None, **kwargs):
+        """Limiter for a relay hostname, with optional quota overrides"""
+        profile = dict(PROVIDER_PROFILES.get((smtp_server or '').lower(), DEFAULT_PROFILE))
+        profile.update(overrides or {})
+        return cls(profile, **kwargs)
+
+    def acquire(self):
+        """Block until this send's slot comes up; raises RateLimitExceeded past max_wait"""
+        with self.lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            wait = max([self.paused_until - now] + [bucket.wait_for() for bucket in self.buckets.values()])
+            if wait > self.max_wait:
+                self.stats['rejected'] += 1
+                raise RateLimitExceeded(wait)
+
+            # Reserve now, so concurrent senders queue up behind each other
+            for bucket in self.buckets.values():
+                bucket.tokens -= 1
+            self.stats['sends'] += 1
+            if wait > 0:
+                self.stats['delayed'] += 1
+                self.stats['wait_seconds'] += wait
+                self.waiting += 1
+
+        if wait > 0:
+            time.sleep(wait)
+            with self.lock:
+                self.waiting -= 1
+        return wait
+
+    def is_throttle_reply(self, code, message=b''):
+        if isinstance(message, str):
+            message = message.encode()
+        return code in THROTTLE_CODES or THROTTLE_PHRASES.search(message) is not None
+
+    def throttled(self, code, message=b''):
+        """Server pushed back: pause every sender for throttle_pause seconds"""
+        with self.lock:
+            self.stats['throttled'] += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + self.throttle_pause)
+        print(f"🐢 {self.name} SMTP throttled ({code}), pausing sends for {self.throttle_pause}s")
+
+    def drain_seconds(self, backlog):
+        """Estimated seconds to send backlog more messages within every quota"""
+        with self.lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            paused = max(0.0, self.paused_until - now)
+            # Waiting senders already hold reservations (negative tokens)
+            return max([paused] + [bucket.wait_for(backlog) for bucket in self.buckets.values()])
+
+    def get_stats(self, backlog=0):
+        drain = self.drain_seconds(backlog)
+        with self.lock:
+            return dict(self.stats,
+                        profile=self.name,
+                        limits=dict(self.limits),
+                        waiting=self.waiting,
+                        wait_seconds=round(self.stats['wait_seconds'], 1),
+                        tokens={window: round(bucket.tokens, 2) for window, bucket in self.buckets.items()},
+                        backlog=backlog,
+                        drain_seconds=round(drain, 1))
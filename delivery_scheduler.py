@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - POLL SCHEDULER
+Adaptive polling interval for the monitor loop
+
+The monitor used to sleep a fixed 300s after every cycle and 60s after an
+error. PollScheduler picks each interval instead:
+- payments seen in the last rate_window set the pace: the interval aims
+  for about target_payments new payments per poll, so a launch burst is
+  polled in well under a minute
+- quiet polls stretch the interval geometrically from base_interval
+- a time-of-day profile scales the result (and can raise the ceiling),
+  so overnight polling backs off
+- consecutive errors switch to jittered exponential backoff
+
+Every decision is printed with its reason and kept in a short history
+for get_stats(), so latency can be tuned against server load.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Local-time hour ranges [start, end); a range may wrap past midnight.
+# factor scales the interval, max_interval (optional) replaces the ceiling.
+DEFAULT_PROFILES = [
+    {'name': 'overnight', 'start': 0, 'end': 7, 'factor': 3.0, 'max_interval': 1800},
+    {'name': 'evening', 'start': 22, 'end': 24, 'factor': 1.5},
+    {'name': 'daytime', 'start': 7, 'end': 22, 'factor': 1.0},
+]
+
+
+class PollScheduler:
+    """Chooses the next poll interval from payment arrivals, errors and time of day"""
+
+    def __init__(self, base_interval=300, min_interval=20, max_interval=900,
+                 target_payments=1.0, rate_window=900, idle_growth=1.5,
+                 error_backoff=60, max_error_backoff=900, jitter=0.25,
+                 profiles=None, history=100):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_payments = target_payments
+        self.rate_window = rate_window
+        self.idle_growth = idle_growth
+        self.error_backoff = error_backoff
+        self.max_error_backoff = max_error_backoff
+        self.jitter = jitter
+        self.profiles = DEFAULT_PROFILES if profiles is None else profiles
+
+        self.arrivals = deque()   # monotonic timestamps, one per payment
+        self.quiet_polls = 0
+        self.consecutive_errors = 0
+        self.decisions = deque(maxlen=history)
+
+        self.lock = threading.Lock()
+        self.stats = {
+            'polls': 0,
+            'payments': 0,
+            'errors': 0,
+            'decisions': 0,
+            'interval_seconds': 0.0
+        }
+
+    def record_poll(self, payments):
+        """A monitor cycle finished and found this many new payments"""
+        with self.lock:
+            now = time.monotonic()
+            self.arrivals.extend([now] * payments)
+            self.quiet_polls = 0 if payments else self.quiet_polls + 1
+            self.consecutive_errors = 0
+            self.stats['polls'] += 1
+            self.stats['payments'] += payments
+
+    def record_error(self, error=None):
+        """A monitor cycle failed; the next intervals back off until one succeeds"""
+        with self.lock:
+            self.consecutive_errors += 1
+            self.stats['errors'] += 1
+
+    def arrival_rate(self):
+        """Payments per second over the last rate_window"""
+        with self.lock:
+            return self._arrival_rate(time.monotonic())
+
+    def profile(self, hour=None):
+        """The time-of-day profile for hour (local time now by default)"""
+        hour = datetime.now().hour if hour is None else hour
+        for profile in self.profiles:
+            start, end = profile['start'], profile['end']
+            if start <= hour < end if start < end else (hour >= start or hour < end):
+                return profile
+        return {'name': 'default', 'factor': 1.0}
+
+    def next_interval(self):
+        """Seconds until the next poll; logs and records the decision"""
+        profile = self.profile()
+        with self.lock:
+            rate = self._arrival_rate(time.monotonic())
+            ceiling = profile.get('max_interval', self.max_interval)
+
+            if self.consecutive_errors:
+                backoff = self.error_backoff * 2 ** (self.consecutive_errors - 1)
+                jitter = random.uniform(1 - self.jitter, 1 + self.jitter)
+                interval = min(self.max_error_backoff, backoff * jitter)
+                reason = f"error #{self.consecutive_errors}, backing off"
+            else:
+                if rate:
+                    # Aim for target_payments per poll; any recent payment keeps base pace
+                    interval = min(self.base_interval, self.target_payments / rate)
+                    reason = f"{rate * 3600:.1f} payments/h"
+                else:
+                    interval = self.base_interval * self.idle_growth ** max(0, self.quiet_polls - 1)
+                    reason = f"{self.quiet_polls} quiet polls"
+                interval = max(self.min_interval, min(ceiling, interval * profile['factor']))
+                reason += f", {profile['name']} x{profile['factor']:g}"
+
+            self.stats['decisions'] += 1
+            self.stats['interval_seconds'] += interval
+            self.decisions.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'interval': round(interval, 1),
+                'reason': reason
+            })
+
+        print(f"⏲️ Next poll in {interval:.0f}s ({reason})")
+        return interval
+
+    def wait(self):
+        """Sleep for the next interval"""
+        interval = self.next_interval()
+        time.sleep(interval)
+        return interval
+
+    def get_stats(self):
+        with self.lock:
+            decisions = self.stats['decisions']
+            average = self.stats['interval_seconds'] / decisions if decisions else 0.0
+            return dict(self.stats,
+                        interval_seconds=round(self.stats['interval_seconds'], 1),
+                        avg_interval=round(average, 1),
+                        payments_per_hour=round(self._arrival_rate(time.monotonic()) * 3600, 1),
+                        quiet_polls=self.quiet_polls,
+                        consecutive_errors=self.consecutive_errors,
+                        recent=list(self.decisions)[-10:])
+
+    def _arrival_rate(self, now):
+        cutoff = now - self.rate_window
+        while self.arrivals and self.arrivals[0] < cutoff:
+            self.arrivals.popleft()
+        return len(self.arrivals) / self.rate_window
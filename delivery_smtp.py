@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - SMTP POOL
+Warm, authenticated SMTP sessions for customer deliveries
+
+SMTPConnectionPool keeps a few logged-in connections to the relay and
+sends many messages per session instead of paying TLS + AUTH for every
+customer. Idle sessions are checked with NOOP before reuse, dropped
+sessions are replaced transparently, and per-send latency is recorded.
+
+An optional SMTPRateLimiter paces sends to the relay's quotas before a
+session is taken, and is told when the server answers with a throttling
+reply.
+
+Messages that provide chunks() (StreamingMessage) are written to the
+socket chunk by chunk during DATA instead of being flattened first.
+
+A session that drops before the end of DATA is retried once on a fresh
+one: the relay discards an unfinished message. Once the final "." has
+been sent the relay may already have queued the message, so a lost reply
+raises SMTPOutcomeUnknown, which the outbox dead-letters for a manual
+check instead of sending the documentation twice.
+"""
+
+import copy
+import re
+import smtplib
+import socket
+import threading
+import time
+from collections import deque
+from email.utils import getaddresses, parseaddr
+
+LEADING_DOT = re.compile(rb'^\.', re.MULTILINE)
+
+
+class SMTPOutcomeUnknown(smtplib.SMTPException):
+    """The session failed after the end of DATA: the relay may have accepted the message"""
+    permanent = True  # the outbox dead-letters it for a manual check instead of resending
+
+
+class SMTPConnectionPool:
+    """Reusable authenticated SMTP sessions with health checks and latency stats"""
+
+    def __init__(self, email_config, max_connections=2, max_messages_per_connection=100,
+                 idle_timeout=240, health_check_interval=30, timeout=30, rate_limiter=None):
+        self.email_config = email_config
+        self.rate_limiter = rate_limiter
+        self.max_connections = max_connections
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+
+        self.idle = []  # [server, messages_sent, last_used]
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.latencies = deque(maxlen=1000)
+        self.stats = {
+            'sends': 0,
+            'failures': 0,
+            'handshakes': 0,
+            'reuses': 0,
+            'health_checks': 0,
+            'reconnects': 0,
+            'streamed': 0,
+            'uncertain': 0
+        }
+
+    def send_message(self, msg):
+        """Send one message over a pooled session, reconnecting once if it dropped before DATA ended"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()  # may sleep; raises RateLimitExceeded past max_wait
+
+        started = time.perf_counter()
+        with self.slots:
+            entry = self._acquire()
+            try:
+                try:
+                    self._deliver(entry[0], msg)
+                except (SMTPOutcomeUnknown, smtplib.SMTPRecipientsRefused,
+                        smtplib.SMTPResponseException):
+                    # OSError subclasses, like every SMTPException: a reply from a live
+                    # session, or a message the relay may already have, is not retried
+                    raise
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    # Session died before the message was complete: retry on a fresh one
+                    self._discard(entry)
+                    self._count('reconnects')
+                    entry = self._connect()
+                    self._deliver(entry[0], msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # smtplib already sent RSET, so the session itself is still usable
+                self._release(entry)
+                self._count('failures')
+                self._check_throttle(e)
+                raise
+            except Exception as e:
+                self._discard(entry)
+                self._count('failures')
+                if isinstance(e, SMTPOutcomeUnknown):
+                    self._count('uncertain')
+                raise
+
+            entry[1] += 1
+            entry[2] = time.monotonic()
+            self._release(entry)
+
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.stats['sends'] += 1
+            self.latencies.append(latency)
+        return latency
+
+    def close(self):
+        """Quit every idle session"""
+        with self.lock:
+            entries, self.idle = self.idle, []
+        for entry in entries:
+            self._discard(entry)
+
+    def get_stats(self):
+        """Send counts, session reuse and per-send latency (milliseconds)"""
+        with self.lock:
+            last = self.latencies[-1] if self.latencies else None
+            latencies = sorted(self.latencies)
+            stats = dict(self.stats)
+            stats['idle_connections'] = len(self.idle)
+        stats['latency_ms'] = {
+            'last': round(last * 1000, 1) if last is not None else None,
+            'avg': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            'p50': _percentile_ms(latencies, 50),
+            'p95': _percentile_ms(latencies, 95),
+            'max': round(latencies[-1] * 1000, 1) if latencies else None
+        }
+        return stats
+
+    def _deliver(self, server, msg):
+        if hasattr(msg, 'chunks'):
+            # smtplib.sendmail() wants the whole message as one string; stream DATA instead
+            self._count('streamed')
+            sender, recipients, chunks = msg.sender, [msg.recipient], msg.chunks()
+        else:
+            sender, recipients, chunks = _envelope(msg)
+
+        # The SMTP steps are spelled out so a failure's phase is known
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(sender)
+        if code != 250:
+            self._reset(server)
+            raise smtplib.SMTPSenderRefused(code, response, sender)
+        refused = {}
+        for recipient in recipients:
+            code, response = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if len(refused) == len(recipients):
+            self._reset(server)
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        server.putcmd('data')
+        code, response = server.getreply()
+        if code != 354:
+            self._reset(server)
+            raise smtplib.SMTPDataError(code, response)
+        for chunk in chunks:
+            server.sock.sendall(chunk)
+        server.sock.sendall(b'.\r\n')
+        try:
+            code, response = server.getreply()
+        except (smtplib.SMTPServerDisconnected, OSError) as e:
+            raise SMTPOutcomeUnknown(f"no reply after the end of DATA: {e}") from e
+        if code != 250:
+            self._reset(server)
+            raise smtplib.SMTPDataError(code, response)
+
+    def _check_throttle(self, error):
+        if self.rate_limiter is None:
+            return
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            replies = list(error.recipients.values())
+        else:
+            replies = [(error.smtp_code, error.smtp_error)]
+        for code, message in replies:
+            if self.rate_limiter.is_throttle_reply(code, message):
+                self.rate_limiter.throttled(code, message)
+                return
+
+    @staticmethod
+    def _reset(server):
+        try:
+            server.rset()
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    def _acquire(self):
+        while True:
+            with self.lock:
+                entry = self.idle.pop() if self.idle else None
+            if entry is None:
+                return self._connect()
+
+            idle_for = time.monotonic() - entry[2]
+            if idle_for > self.idle_timeout or entry[1] >= self.max_messages_per_connection:
+                self._discard(entry)
+                continue
+            if idle_for > self.health_check_interval and not self._is_alive(entry[0]):
+                self._discard(entry)
+                self._count('reconnects')
+                continue
+
+            self._count('reuses')
+            return entry
+
+    def _release(self, entry):
+        if entry[1] >= self.max_messages_per_connection:
+            self._discard(entry)
+            return
+        with self.lock:
+            self.idle.append(entry)
+
+    def _is_alive(self, server):
+        self._count('health_checks')
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _connect(self):
+        server = smtplib.SMTP(self.email_config['smtp_server'],
+                              self.email_config.get('smtp_port', 587),
+                              timeout=self.timeout)
+        try:
+            # Commands and DATA go out as a few whole writes; without NODELAY each
+            # small write waits out the server's delayed ACK (~40ms per message)
+            server.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.email_config.get('smtp_starttls', True):
+                server.starttls()
+            if self.email_config.get('password'):
+                server.login(self.email_config['email'], self.email_config['password'])
+        except Exception:
+            server.close()
+            raise
+        self._count('handshakes')
+        return [server, 0, time.monotonic()]
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _discard(entry):
+        try:
+            entry[0].quit()
+        except Exception:
+            try:
+                entry[0].close()
+            except Exception:
+                pass
+
+
+def _envelope(msg):
+    """(sender, recipients, [dot-stuffed DATA payload]) of an email.message, as send_message() would"""
+    sender = parseaddr(msg['Sender'] or msg['From'] or '')[1]
+    recipients = [address for _, address in getaddresses(
+        msg.get_all('To', []) + msg.get_all('Cc', []) + msg.get_all('Bcc', [])) if address]
+    if msg['Bcc'] is not None:
+        msg = copy.copy(msg)
+        del msg['Bcc']
+    payload = LEADING_DOT.sub(b'..', msg.as_bytes(policy=msg.policy.clone(linesep='\r\n')))
+    if not payload.endswith(b'\r\n'):
+        payload += b'\r\n'
+    return sender, recipients, [payload]
+
+
+def _percentile_ms(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index] * 1000, 1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - STATS SNAPSHOT
+Precomputed stats for the fast-start stats command
+
+`python automated_delivery.py` (no arguments) is run from cron and
+dashboards many times an hour, and only prints stats. Building the whole
+delivery system for that imports imaplib, smtplib, ssl and the email
+stack, opens every database and loads the customer index. Instead the
+delivery path keeps delivery_stats.json current: StatsSnapshot is told
+about every customer save and rewrites the file atomically, at most once
+per min_interval and whenever a monitor cycle, backfill or shutdown
+flushes it. The stats command only reads that file and imports nothing
+but this module.
+"""
+
+import json
+import os
+import threading
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+def load_snapshot(path='delivery_stats.json'):
+    """The last snapshot with its age in seconds, or None if missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    snapshot['age_seconds'] = round(max(0.0, time.time() - snapshot.get('updated_at', 0)), 1)
+    return snapshot
+
+
+class StatsSnapshot:
+    """Throttled, atomic writer of the stats snapshot file"""
+
+    def __init__(self, path, collect, min_interval=5.0):
+        self.path = path
+        self.collect = collect  # callable() -> dict of current stats
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # one writer at a time, newest collection last
+        self.dirty = False
+        self.last_write = 0.0
+        self.stats = {'writes': 0, 'skipped': 0, 'errors': 0}
+
+    def changed(self):
+        """Note a change; written now unless the last write was under min_interval ago"""
+        with self.lock:
+            self.dirty = True
+            if time.monotonic() - self.last_write < self.min_interval:
+                self.stats['skipped'] += 1
+                return
+        self.flush()
+
+    def flush(self, force=False):
+        """Write the snapshot if anything changed since the last write (or when forced)"""
+        with self.lock:
+            if not (self.dirty or force):
+                return False
+            self.dirty = False
+            self.last_write = time.monotonic()
+        try:
+            with self.write_lock:
+                self._write(dict(self.collect(), version=SNAPSHOT_VERSION, updated_at=time.time(),
+                                 updated=time.strftime('%Y-%m-%dT%H:%M:%S')))
+        except Exception as e:
+            with self.lock:
+                self.dirty = True
+                self.stats['errors'] += 1
+            print(f"⚠️ Stats snapshot not written: {e}")
+            return False
+        with self.lock:
+            self.stats['writes'] += 1
+        return True
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def _write(self, snapshot):
+        # A temp file of its own per write (other processes may share the
+        # directory), published with an atomic rename
+        import tempfile  # pulls in shutil and random; kept off the stats command's imports
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - CUSTOMER STORE
+Indexed, crash-safe customer database for the delivery system
+
+CustomerStore replaces the customers.json read-modify-write with SQLite
+in WAL mode: every save is one keyed upsert (O(1), atomic, safe with
+concurrent writers), and a status change updates the purchase record in
+place instead of appending a second copy. An existing customers.json is
+imported once on first start.
+
+Revenue aggregates are maintained incrementally in the same transaction
+as each write: running totals for O(1) stats and hourly/daily/monthly
+rollups that answer date-range queries in O(buckets). An update first
+subtracts the record's previous contribution, so a purchase saved as
+pending and then delivered is only counted once.
+
+Each row also carries its identity keys (normalized buyer address,
+transaction ID, Message-ID), loaded at startup into the in-memory
+CustomerIndex (delivery_identity.py) and kept current on every save.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from delivery_identity import CustomerIndex, normalize_email
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id     TEXT PRIMARY KEY,
+    email           TEXT NOT NULL,
+    amount          TEXT,
+    delivery_status TEXT,
+    timestamp       TEXT,
+    record          TEXT NOT NULL,
+    buyer           TEXT,
+    transaction_id  TEXT,
+    message_id      TEXT
+);
+CREATE INDEX IF NOT EXISTS customers_email ON customers (email);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS totals (
+    key   TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket      TEXT NOT NULL,
+    revenue     REAL NOT NULL,
+    customers   INTEGER NOT NULL,
+    delivered   INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket)
+);
+"""
+
+# Bucket key = prefix of the ISO timestamp
+GRANULARITIES = {'hourly': 13, 'daily': 10, 'monthly': 7}
+AGGREGATES_VERSION = '2'
+IDENTITY_COLUMNS = ('buyer', 'transaction_id', 'message_id')
+
+
+class CustomerStore:
+    """SQLite customer database keyed by customer_id"""
+
+    def __init__(self, path='customers.db', legacy_json='customers.json'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                  timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+        self._ensure_identity_columns()
+        self._ensure_aggregates()
+        if legacy_json:
+            self.import_legacy_json(legacy_json)
+        self.index = CustomerIndex()
+        self._load_index()
+
+    def save(self, customer_info):
+        """Insert or update one purchase record in place"""
+        if not customer_info.get('customer_id'):
+            customer_info['customer_id'] = new_customer_id()
+        with self.lock:
+            self._transaction(self._upsert, customer_info)
+            self._index(customer_info)
+
+    def save_many(self, records):
+        """Insert or update a batch of purchase records in one transaction"""
+        for record in records:
+            if not record.get('customer_id'):
+                record['customer_id'] = new_customer_id()
+
+        def upsert_all():
+            for record in records:
+                self._upsert(record)
+
+        with self.lock:
+            self._transaction(upsert_all)
+            for record in records:
+                self._index(record)
+
+    def get_totals(self):
+        """Running totals, read in O(1)"""
+        with self.lock:
+            totals = dict(self.db.execute("SELECT key, value FROM totals").fetchall())
+        customers = int(totals.get('customers', 0))
+        delivered = int(totals.get('delivered', 0))
+        imported = int(totals.get('imported', 0))
+        return {
+            "total_customers": customers,
+            "total_revenue": round(totals.get('revenue', 0.0), 2),
+            "delivered_count": delivered,
+            "imported_count": imported,
+            "pending_count": customers - delivered - imported
+        }
+
+    def get_rollup(self, granularity='daily', start=None, end=None):
+        """Revenue buckets between start and end (inclusive ISO prefixes)"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        query = "SELECT bucket, revenue, customers, delivered FROM rollups WHERE granularity = ?"
+        params = [granularity]
+        if start:
+            query += " AND bucket >= ?"
+            params.append(start[:GRANULARITIES[granularity]])
+        if end:
+            query += " AND bucket <= ?"
+            params.append(end[:GRANULARITIES[granularity]])
+        with self.lock:
+            rows = self.db.execute(query + " ORDER BY bucket", params).fetchall()
+        return [{'bucket': bucket, 'revenue': round(revenue, 2), 'customers': customers,
+                 'delivered': delivered} for bucket, revenue, customers, delivered in rows]
+
+    def get(self, customer_id):
+        with self.lock:
+            row = self.db.execute("SELECT record FROM customers WHERE customer_id = ?",
+                                  (customer_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all(self):
+        """Every purchase record, oldest first"""
+        with self.lock:
+            rows = self.db.execute("SELECT record FROM customers ORDER BY rowid").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def export_unique_customers(self, path):
+        """Write one CSV row per buyer (from the index, no record scan); returns the count"""
+        customers = sorted(self.index.unique_customers(), key=lambda customer: customer['first_purchase'] or '')
+        fields = ['email', 'purchases', 'delivered', 'total_spent', 'first_purchase', 'last_purchase']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(customers)
+        return len(customers)
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    def import_legacy_json(self, path):
+        """One-time import of the old customers.json list"""
+        if not os.path.exists(path):
+            return 0
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM meta WHERE key = 'legacy_import'").fetchone():
+                return 0
+
+        try:
+            with open(path, 'r') as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not import {path}: {e}")
+            return 0
+
+        # The old code appended the same dict twice (pending, then delivered);
+        # both copies share email + timestamp, so the later one wins
+        merged = {}
+        for record in records:
+            key = record.get('customer_id') or f"LEGACY_{record.get('email')}_{record.get('timestamp')}"
+            merged[key] = dict(record, customer_id=key)
+
+        def import_all():
+            for record in merged.values():
+                self._upsert(record)
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('legacy_import', ?)",
+                            (json.dumps({'source': path, 'records': len(records),
+                                         'imported': len(merged), 'at': time.time()}),))
+
+        with self.lock:
+            self._transaction(import_all)
+
+        print(f"📥 Imported {len(merged)} customers from {path} into {self.path}")
+        return len(merged)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _transaction(self, func, *args):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            func(*args)
+            self.db.execute('COMMIT')
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+
+    def _upsert(self, record):
+        """Write one record and move its aggregate contribution (in a transaction)"""
+        old = self.db.execute("SELECT amount, delivery_status, timestamp FROM customers "
+                              "WHERE customer_id = ?", (record['customer_id'],)).fetchone()
+        if old:
+            self._apply(*old, sign=-1)
+        self._apply(str(record.get('amount')), record.get('delivery_status'),
+                    record.get('timestamp'), sign=1)
+
+        self.db.execute(
+            "INSERT INTO customers (customer_id, email, amount, delivery_status, timestamp, record, "
+            "buyer, transaction_id, message_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (customer_id) DO UPDATE SET email = excluded.email, "
+            "amount = excluded.amount, delivery_status = excluded.delivery_status, "
+            "timestamp = excluded.timestamp, record = excluded.record, buyer = excluded.buyer, "
+            "transaction_id = excluded.transaction_id, message_id = excluded.message_id",
+            (record['customer_id'], record.get('email') or '', str(record.get('amount')),
+             record.get('delivery_status'), record.get('timestamp'), json.dumps(record),
+             *identity_keys(record)))
+
+    def _index(self, record):
+        buyer, transaction_id, message_id = identity_keys(record)
+        self.index.add(record['customer_id'], record.get('email') or '', transaction_id, message_id,
+                       parse_amount(record.get('amount')), record.get('delivery_status'),
+                       record.get('timestamp'))
+
+    def _load_index(self):
+        """Rebuild the in-memory identity index from the narrow identity columns"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT customer_id, email, transaction_id, message_id, amount, delivery_status, timestamp "
+                "FROM customers ORDER BY rowid").fetchall()
+        for customer_id, email, transaction_id, message_id, amount, status, timestamp in rows:
+            self.index.add(customer_id, email, transaction_id, message_id,
+                           parse_amount(amount), status, timestamp)
+
+    def _ensure_identity_columns(self):
+        """Add and fill the identity columns on a database from before the index"""
+        with self.lock:
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(customers)")}
+            missing = [column for column in IDENTITY_COLUMNS if column not in columns]
+
+            def migrate():
+                for column in missing:
+                    self.db.execute(f"ALTER TABLE customers ADD COLUMN {column} TEXT")
+                rows = self.db.execute("SELECT customer_id, record FROM customers").fetchall()
+                self.db.executemany(
+                    "UPDATE customers SET buyer = ?, transaction_id = ?, message_id = ? WHERE customer_id = ?",
+                    [(*identity_keys(json.loads(record)), customer_id) for customer_id, record in rows])
+
+            if missing:
+                self._transaction(migrate)
+                print(f"🪪 Indexed {self.path} by buyer, transaction ID and Message-ID")
+            self.db.executescript("""
+                CREATE INDEX IF NOT EXISTS customers_buyer ON customers (buyer);
+                CREATE INDEX IF NOT EXISTS customers_transaction ON customers (transaction_id);
+            """)
+
+    def _apply(self, amount, status, timestamp, sign):
+        # A payment PayPal rejected (delivery_verify.py) is not revenue
+        revenue = 0.0 if status == 'rejected' else parse_amount(amount) * sign
+        delivered = sign if status == 'delivered' else 0
+        # Historical purchases backfilled without redelivery (delivery_backfill.py)
+        # were fulfilled long ago: neither delivered by us nor still pending
+        imported = sign if status == 'imported' else 0
+        for key, value in (('revenue', revenue), ('customers', sign), ('delivered', delivered),
+                           ('imported', imported)):
+            self.db.execute("INSERT INTO totals (key, value) VALUES (?, ?) "
+                            "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                            (key, value))
+
+        timestamp = timestamp or ''
+        for granularity, width in GRANULARITIES.items():
+            if len(timestamp) < width:
+                continue
+            self.db.execute(
+                "INSERT INTO rollups (granularity, bucket, revenue, customers, delivered) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (granularity, bucket) DO UPDATE SET "
+                "revenue = revenue + excluded.revenue, customers = customers + excluded.customers, "
+                "delivered = delivered + excluded.delivered",
+                (granularity, timestamp[:width], revenue, sign, delivered))
+
+    def _ensure_aggregates(self):
+        """Rebuild totals and rollups once if they predate this schema"""
+        with self.lock:
+            version = self.db.execute("SELECT value FROM meta WHERE key = 'aggregates_version'").fetchone()
+            if version and version[0] == AGGREGATES_VERSION:
+                return
+
+            def rebuild():
+                self.db.execute("DELETE FROM totals")
+                self.db.execute("DELETE FROM rollups")
+                rows = self.db.execute(
+                    "SELECT amount, delivery_status, timestamp FROM customers").fetchall()
+                for row in rows:
+                    self._apply(*row, sign=1)
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) "
+                                "VALUES ('aggregates_version', ?)", (AGGREGATES_VERSION,))
+
+            self._transaction(rebuild)
+
+
+def parse_amount(amount):
+    """Revenue value of a stored amount ('unknown' and junk count as 0)"""
+    try:
+        return float(str(amount).replace(',', '').lstrip('$'))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def identity_keys(record):
+    """(normalized buyer, transaction ID, Message-ID) of a purchase record"""
+    return (normalize_email(record.get('email')) or None, record.get('transaction_id') or None,
+            record.get('message_id') or None)
+
+
+def new_customer_id():
+    """Unique, roughly time-ordered purchase id"""
+    return f"AUTO_{int(time.time())}_{os.urandom(3).hex()}"
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - DELIVERY SYSTEM
+SelûneDeliverySystem: configuration and the monitor → deliver path
+
+Wires the delivery modules together: mailboxes and IMAP search, the
+payment parser, PayPal verification, the staged pipeline, document
+rendering, the SMTP pool, the outbox, the customer store and metrics.
+automated_delivery.py is the command line entry point; it imports this
+module only for commands that need the live system, so the plain stats
+command starts without imaplib, smtplib or the email stack.
+"""
+
+import imaplib
+import re
+import time
+from datetime import datetime, timedelta
+
+from delivery_artifacts import AttachmentCache, StreamingMessage
+from delivery_checkpoint import MessageIdIndex
+from delivery_classifier import PaymentClassifier, PaymentEmailParser
+from delivery_outbox import DeliveryOutbox, OutboxWorker
+from delivery_imap import PaymentSearch, uid_set
+from delivery_mailboxes import Mailbox, load_mailbox_configs
+from delivery_metrics import MetricsRegistry
+from delivery_mime import BodyExtractor
+from delivery_pdf import COVER_TEMPLATE, MasterPDFCache
+from delivery_pipeline import DeliveryPipeline
+from delivery_profiler import ProfilingHook
+from delivery_ratelimit import SMTPRateLimiter
+from delivery_scheduler import PollScheduler
+from delivery_smtp import SMTPConnectionPool
+from delivery_snapshot import StatsSnapshot
+from delivery_store import CustomerStore, new_customer_id
+from delivery_template import DocumentTemplate, TemplateLoader
+from delivery_verify import LIVE_API, SANDBOX_API, PayPalClient, PaymentVerifier, load_paypal_config
+
+class SelûneDeliverySystem:
+    """Automated customer delivery and fulfillment system"""
+    
+    def __init__(self):
+        self.email_config = {
+            'imap_server': 'imap.mail.yahoo.com',
+            'smtp_server': 'smtp.mail.yahoo.com', 
+            'email': 'valgrim1333@yahoo.com',
+            'password': '[SET_EMAIL_PASSWORD]',  # User needs to set this
+            'imap_port': 993,
+            'smtp_port': 587
+        }
+        
+        # Accounts from delivery_config.json (setup_delivery.py); the primary sends deliveries
+        self.config_file = 'delivery_config.json'
+        self.mailbox_configs = load_mailbox_configs(self.config_file, self.email_config)
+        self.email_config = self.mailbox_configs[0]['email_config']
+        
+        self.monitor_config = {
+            'use_idle': True,          # IMAP IDLE push, falls back to polling
+            'idle_refresh': 29 * 60,   # re-IDLE before the RFC 2177 30 minute cutoff
+            'poll_interval': 300,      # base interval; adapts to the payment rate
+            'poll_min_interval': 20,
+            'poll_max_interval': 900,
+            'poll_profiles': None,     # None = delivery_scheduler.DEFAULT_PROFILES
+            'error_backoff': 60,       # first retry after an error, doubling (jittered)
+            'max_error_backoff': 900,
+            'header_triage': True,     # skip bodies of non-payment emails
+            'max_body_bytes': 64 * 1024,  # decoded body text handed to the classifier
+            'fetch_batch_size': 500,
+            'server_search': True,     # let the IMAP server pre-filter candidates
+            'search_sender_domains': ['paypal.com'],
+            'search_subject_terms': None,  # None = use payment_keywords
+            'stats_interval': 60       # multi-mailbox mode: seconds between stats lines
+        }
+        
+        # Stage concurrency for ingest → parse → render → send
+        self.pipeline_config = {
+            'parse_workers': 1,
+            'render_workers': 2,
+            'send_workers': 2,         # also the SMTP pool size
+            'queue_size': 32,
+            'verify_batch_size': 50,   # payments per PayPal lookup
+            'verify_linger': 0.05      # seconds the verify stage waits to fill a batch
+        }
+        
+        # PayPal transaction check before delivery; on when delivery_config.json
+        # has a "paypal" section with REST API credentials
+        self.verify_config = {
+            'client_id': None,
+            'client_secret': None,
+            'sandbox': False,
+            'base_url': None,          # None = live or sandbox API
+            'cache_ttl': 24 * 3600,    # verified transaction IDs skip the API this long
+            'amount_tolerance': '0.01',
+            **load_paypal_config(self.config_file)
+        }
+        
+        # Retry policy for the durable delivery outbox
+        self.outbox_config = {
+            'max_attempts': 8,         # then dead-lettered
+            'base_delay': 30,          # doubles per attempt, ±50% jitter
+            'max_delay': 3600,
+            'senders': 2
+        }
+        
+        # Stage latency histograms and counters (always recorded, exported on request)
+        self.metrics_config = {
+            'port': None,              # local Prometheus endpoint, e.g. 9464 (--metrics-port)
+            'host': '127.0.0.1',
+            'log_interval': 60         # seconds between JSON metrics lines, 0 = off
+        }
+        self.metrics = MetricsRegistry()
+        
+        # cProfile + tracemalloc for the next N cycles on SIGUSR1 or the control file
+        self.profile_config = {
+            'cycles': 3,
+            'control_file': 'delivery_profile.request',  # may contain the number of cycles
+            'output_dir': 'profiles',
+            'top': 30                  # functions and allocation sites per report section
+        }
+        self.profiler = ProfilingHook(**self.profile_config)
+        
+        # Cheap pre-filters: server search and header triage
+        self.payment_keywords = ['paypal', 'payment', 'paid', '$', 'receipt', 'confirmation']
+        
+        # Weighted single-pass scoring + extraction for full messages
+        self.classifier = PaymentClassifier(ignore_addresses=sorted(
+            {config['email_config']['email'] for config in self.mailbox_configs}))
+        self.body_extractor = BodyExtractor(max_bytes=self.monitor_config['max_body_bytes'])
+        self.payment_parser = PaymentEmailParser(self.classifier, self.get_email_body)
+        
+        self.customer_db = 'customers.db'
+        self.legacy_customer_db = 'customers.json'  # imported once on first start
+        self.pdf_template = 'selune_tech_docs_template.md'  # built-in template if missing
+        self.documentation_source = 'selune_complete_documentation.md'  # from setup_delivery.py
+        self.master_pdf = 'selune_complete_documentation.pdf'
+        self.checkpoint_file = 'delivery_checkpoint.json'
+        self.message_index_file = 'processed_messages.idx'
+        self.outbox_db = 'delivery_outbox.db'
+        self.stats_file = 'delivery_stats.json'  # read by `python automated_delivery.py`
+        
+        # Personalized documentation, parsed once from pdf_template
+        self.templates = TemplateLoader(self.pdf_template)
+        
+        # Master PDF rendered once; each sale only adds a cover page and watermark
+        self.pdf = MasterPDFCache(self.documentation_source, self.master_pdf)
+        self.cover_template = DocumentTemplate(COVER_TEMPLATE, name='<cover>')
+        self.attachments = AttachmentCache(max_entries=4, max_bytes=64 * 1024 * 1024)
+        
+        # Per mailbox: one long-lived IMAP session, a UID high-water mark and an
+        # adaptive poll schedule. The Message-ID index is shared, so a payment
+        # that reaches two inboxes is still delivered once.
+        self.mailboxes = [self.build_mailbox(index, **config)
+                          for index, config in enumerate(self.mailbox_configs)]
+        self.primary = self.mailboxes[0]
+        self.processed_messages = MessageIdIndex(self.message_index_file)
+        
+        # Warm SMTP sessions shared by every delivery, paced to the provider's send quotas
+        self.rate_limiter = SMTPRateLimiter.for_server(self.email_config['smtp_server'],
+                                                       self.email_config.get('smtp_rate_limits'))
+        self.smtp = SMTPConnectionPool(self.email_config,
+                                       max_connections=self.pipeline_config['send_workers'],
+                                       rate_limiter=self.rate_limiter)
+        self.verifier = self.build_verifier()
+        self.pipeline = DeliveryPipeline(self, **self.pipeline_config)
+        
+        # Keyed SQLite customer store: O(1) atomic upserts, status updated in place
+        self.customers = CustomerStore(self.customer_db, legacy_json=self.legacy_customer_db)
+        
+        # Durable outbox: failed deliveries are retried with backoff, never dropped
+        self.outbox = DeliveryOutbox(self.outbox_db,
+                                     max_attempts=self.outbox_config['max_attempts'],
+                                     base_delay=self.outbox_config['base_delay'],
+                                     max_delay=self.outbox_config['max_delay'])
+        self.outbox_worker = OutboxWorker(self.outbox, self.retry_delivery,
+                                          senders=self.outbox_config['senders'],
+                                          check=self.verify_payments if self.verifier else None)
+        
+        # Read at export time, not on the delivery path
+        self.metrics.gauge('outbox_depth', lambda: self.outbox.get_stats()['depth'],
+                           'Deliveries waiting in the outbox')
+        self.metrics.gauge('outbox_dead', lambda: self.outbox.get_stats()['dead'],
+                           'Dead-lettered deliveries')
+        self.metrics.gauge('customers', lambda: self.customers.get_totals()['total_customers'],
+                           'Purchase records in the store')
+        self.metrics.gauge('unique_customers', lambda: self.get_customer_stats()['unique_customers'],
+                           'Distinct buyers by normalized email address')
+        self.metrics.gauge('revenue_dollars', lambda: self.customers.get_totals()['total_revenue'],
+                           'Total recorded revenue')
+        
+        # Precomputed stats for the plain stats command (delivery_snapshot.py)
+        self.snapshot = StatsSnapshot(self.stats_file, self.collect_stats)
+        
+    def build_payment_search(self):
+        """Build the server-side SEARCH from monitor_config"""
+        if not self.monitor_config['server_search']:
+            return PaymentSearch()
+        subject_terms = self.monitor_config['search_subject_terms']
+        return PaymentSearch(
+            sender_domains=self.monitor_config['search_sender_domains'],
+            subject_terms=self.payment_keywords if subject_terms is None else subject_terms
+        )
+    
+    def build_scheduler(self):
+        """Poll cadence that follows recent payment arrivals, time of day and errors"""
+        return PollScheduler(base_interval=self.monitor_config['poll_interval'],
+                             min_interval=self.monitor_config['poll_min_interval'],
+                             max_interval=self.monitor_config['poll_max_interval'],
+                             error_backoff=self.monitor_config['error_backoff'],
+                             max_error_backoff=self.monitor_config['max_error_backoff'],
+                             profiles=self.monitor_config['poll_profiles'])
+    
+    def build_verifier(self):
+        """PaymentVerifier for the configured PayPal account, or None without credentials"""
+        config = self.verify_config
+        if not (config['client_id'] and config['client_secret']):
+            return None
+        base_url = config['base_url'] or (SANDBOX_API if config['sandbox'] else LIVE_API)
+        client = PayPalClient(config['client_id'], config['client_secret'], base_url)
+        print(f"🛡️ Payment verification on ({base_url})")
+        return PaymentVerifier(client, cache_ttl=config['cache_ttl'],
+                               amount_tolerance=config['amount_tolerance'])
+    
+    def build_mailbox(self, index, name, folder, email_config):
+        """Monitor state for one configured mailbox (index 0 is the primary)"""
+        checkpoint_file = self.checkpoint_file
+        if index:
+            checkpoint_file = Mailbox.checkpoint_path(self.checkpoint_file, name)
+        return Mailbox(name, email_config, folder, checkpoint_file,
+                       search=self.build_payment_search(),
+                       scheduler=self.build_scheduler(),
+                       fetch_batch_size=self.monitor_config['fetch_batch_size'],
+                       key_prefix=f"{name}:" if index else '')
+    
+    def monitor_email_for_payments(self, mailbox=None):
+        """Monitor email for payment confirmations and delivery requests"""
+        mailbox = mailbox or self.primary
+        print(f"🔍 Monitoring {mailbox.name} for payment confirmations...")
+        started = time.perf_counter()
+        
+        try:
+            # Reuse the persistent session (NOOP-checked, reconnects on failure)
+            mail = mailbox.imap.get_connection()
+            
+            # Server-side search: new UIDs past the checkpoint, or unread mail
+            # since the last cycle when there is no usable checkpoint yet
+            cycle_started = datetime.now()
+            mailbox.checkpoint.validate(mailbox.imap.uidvalidity)
+            with self.metrics.timer('imap_search'):
+                uids = mailbox.search.run(mail, since=mailbox.search_checkpoint,
+                                          min_uid=mailbox.checkpoint.next_uid())
+            fetched_before = mailbox.fetcher.stats['candidates']
+            
+            # Headers + BODYSTRUCTURE for the whole range, then text parts of candidates only
+            def candidates():
+                fetched = mailbox.fetcher.fetch_candidates(mail, uids, self.is_payment_candidate)
+                while True:
+                    with self.metrics.timer('imap_fetch'):
+                        item = next(fetched, None)
+                    if item is None:
+                        return
+                    uid, email_message = item
+                    self.metrics.count('messages_fetched')
+                    message_id = mailbox.message_key(uid, email_message)
+                    if message_id in self.processed_messages:
+                        print(f"⏭️ Skipping already processed message {message_id}")
+                        self.metrics.count('duplicates_skipped')
+                        continue
+                    yield uid, email_message
+            
+            # Record the delivery in the outbox before sending: a crash can never
+            # re-deliver, and an interrupted or failed send is retried later.
+            # The customer is saved only once the claim wins, so a payment seen
+            # by two mailboxes at the same time is counted once. The transaction
+            # ID is reserved first: a second email for the same payment (other
+            # Message-ID, forwarded receipt) is never delivered twice.
+            def claim(uid, email_message, customer_info):
+                message_id = mailbox.message_key(uid, email_message)
+                customer_info['message_id'] = message_id
+                customer_info.setdefault('customer_id', new_customer_id())
+                if not self.reserve_transaction(customer_info):
+                    self.processed_messages.add(message_id)
+                    return False
+                if not self.outbox.enqueue(message_id, customer_info):
+                    self.release_transaction(customer_info)
+                    return False
+                try:
+                    self.processed_messages.add(message_id)
+                    self.record_purchase_history(customer_info)
+                    self.save_customer(customer_info)
+                except Exception as e:
+                    # Enqueued as 'sending': leave it to the outbox retries
+                    print(f"❌ Claim error for {customer_info['email']}: {e}")
+                    self.report_delivery(customer_info, False, e)
+                    return False
+                return True
+            
+            # Parse, render and send run concurrently while ingest keeps fetching
+            results = self.pipeline.run(candidates(), claim=claim, report=self.report_delivery)
+            new_customers = [result['customer'] for result in results]
+            
+            # Mark as read
+            if results:
+                mail.uid('STORE', uid_set(result['uid'] for result in results), '+FLAGS', '(\\Seen)')
+            
+            search_result = mailbox.search.last_result
+            print(f"🔎 Server search ({mailbox.name}): {search_result['new']} new, "
+                  f"{search_result['filtered_out']} filtered out, "
+                  f"{mailbox.fetcher.stats['candidates'] - fetched_before} fetched")
+            
+            # Everything the search saw is done, including what the filter dropped
+            mailbox.checkpoint.advance(mailbox.search.last_new_uids)
+            # SINCE has day granularity in server time; keep a day of slack
+            mailbox.search_checkpoint = cycle_started - timedelta(days=1)
+            mailbox.scheduler.record_poll(len(new_customers))
+            self.snapshot.flush()
+            self.metrics.observe('monitor_cycle', time.perf_counter() - started)
+            return new_customers
+            
+        except (imaplib.IMAP4.error, OSError) as e:
+            print(f"❌ Email monitoring error ({mailbox.name}): {e}")
+            mailbox.imap.invalidate()
+            mailbox.scheduler.record_error(e)
+            self.metrics.observe('monitor_cycle', time.perf_counter() - started, error=True)
+            return []
+        except Exception as e:
+            print(f"❌ Email monitoring error ({mailbox.name}): {e}")
+            mailbox.scheduler.record_error(e)
+            self.metrics.observe('monitor_cycle', time.perf_counter() - started, error=True)
+            return []
+    
+    def reserve_transaction(self, customer_info):
+        """Claim the payment's transaction ID; False when another purchase already owns it"""
+        transaction_id = customer_info.get('transaction_id')
+        if not transaction_id:
+            return True
+        if self.customers.index.reserve_transaction(transaction_id, customer_info['customer_id']):
+            return True
+        owner = self.customers.index.find_transaction(transaction_id)
+        print(f"⏭️ Transaction {transaction_id} already recorded as {owner}; duplicate payment email skipped")
+        self.metrics.count('duplicate_transactions')
+        return False
+    
+    def release_transaction(self, customer_info):
+        transaction_id = customer_info.get('transaction_id')
+        if transaction_id:
+            self.customers.index.release_transaction(transaction_id, customer_info['customer_id'])
+    
+    def record_purchase_history(self, customer_info):
+        """Flag repeat buyers on the purchase record (O(1) index lookup)"""
+        previous = self.customers.index.purchases(customer_info['email'])
+        if previous:
+            customer_info['repeat_purchase'] = True
+            customer_info['purchase_number'] = len(previous) + 1
+            if self.customers.index.is_delivered(customer_info['email']):
+                print(f"🔁 Repeat purchase #{len(previous) + 1} from {customer_info['email']}")
+            self.metrics.count('repeat_purchases')
+    
+    def get_customer_stats(self):
+        """Unique, repeat and delivered buyers from the identity index"""
+        return self.customers.index.get_stats()
+    
+    def report_delivery(self, customer_info, delivered, error=None):
+        """Settle a delivery attempt in the outbox"""
+        if delivered:
+            self.outbox.mark_delivered(customer_info['message_id'])
+            return
+        self.metrics.count('delivery_failures')
+        if self.outbox.mark_failed(customer_info['message_id'], error) == 'pending':
+            print(f"⏳ Delivery to {customer_info['email']} queued for retry")
+    
+    def retry_delivery(self, customer_info):
+        """Outbox retry: render and send again, raising on failure"""
+        stored = self.customers.get(customer_info.get('customer_id'))
+        if stored and stored.get('delivery_status') == 'delivered':
+            # Sent before, but the outbox was never settled (crash or failed write)
+            print(f"✅ Delivery to {customer_info['email']} already sent, not resending")
+            return
+        print(f"📧 Retrying delivery to {customer_info['email']}")
+        self.send_delivery_message(customer_info, self.render_delivery(customer_info))
+    
+    def verify_payments(self, customers):
+        """Check a batch of payments with PayPal; one outcome each, None when verified"""
+        with self.metrics.timer('verify'):
+            outcomes = self.verifier.verify_many(customers)
+        for customer_info, error in zip(customers, outcomes):
+            if error is None:
+                self.metrics.count('payments_verified')
+            elif getattr(error, 'permanent', False):
+                self.metrics.count('payments_rejected')
+                customer_info['delivery_status'] = 'rejected'
+                customer_info['verification_error'] = str(error)
+            else:
+                self.metrics.count('payments_unconfirmed')
+                continue
+            # Verified amount, or the rejection, goes on the customer record
+            self.save_customer(customer_info)
+        return outcomes
+    
+    def get_verification_stats(self):
+        """Verified/rejected counts, cache hits and PayPal API requests, or None when off"""
+        return self.verifier.get_stats() if self.verifier is not None else None
+    
+    def get_outbox_stats(self):
+        """Get outbox depth, dead letters and age of the oldest pending delivery"""
+        return self.outbox.get_stats()
+    
+    def get_connection_stats(self):
+        """Get IMAP connection reuse statistics, summed over all mailboxes"""
+        per_mailbox = [mailbox.imap.get_stats() for mailbox in self.mailboxes]
+        if len(per_mailbox) == 1:
+            return per_mailbox[0]
+        totals = {key: sum(stats[key] for stats in per_mailbox)
+                  for key in ('handshakes', 'reuses', 'noop_checks', 'reconnects', 'failures')}
+        totals['handshakes_per_hour'] = round(sum(stats['handshakes_per_hour'] for stats in per_mailbox), 2)
+        totals['connected'] = sum(1 for stats in per_mailbox if stats['connected'])
+        totals['mailboxes'] = len(per_mailbox)
+        return totals
+    
+    def get_rate_limit_stats(self):
+        """Send quota usage and how long the outbox backlog will take to drain"""
+        return self.rate_limiter.get_stats(backlog=self.outbox.get_stats()['depth'])
+    
+    def get_scheduler_stats(self):
+        """Poll interval decisions and the observed payment arrival rate, per mailbox"""
+        return {mailbox.name: mailbox.scheduler.get_stats() for mailbox in self.mailboxes}
+    
+    def get_smtp_stats(self):
+        """Get SMTP session reuse and per-send latency statistics"""
+        return self.smtp.get_stats()
+    
+    
+    def is_payment_candidate(self, headers):
+        """Header-only triage: could this email be a payment confirmation?"""
+        if not self.monitor_config['header_triage']:
+            return True
+        text = f"{headers['Subject'] or ''} {headers['From'] or ''}".lower()
+        return any(keyword in text for keyword in self.payment_keywords)
+    
+    def parse_payment_email(self, email_message, save=True):
+        """Extract customer and payment info from email (saved as pending unless save=False)"""
+        try:
+            # One compiled pass scores the payment indicators and extracts the details
+            with self.metrics.timer('parse'):
+                result, customer_info = self.payment_parser.parse(email_message)
+            self.metrics.count('payments' if customer_info else 'not_payments')
+            if customer_info:
+                print(f"🔎 Extracted sender: {customer_info['email']} (score {result.score})")
+
+                # Save customer to database
+                if save:
+                    self.save_customer(customer_info)
+                return customer_info
+
+        except Exception as e:
+            print(f"⚠️ Email parsing error: {e}")
+
+        return None
+
+    
+    def extract_email_from_body(self, body):
+        """Extract first valid email address from body text"""
+        matches = re.findall(r'[\w\.-]+@[\w\.-]+', body)
+        return matches[0] if matches else None
+
+    def get_email_body(self, email_message):
+        """Extract text body from email message (best text part, size-bounded)"""
+        return self.body_extractor.extract(email_message)
+    
+    def generate_personalized_pdf(self, customer_info):
+        """Render personalized documentation for customer; returns (filename, bytes)"""
+        print(f"📄 Generating personalized PDF for {customer_info['email']}")
+        
+        fields = {
+            'email': customer_info['email'],
+            'timestamp': customer_info['timestamp'],
+            'amount': customer_info['amount'],
+            'customer_id': customer_info.get('customer_id', 'AUTO_' + str(int(time.time()))),
+            'generated': datetime.now().isoformat()
+        }
+        basename = f"selune_docs_{customer_info['email'].replace('@', '_').replace('.', '_')}"
+        
+        with self.metrics.timer('render'):
+            # Cached master PDF + per-customer cover page and watermark
+            master = self.pdf.get()
+            if master is not None:
+                document = master.personalize(
+                    self.cover_template.render(fields).decode('utf-8'),
+                    watermark=f"Personal copy for {fields['email']} - Customer ID {fields['customer_id']}",
+                    subject=f"Personal copy for {fields['email']}"
+                )
+                return f"{basename}.pdf", document
+            
+            # No documentation source yet (run setup_delivery.py): text copy from the template
+            document = self.templates.get().render(fields)
+            return f"{basename}.txt", document
+    
+    def get_template_stats(self):
+        """Render timings for the document template"""
+        return self.templates.get().get_stats()
+    
+    def get_pdf_stats(self):
+        """Per-customer copy timings for the master PDF, if one is available"""
+        master = self.pdf.get()
+        return master.get_stats() if master is not None else None
+    
+    def send_automated_delivery(self, customer_info):
+        """Send automated delivery email with documentation"""
+        print(f"📧 Sending automated delivery to {customer_info['email']}")
+        
+        try:
+            msg = self.render_delivery(customer_info)
+            return self.send_delivery_message(customer_info, msg)
+            
+        except Exception as e:
+            print(f"❌ Delivery error: {e}")
+            return False
+    
+    def render_delivery(self, customer_info):
+        """Build the delivery email with the personalized documentation attached"""
+        # Generate personalized documentation in memory
+        doc_file, document = self.generate_personalized_pdf(customer_info)
+        
+        # Email body
+        body = f"""
+Hi there!
+
+Thank you for your ${customer_info['amount']} payment for the Selûne AI automation documentation!
+
+Your personalized technical guide is attached. This 295+ page document contains:
+✅ Complete MCP server setup instructions
+✅ Real automation code examples
+✅ Revenue generation strategies  
+✅ Troubleshooting guides
+✅ Business model templates
+
+QUICK START:
+1. Follow the setup guide in Section 1
+2. Run the demo automation in Section 3
+3. Deploy your first revenue automation in Section 5
+
+SUPPORT:
+- Repository: https://github.com/colera1333/selune-ai-automation-launch
+- Questions: Reply to this email
+- Updates: Watch the GitHub repo for new content
+
+Thanks for supporting AI automation development!
+
+---
+This email was sent automatically by the Selûne delivery system.
+Customer ID: {customer_info.get('customer_id', 'AUTO_' + str(int(time.time())))}
+Delivered: {datetime.now().isoformat()}
+        """
+        
+        # Base64 of the shared master PDF is cached; only the personalized tail is encoded
+        master = self.pdf.get()
+        if master is not None and document.startswith(master.prefix):
+            encoded = self.attachments.encode(document, master.fingerprint, len(master.prefix))
+        else:
+            encoded = self.attachments.encode(document)
+        
+        # Streamed to the SMTP socket chunk by chunk, never flattened into one string
+        msg = StreamingMessage(
+            self.email_config['email'],
+            customer_info['email'],
+            "🚀 Your Selûne AI Automation Documentation - Automated Delivery",
+            body,
+            doc_file,
+            'application/pdf' if doc_file.endswith('.pdf') else 'application/octet-stream',
+            encoded
+        )
+        
+        return msg
+    
+    def send_delivery_message(self, customer_info, msg):
+        """Send a rendered delivery and mark the customer delivered"""
+        # Send email over a pooled, already-authenticated session
+        with self.metrics.timer('send'):
+            latency = self.smtp.send_message(msg)
+        self.metrics.count('deliveries')
+        customer_info['send_latency_ms'] = round(latency * 1000, 1)
+        
+        # Update customer status
+        customer_info['delivery_status'] = 'delivered'
+        customer_info['delivery_timestamp'] = datetime.now().isoformat()
+        self.save_customer(customer_info)
+        
+        print(f"✅ Automated delivery complete for {customer_info['email']}")
+        return True
+    
+    def save_customer(self, customer_info):
+        """Save customer info to database"""
+        try:
+            # Insert, or update the same purchase record in place
+            with self.metrics.timer('save'):
+                self.customers.save(customer_info)
+            self.snapshot.changed()
+                
+        except Exception as e:
+            print(f"⚠️ Database save error: {e}")
+    
+    def get_revenue_stats(self):
+        """Get revenue and customer statistics"""
+        try:
+            # Maintained incrementally on every save, so this is O(1)
+            return self.customers.get_totals()
+            
+        except Exception as e:
+            print(f"⚠️ Stats error: {e}")
+            return {"error": str(e)}
+    
+    def collect_stats(self):
+        """Everything the stats command prints, for the snapshot file (delivery_snapshot.py)"""
+        outbox_stats = self.outbox.get_stats()
+        return {
+            'revenue': self.customers.get_totals(),
+            'customers': self.get_customer_stats(),
+            'outbox': {'depth': outbox_stats['depth'], 'dead': outbox_stats['dead']}
+        }
+    
+    def get_revenue_rollup(self, granularity='daily', start=None, end=None):
+        """Get hourly/daily/monthly revenue buckets over a date range"""
+        return self.customers.get_rollup(granularity, start, end)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - DOCUMENT TEMPLATES
+Parse-once, render-many templates for the personalized documentation
+
+DocumentTemplate splits a template into pre-encoded static segments and
+{{ field }} slots when it is loaded. Rendering a customer's copy only
+encodes the per-customer values and joins the cached segments, so the
+cost is one memcpy of the document regardless of its length, and the
+result is returned as bytes without touching the disk.
+
+TemplateLoader reads the configured template file (if present) and
+re-parses it only when its modification time changes.
+"""
+
+import os
+import re
+import threading
+import time
+
+FIELD = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+DEFAULT_TEMPLATE = """
+# Selûne AI Automation System - Complete Technical Documentation
+**Personal Copy for: {{ email }}**
+**Purchase Date: {{ timestamp }}**
+**Payment Amount: ${{ amount }}**
+
+## 🎯 Your Personal Implementation Guide
+
+Thank you for purchasing the Selûne AI automation documentation! This is your personalized copy of the complete technical guide.
+
+## 📋 What's Included
+- Complete MCP server setup instructions
+- Real automation code examples
+- Revenue generation strategies
+- Troubleshooting guides
+- 295+ pages of implementation details
+
+## 🚀 Quick Start (30 minutes)
+1. Set up Claude Desktop + MCP servers
+2. Configure your GitHub/PayPal accounts
+3. Deploy your first automation
+4. Start generating revenue!
+
+## 💰 Business Model Templates
+- Web scraping services: $50-500/project
+- Real-time monitoring: $100-1000/month
+- Custom automation: $200-2000/implementation
+
+## 🛠️ Technical Implementation
+[Complete technical documentation would be included here - 295 pages]
+
+## 🔗 Support & Updates
+- GitHub: https://github.com/colera1333/selune-ai-automation-launch
+- Email support: valgrim1333@yahoo.com
+- Join our automation community!
+
+---
+**Document generated automatically by Selûne delivery system**
+**Customer ID: {{ customer_id }}**
+**Generated: {{ generated }}**
+        """
+
+
+class DocumentTemplate:
+    """A template compiled into static byte segments and field slots"""
+
+    def __init__(self, source, name='<template>'):
+        self.name = name
+        self.parts = []   # bytes for static text, None for a field slot
+        self.slots = []   # (index into parts, field name)
+
+        position = 0
+        for match in FIELD.finditer(source):
+            self._static(source[position:match.start()])
+            self.slots.append((len(self.parts), match.group(1)))
+            self.parts.append(None)
+            position = match.end()
+        self._static(source[position:])
+
+        self.fields = sorted({field for _, field in self.slots})
+        self.static_bytes = sum(len(part) for part in self.parts if part is not None)
+
+        self.lock = threading.Lock()
+        self.stats = {'renders': 0, 'render_seconds': 0.0, 'last_render_ms': 0.0}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(f.read(), name=path)
+
+    def render(self, fields):
+        """The document for one customer as UTF-8 bytes; missing fields render empty"""
+        started = time.perf_counter()
+        parts = list(self.parts)
+        for index, field in self.slots:
+            value = fields.get(field)
+            parts[index] = b'' if value is None else str(value).encode('utf-8')
+        document = b''.join(parts)
+
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.stats['renders'] += 1
+            self.stats['render_seconds'] += elapsed
+            self.stats['last_render_ms'] = elapsed * 1000
+        return document
+
+    def get_stats(self):
+        with self.lock:
+            renders = self.stats['renders']
+            average = self.stats['render_seconds'] / renders * 1000 if renders else 0.0
+            return {
+                'template': self.name,
+                'static_bytes': self.static_bytes,
+                'fields': self.fields,
+                'renders': renders,
+                'avg_render_ms': round(average, 3),
+                'last_render_ms': round(self.stats['last_render_ms'], 3)
+            }
+
+    def _static(self, text):
+        # Adjacent statics stay separate; join() does not care and parsing stays simple
+        if text:
+            self.parts.append(text.encode('utf-8'))
+
+
+class TemplateLoader:
+    """Configured template file, re-parsed only when it changes on disk"""
+
+    def __init__(self, path, default=DEFAULT_TEMPLATE):
+        self.path = path
+        self.default = default
+        self.lock = threading.Lock()
+        self.template = None
+        self.mtime = None
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            mtime = None
+
+        with self.lock:
+            if self.template is None or mtime != self.mtime:
+                if mtime is None:
+                    self.template = DocumentTemplate(self.default, name='<built-in>')
+                else:
+                    self.template = DocumentTemplate.from_file(self.path)
+                    print(f"📄 Loaded document template {self.path} "
+                          f"({self.template.static_bytes:,} bytes, {len(self.template.slots)} fields)")
+                self.mtime = mtime
+            return self.template
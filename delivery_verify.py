@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+SELÛNE DELIVERY - PAYMENT VERIFICATION
+Check payment emails against the PayPal API before delivering
+
+A payment email is only a claim: the amount comes from a regex over the
+body, and anyone can send a message that looks like a PayPal receipt.
+With PayPal REST credentials in delivery_config.json, every payment's
+transaction ID is looked up before the documentation goes out:
+
+    "paypal": {"client_id": "...", "client_secret": "...", "sandbox": false}
+
+- verified: the transaction exists, completed, and matches the emailed
+  amount and currency. The API's amount replaces the parsed one.
+- rejected: no transaction ID, an amount or currency mismatch, or a
+  denied/reversed transaction. The delivery is dead-lettered at once.
+- unconfirmed: not (yet) listed, still pending, or the API failed. The
+  delivery is retried through the outbox backoff; the Transaction Search
+  API can lag new payments by a few hours.
+
+Lookups are batched: the pipeline hands over every payment of a cycle at
+once, and one Transaction Search over their time window (500 rows per
+page) verifies all of them, not one request per customer. Completed
+transactions from every search page go into a TTL cache, so payments
+whose emails arrive a little later, replays and duplicates cost no request
+at all.
+"""
+
+import base64
+import http.client
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode, urlsplit
+
+LIVE_API = 'https://api-m.paypal.com'
+SANDBOX_API = 'https://api-m.sandbox.paypal.com'
+
+# Transaction Search status codes
+COMPLETED = 'S'
+PENDING = 'P'
+SEARCH_MAX_DAYS = 31
+
+
+class PayPalAPIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"PayPal API {status}: {message}")
+        self.status = status
+
+
+class PaymentRejected(Exception):
+    """Verification failed for good: the outbox dead-letters instead of retrying"""
+    permanent = True
+
+
+class PaymentUnconfirmed(Exception):
+    """Not verifiable yet: the outbox retries with backoff"""
+
+
+def load_paypal_config(path):
+    """The "paypal" section of delivery_config.json, or {} when absent"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('paypal') or {}
+    except (OSError, ValueError):
+        return {}
+
+
+class PayPalClient:
+    """Minimal PayPal REST client: OAuth2 token + Transaction Search over one keep-alive connection"""
+
+    def __init__(self, client_id, client_secret, base_url=LIVE_API, timeout=10):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url
+        self.timeout = timeout
+
+        parts = urlsplit(base_url)
+        self.scheme, self.host, self.port = parts.scheme, parts.hostname, parts.port
+        self.lock = threading.Lock()
+        self.connection = None
+        self.token = None
+        self.token_expires = 0.0
+        self.stats = {'requests': 0, 'token_refreshes': 0, 'reconnects': 0}
+
+    def search_transactions(self, start, end, transaction_id=None, page_size=500):
+        """Yield transaction_info dicts between two aware datetimes (at most 31 days apart)"""
+        params = {
+            'start_date': start.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'end_date': end.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'fields': 'transaction_info',
+            'page_size': page_size,
+        }
+        if transaction_id:
+            params['transaction_id'] = transaction_id
+        page = 1
+        while True:
+            params['page'] = page
+            result = self._request('GET', '/v1/reporting/transactions?' + urlencode(params))
+            for detail in result.get('transaction_details', []):
+                yield detail.get('transaction_info', {})
+            if page >= result.get('total_pages', 1):
+                return
+            page += 1
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def close(self):
+        with self.lock:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def _request(self, method, path, body=None, retry=True):
+        with self.lock:
+            headers = {'Authorization': f'Bearer {self._access_token()}', 'Content-Type': 'application/json'}
+            try:
+                status, payload = self._send(method, path, body, headers)
+            except (OSError, http.client.HTTPException):
+                # Dropped keep-alive connection: one fresh attempt
+                self._drop_connection()
+                self.stats['reconnects'] += 1
+                status, payload = self._send(method, path, body, headers)
+            if status == 401:
+                self.token = None  # revoked or expired early
+        if status == 401 and retry:
+            return self._request(method, path, body, retry=False)
+        if status >= 400:
+            raise PayPalAPIError(status, payload.get('message') or payload.get('error_description') or payload)
+        return payload
+
+    def _access_token(self):
+        if self.token and time.monotonic() < self.token_expires:
+            return self.token
+        credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+        status, payload = self._send('POST', '/v1/oauth2/token', 'grant_type=client_credentials', {
+            'Authorization': f'Basic {credentials}',
+            'Content-Type': 'application/x-www-form-urlencoded'
+        })
+        if status != 200:
+            raise PayPalAPIError(status, payload.get('error_description') or payload)
+        self.token = payload['access_token']
+        # Refresh a minute early rather than race the expiry
+        self.token_expires = time.monotonic() + max(0, payload.get('expires_in', 3600) - 60)
+        self.stats['token_refreshes'] += 1
+        return self.token
+
+    def _send(self, method, path, body, headers):
+        if self.connection is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self.connection = connection_class(self.host, self.port, timeout=self.timeout)
+        self.connection.request(method, path, body=body, headers=dict(headers, Accept='application/json'))
+        response = self.connection.getresponse()
+        data = response.read()
+        self.stats['requests'] += 1
+        try:
+            payload = json.loads(data) if data else {}
+        except ValueError:
+            payload = {'message': data[:200].decode('utf-8', errors='replace')}
+        return response.status, payload
+
+    def _drop_connection(self):
+        if self.connection:
+            self.connection.close()
+        self.connection = None
+
+
+class VerifiedCache:
+    """Completed PayPal transactions by ID with a time to live, least recently used evicted first"""
+
+    def __init__(self, ttl=24 * 3600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # transaction_id → (expires, transaction)
+
+    def get(self, transaction_id):
+        with self.lock:
+            entry = self.entries.get(transaction_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[transaction_id]
+                return None
+            self.entries.move_to_end(transaction_id)
+            return entry[1]
+
+    def put(self, transaction_id, transaction):
+        with self.lock:
+            self.entries[transaction_id] = (time.monotonic() + self.ttl, transaction)
+            self.entries.move_to_end(transaction_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PaymentVerifier:
+    """Batch verification of parsed payments against PayPal transaction records"""
+
+    def __init__(self, client, cache_ttl=24 * 3600, cache_size=10000, amount_tolerance='0.01',
+                 window_before=6 * 3600, window_after=3600):
+        self.client = client
+        self.cache = VerifiedCache(cache_ttl, cache_size)
+        self.amount_tolerance = Decimal(amount_tolerance)
+        self.window_before = timedelta(seconds=window_before)  # payment precedes its email
+        self.window_after = timedelta(seconds=window_after)    # clock skew
+
+        self.lock = threading.Lock()
+        self.stats = {
+            'verified': 0,
+            'rejected': 0,
+            'unconfirmed': 0,
+            'cache_hits': 0,
+            'searches': 0,
+            'batches': 0
+        }
+
+    def verify_many(self, customers):
+        """One outcome per customer record: None when verified, else the exception to raise"""
+        self._count('batches')
+        transactions = {}
+        lookup = []
+        for customer_info in customers:
+            transaction_id = customer_info.get('transaction_id')
+            if transaction_id and transaction_id not in transactions:
+                cached = self.cache.get(transaction_id)
+                if cached is not None:
+                    self._count('cache_hits')
+                    transactions[transaction_id] = cached
+                else:
+                    lookup.append(customer_info)
+
+        error = None
+        if lookup:
+            wanted = {customer_info['transaction_id'] for customer_info in lookup}
+            try:
+                for start, end in self._windows(lookup):
+                    self._count('searches')
+                    for transaction in self.client.search_transactions(start, end):
+                        transaction_id = transaction.get('transaction_id')
+                        if transaction_id in wanted:
+                            transactions[transaction_id] = transaction
+                        # The rest of the page is likely the next batch's payments
+                        if transaction.get('transaction_status') == COMPLETED:
+                            self.cache.put(transaction_id, transaction)
+                    if wanted <= transactions.keys():
+                        break
+            except (PayPalAPIError, OSError, http.client.HTTPException) as e:
+                print(f"⚠️ Payment verification unavailable: {e}")
+                error = e
+
+        outcomes = []
+        for customer_info in customers:
+            outcome = self._check(customer_info, transactions.get(customer_info.get('transaction_id')), error)
+            key = 'verified' if outcome is None else (
+                'rejected' if isinstance(outcome, PaymentRejected) else 'unconfirmed')
+            self._count(key)
+            outcomes.append(outcome)
+        return outcomes
+
+    def verify(self, customer_info):
+        """Verify a single payment (outbox retries); raises unless verified"""
+        outcome = self.verify_many([customer_info])[0]
+        if outcome is not None:
+            raise outcome
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['cached'] = len(self.cache)
+        stats['api'] = self.client.get_stats()
+        return stats
+
+    def _check(self, customer_info, transaction, error):
+        transaction_id = customer_info.get('transaction_id')
+        if not transaction_id:
+            return PaymentRejected("no transaction ID in the payment email")
+        if transaction is None:
+            if error is not None:
+                return PaymentUnconfirmed(f"{transaction_id}: verification unavailable ({error})")
+            return PaymentUnconfirmed(f"{transaction_id}: not in PayPal's transaction list yet")
+
+        status = transaction.get('transaction_status')
+        if status == PENDING:
+            return PaymentUnconfirmed(f"{transaction_id}: payment still pending")
+        if status != COMPLETED:
+            return PaymentRejected(f"{transaction_id}: transaction status {status}")
+
+        paid = transaction.get('transaction_amount', {})
+        try:
+            paid_amount = Decimal(paid.get('value', ''))
+        except InvalidOperation:
+            return PaymentUnconfirmed(f"{transaction_id}: unreadable amount {paid.get('value')!r}")
+        currency = paid.get('currency_code')
+        if customer_info.get('currency') and currency and customer_info['currency'] != currency:
+            return PaymentRejected(f"{transaction_id}: paid in {currency}, email says {customer_info['currency']}")
+        try:
+            claimed = Decimal(str(customer_info.get('amount')))
+        except InvalidOperation:
+            claimed = None  # "unknown": the API amount is all we have
+        if claimed is not None and abs(claimed - paid_amount) > self.amount_tolerance:
+            return PaymentRejected(f"{transaction_id}: paid {paid_amount} {currency}, email says {claimed}")
+
+        customer_info['amount'] = str(paid_amount)
+        customer_info['currency'] = currency or customer_info.get('currency')
+        customer_info['verified'] = True
+        return None
+
+    def _windows(self, customers):
+        """Search windows covering every payment, split at the API's 31-day limit"""
+        times = []
+        for customer_info in customers:
+            try:
+                sent = datetime.fromisoformat(customer_info['timestamp'])
+            except (KeyError, TypeError, ValueError):
+                sent = datetime.now()
+            times.append(sent if sent.tzinfo else sent.astimezone())
+        start = min(times) - self.window_before
+        end = min(max(times) + self.window_after, datetime.now(timezone.utc))
+        windows = []
+        while start < end:
+            windows.append((start, min(end, start + timedelta(days=SEARCH_MAX_DAYS))))
+            start += timedelta(days=SEARCH_MAX_DAYS)
+        return windows
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
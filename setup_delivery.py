@@ -161,6 +161,15 @@ class DeliverySetup:
         print(f"✅ Generated complete documentation ({len(complete_doc)} characters)")
         print("📄 Saved as: selune_complete_documentation.md")
         
+        # Render the master PDF once; deliveries only add a personal cover page
+        try:
+            from delivery_pdf import MasterPDFCache
+            master = MasterPDFCache('selune_complete_documentation.md',
+                                    'selune_complete_documentation.pdf').get()
+            print(f"📄 Master PDF: selune_complete_documentation.pdf ({master.pages} pages)")
+        except Exception as e:
+            print(f"⚠️ Master PDF not rendered: {e}")
+        
         return 'selune_complete_documentation.md'
     
     def generate_additional_documentation(self):
@@ -402,6 +411,17 @@ Redistribution requires attribution to the Selûne AI automation project.
             'ready': True
         }
         
+        # Keep sections added by hand: extra mailboxes (delivery_mailboxes.py)
+        # and PayPal API credentials (delivery_verify.py)
+        try:
+            with open(self.config_file, 'r') as f:
+                previous = json.load(f)
+            for section in ('mailboxes', 'paypal'):
+                if previous.get(section):
+                    config[section] = previous[section]
+        except (OSError, ValueError):
+            pass
+        
         with open(self.config_file, 'w') as f:
             json.dump(config, f, indent=2)
         